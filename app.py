@@ -1,18 +1,22 @@
 from fastapi import FastAPI,Request 
-from fastapi.responses import Response
+from fastapi.responses import Response,JSONResponse
 from fastapi.middleware.cors import CORSMiddleware 
 from fastapi.staticfiles import StaticFiles 
 from fastapi.templating import Jinja2Templates 
 from starlette.responses import HTMLResponse,RedirectResponse 
 from uvicorn import run as app_run 
 
+import asyncio
+import json
 from typing import Optional
 
 # importing constants and pipeline modules from the project
 from src.constants import APP_HOST,APP_PORT
-from src.pipeline.prediction_pipeline import VehicleData,VehicleDataClassifier
+from src.pipeline.prediction_pipeline import VehicleData
 from src.entity.config_entity import VehiclePredictorConfig
-from src.pipeline.training_pipeline import TrainingPipeline
+from src.pipeline.training_job_runner import TrainingJobRunner,TrainingJobRunningError
+from src.pipeline.prediction_coalescer import PredictionCoalescer,PredictionCoalescerStoppedError
+from src.pipeline.inference_pool import InferenceWorkerPool,InferencePoolSaturatedError
 
 # Initialise FastAPI application
 app = FastAPI()
@@ -35,6 +39,34 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Run CPU-bound inference in a worker pool so the event loop stays responsive
+inference_pool = InferenceWorkerPool(prediction_pipeline_config=VehiclePredictorConfig)
+
+# Run retraining in a separate low-priority process, one job at a time
+training_job_runner = TrainingJobRunner()
+
+# Coalesce concurrent single-row form predictions into one model call
+prediction_coalescer = PredictionCoalescer(
+    score_batch=inference_pool.predict,
+    max_batch_size=VehiclePredictorConfig.coalescer_max_batch_size,
+    max_wait_ms=VehiclePredictorConfig.coalescer_max_wait_ms
+)
+
+@app.on_event("startup")
+async def load_production_model():
+    """
+    Starts the inference workers, which load the production model once and keep it warm.
+    """
+    inference_pool.start()
+    await prediction_coalescer.start()
+
+@app.on_event("shutdown")
+async def stop_inference_workers():
+    await prediction_coalescer.stop()
+    inference_pool.stop()
+    # cancelling a running job waits for its process to exit, keep the event loop free meanwhile
+    await asyncio.get_running_loop().run_in_executor(None, training_job_runner.stop)
+
 class DataForm:
     """
     DataForm class to handle and process incoming form data.
@@ -42,17 +74,16 @@ class DataForm:
     """
     def __init__(self, request: Request):
         self.request: Request = request
-        self.Gender: Optional[int] = None
+        self.Gender: Optional[str] = None
         self.Age: Optional[int] = None
         self.Driving_License: Optional[int] = None
         self.Region_Code: Optional[float] = None
         self.Previously_Insured: Optional[int] = None
+        self.Vehicle_Age: Optional[str] = None
+        self.Vehicle_Damage: Optional[str] = None
         self.Annual_Premium: Optional[float] = None
         self.Policy_Sales_Channel: Optional[float] = None
         self.Vintage: Optional[int] = None
-        self.Vehicle_Age_lt_1_Year: Optional[int] = None
-        self.Vehicle_Age_gt_2_Years: Optional[int] = None
-        self.Vehicle_Damage_Yes: Optional[int] = None
                 
 
     async def get_vehicle_data(self):
@@ -66,12 +97,11 @@ class DataForm:
         self.Driving_License = form.get("Driving_License")
         self.Region_Code = form.get("Region_Code")
         self.Previously_Insured = form.get("Previously_Insured")
+        self.Vehicle_Age = form.get("Vehicle_Age")
+        self.Vehicle_Damage = form.get("Vehicle_Damage")
         self.Annual_Premium = form.get("Annual_Premium")
         self.Policy_Sales_Channel = form.get("Policy_Sales_Channel")
         self.Vintage = form.get("Vintage")
-        self.Vehicle_Age_lt_1_Year = form.get("Vehicle_Age_lt_1_Year")
-        self.Vehicle_Age_gt_2_Years = form.get("Vehicle_Age_gt_2_Years")
-        self.Vehicle_Damage_Yes = form.get("Vehicle_Damage_Yes")
 
 # Route to render the main page with the form
 @app.get("/", tags=["authentication"])
@@ -86,15 +116,42 @@ async def index(request: Request):
 @app.get("/train")
 async def trainRouteClient():
     """
-    Endpoint to initiate the model training pipeline.
+    Endpoint to start the model training pipeline as a background job.
+    Returns the job id at once; progress is polled on /train/{job_id}. 409 while another job runs.
     """
     try:
-        train_pipeline = TrainingPipeline()
-        train_pipeline.run_pipeline()
-        return Response("Training successful!!!")
+        job = training_job_runner.submit()
+        return JSONResponse({"status": True, "job_id": job["job_id"], "status_url": f"/train/{job['job_id']}",
+                             "job": job}, status_code=202)
+
+    except TrainingJobRunningError as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=409)
 
     except Exception as e:
-        return Response(f"Error Occurred! {e}")
+        return JSONResponse({"status": False, "error": f"Error Occurred! {e}"}, status_code=500)
+
+# Route reporting the progress of a training job
+@app.get("/train/{job_id}")
+async def trainStatusRouteClient(job_id: str):
+    """
+    Endpoint returning the status of a training job with per-stage progress and timings.
+    """
+    job = training_job_runner.get_job(job_id)
+    if job is None:
+        return JSONResponse({"status": False, "error": f"Unknown training job {job_id}"}, status_code=404)
+    return JSONResponse({"status": True, "job": job})
+
+# Route cancelling a running training job
+@app.post("/train/{job_id}/cancel")
+async def trainCancelRouteClient(job_id: str):
+    """
+    Endpoint terminating a running training job. Finished jobs are returned unchanged.
+    """
+    # terminating the process may take up to the grace period, keep the event loop free meanwhile
+    job = await asyncio.get_running_loop().run_in_executor(None, training_job_runner.cancel, job_id)
+    if job is None:
+        return JSONResponse({"status": False, "error": f"Unknown training job {job_id}"}, status_code=404)
+    return JSONResponse({"status": True, "job": job})
 
 # Route to handle form submission and make predictions
 @app.post("/")
@@ -112,22 +169,18 @@ async def predictRouteClient(request: Request):
                                 Driving_License = form.Driving_License,
                                 Region_Code = form.Region_Code,
                                 Previously_Insured = form.Previously_Insured,
+                                Vehicle_Age = form.Vehicle_Age,
+                                Vehicle_Damage = form.Vehicle_Damage,
                                 Annual_Premium = form.Annual_Premium,
                                 Policy_Sales_Channel = form.Policy_Sales_Channel,
-                                Vintage = form.Vintage,
-                                Vehicle_Age_lt_1_Year = form.Vehicle_Age_lt_1_Year,
-                                Vehicle_Age_gt_2_Years = form.Vehicle_Age_gt_2_Years,
-                                Vehicle_Damage_Yes = form.Vehicle_Damage_Yes
+                                Vintage = form.Vintage
                                 )
 
-        # Convert form data into a DataFrame for the model
-        vehicle_df = vehicle_data.get_vehicle_input_data_frame()
+        # Convert the raw form data into a record matrix, the model encodes it with its feature encoder
+        vehicle_features = vehicle_data.get_vehicle_input_array()
 
-        # Initialize the prediction pipeline
-        model_predictor = VehicleDataClassifier(prediction_pipeline_config=VehiclePredictorConfig)
-
-        # Make a prediction and retrieve the result
-        value = model_predictor.predict(dataframe=vehicle_df)[0]
+        # Make a prediction through the coalescer, which scores concurrent requests together
+        value = (await prediction_coalescer.submit(vehicle_features))[0]
 
         # Interpret the prediction result as 'Response-Yes' or 'Response-No'
         status = "Response-Yes" if value == 1 else "Response-No"
@@ -137,10 +190,66 @@ async def predictRouteClient(request: Request):
             "vehicledata.html",
             {"request": request, "context": status},
         )
+
+    except (InferencePoolSaturatedError, PredictionCoalescerStoppedError) as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=503)
         
     except Exception as e:
         return {"status": False, "error": f"{e}"}
 
+# Route to score many vehicle records in one call
+@app.post("/predict/batch")
+async def predictBatchRouteClient(request: Request):
+    """
+    Endpoint to score a batch of raw records (Gender 'Male'/'Female', Vehicle_Age '< 1 Year'/'1-2 Year'/'> 2 Years',
+    Vehicle_Damage 'Yes'/'No', numeric fields as numbers) sent as a JSON array (or {"records": [...]})
+    or as NDJSON (one record per line). The whole batch is encoded and scored with one model call.
+    """
+    try:
+        body = await request.body()
+        content_type = request.headers.get("content-type", "")
+
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            records = [json.loads(line) for line in body.decode().splitlines() if line.strip()]
+        else:
+            payload = json.loads(body)
+            records = payload.get("records") if isinstance(payload, dict) else payload
+
+        if not isinstance(records, list) or len(records) == 0:
+            return JSONResponse({"status": False, "error": "Expected a non-empty list of records"}, status_code=400)
+
+        vehicle_features = VehicleData.get_vehicle_batch_array(records)
+
+    except Exception as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=400)
+
+    try:
+        predictions, probabilities = await inference_pool.predict_batch(vehicle_features)
+
+        return JSONResponse({
+            "status": True,
+            "count": len(predictions),
+            "predictions": predictions.astype(int).tolist(),
+            "probabilities": probabilities.tolist()
+        })
+
+    except InferencePoolSaturatedError as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=503)
+
+    except Exception as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=500)
+
+# Route reporting inference counters and the S3 API calls made while serving
+@app.get("/stats")
+async def statsRouteClient():
+    """
+    Endpoint returning served jobs/rows, S3 API call counts and prediction cache counters per process.
+    """
+    try:
+        return JSONResponse({"status": True, **(await inference_pool.get_stats())})
+    except Exception as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=500)
+
 # Main entry point to start the FastAPI server
 if __name__ == "__main__":
     app_run(app, host=APP_HOST, port=APP_PORT)
@@ -1,31 +1,75 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from src.configuration.aws_connection import S3Client
+from src.constants import (S3_TRANSFER_MULTIPART_THRESHOLD, S3_TRANSFER_MULTIPART_CHUNKSIZE,
+                           S3_TRANSFER_MAX_CONCURRENCY, S3_TRANSFER_USE_THREADS, S3_METADATA_CACHE_TTL_SECONDS)
+from collections import Counter
 from io import StringIO
-from typing import Union,List
+from typing import Dict,Tuple,Union,List,Optional
 import os,sys
+import threading
+import time
 from src.logger import logging
 from src.exception import MyException
 from botocore.exceptions import ClientError
 from pandas import DataFrame,read_csv
 import pickle
 
+
+# S3 API calls made by this process, by operation name (HeadObject, GetObject, PutObject, ...)
+_api_calls = Counter()
+_api_calls_lock = threading.Lock()
+
+
+def _count_api_call(model, **kwargs) -> None:
+    # botocore 'after-call' handler: runs once per answered API operation (multipart parts included, retries not)
+    with _api_calls_lock:
+        _api_calls[model.name] += 1
+
+
 class SimpleStorageService:
     """
     A class for interacting with AWS S3 storage,providing methods for file management,
     data uploads,and data retrieval in S3 bucket.
     """
 
-    def __init__(self):
+    def __init__(self, transfer_config: Optional[TransferConfig] = None,
+                 metadata_cache_ttl_seconds: float = S3_METADATA_CACHE_TTL_SECONDS):
         """
         Initialises the SimpleStorageService instance with S3 resource and client
+
+        Args:
+            transfer_config (Optional[TransferConfig]): multipart/concurrency settings for uploads and downloads.
+                Defaults to the S3_TRANSFER_* constants.
+            metadata_cache_ttl_seconds (float): how long HEAD results are reused, 0 disables the cache.
         """
         s3_client = S3Client()
         self.s3_resource = s3_client.s3_resource
         self.s3_client = s3_client.s3_client
+        # unique_id keeps the handler registered once however many services share the client
+        self.s3_client.meta.events.register("after-call.s3", _count_api_call, unique_id="s3-api-call-counter")
+        self.metadata_cache_ttl_seconds = metadata_cache_ttl_seconds
+        self._metadata_cache: Dict[Tuple[str, str], Tuple[float, Optional[dict]]] = {}
+        self._metadata_cache_lock = threading.Lock()
+        self.transfer_config = transfer_config or TransferConfig(
+            multipart_threshold=S3_TRANSFER_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_TRANSFER_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_TRANSFER_MAX_CONCURRENCY,
+            use_threads=S3_TRANSFER_USE_THREADS
+        )
+
+    @staticmethod
+    def get_api_call_counts() -> Dict[str, int]:
+        """
+        Returns the number of S3 API calls made by this process so far, by operation name.
+        """
+        with _api_calls_lock:
+            return dict(_api_calls)
 
     def s3_key_path_available(self,bucket_name,s3_key)->bool:
         """
         Checks if a specified S3 key path (file path) is available in the specified bucket.
+        The exact key is checked with a (cached) HEAD request instead of listing the prefix.
 
         Args:
             bucket_name (str): Name of the S3 bucket.
@@ -35,9 +79,7 @@ class SimpleStorageService:
             bool: True if the file exists, False otherwise.
         """
         try:
-            bucket = self.get_bucket(bucket_name)
-            file_objects = [file_object for file_object in bucket.objects.filter(Prefix=s3_key)]
-            return len(file_objects) > 0
+            return self.get_object_metadata(bucket_name=bucket_name, s3_key=s3_key) is not None
         except Exception as e:
             raise MyException(e, sys)
         
@@ -68,6 +110,23 @@ class SimpleStorageService:
         except Exception as e:
             raise MyException(e, sys) from e
 
+    @staticmethod
+    def get_object_stream(object_name: object) -> object:
+        """
+        Returns the streaming body of the specified S3 object without reading it.
+        The body is a binary file-like object, so parsers can consume it chunk by chunk.
+
+        Args:
+            object_name (object): The S3 object.
+
+        Returns:
+            StreamingBody: The unread response body.
+        """
+        try:
+            return object_name.get()["Body"]
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def get_bucket(self, bucket_name: str):
         """
         Retrieves the S3 bucket object based on the provided bucket name.
@@ -86,25 +145,132 @@ class SimpleStorageService:
         except Exception as e:
             raise MyException(e, sys) from e
 
-    def get_file_object(self, filename: str, bucket_name: str) -> Union[List[object], object]:
+    def get_file_object(self, filename: str, bucket_name: str) -> object:
         """
-        Retrieves the file object(s) from the specified bucket based on the filename.
+        Retrieves the file object for the exact key from the specified bucket.
+        No listing is involved, so keys sharing the prefix (e.g. 'model.pkl.bak') are never matched.
 
         Args:
-            filename (str): The name of the file to retrieve.
+            filename (str): The exact key of the file to retrieve.
             bucket_name (str): The name of the S3 bucket.
 
         Returns:
-            Union[List[object], object]: The S3 file object or list of file objects.
+            object: The S3 file object.
         """
         logging.info("Entered the get_file_object method of SimpleStorageService class")
         try:
-            bucket = self.get_bucket(bucket_name)
-            file_objects = [file_object for file_object in bucket.objects.filter(Prefix=filename)]
-            func = lambda x: x[0] if len(x) == 1 else x
-            file_objs = func(file_objects)
+            file_obj = self.s3_resource.Object(bucket_name, filename)
             logging.info("Exited the get_file_object method of SimpleStorageService class")
-            return file_objs
+            return file_obj
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_object_metadata(self, bucket_name: str, s3_key: str, use_cache: bool = True) -> Optional[dict]:
+        """
+        Fetches the ETag, LastModified and size of an S3 object with a single HEAD request.
+        Results, including "not found", are reused for `metadata_cache_ttl_seconds`.
+
+        Args:
+            bucket_name (str): Name of the S3 bucket.
+            s3_key (str): Exact key of the object.
+            use_cache (bool): Whether a cached result may be returned.
+
+        Returns:
+            Optional[dict]: {"etag", "last_modified", "size"} or None if the object does not exist.
+        """
+        try:
+            cache_key = (bucket_name, s3_key)
+            if use_cache and self.metadata_cache_ttl_seconds > 0:
+                with self._metadata_cache_lock:
+                    cached = self._metadata_cache.get(cache_key)
+                if cached is not None and cached[0] > time.monotonic():
+                    return cached[1]
+
+            try:
+                s3_object = self.s3_resource.Object(bucket_name, s3_key)
+                s3_object.load()
+                metadata = {
+                    "etag": s3_object.e_tag.strip('"'),
+                    "last_modified": s3_object.last_modified,
+                    "size": s3_object.content_length
+                }
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                    raise
+                metadata = None
+
+            if self.metadata_cache_ttl_seconds > 0:
+                with self._metadata_cache_lock:
+                    self._metadata_cache[cache_key] = (time.monotonic() + self.metadata_cache_ttl_seconds, metadata)
+            return metadata
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def invalidate_metadata(self, bucket_name: str, s3_key: str) -> None:
+        """
+        Drops the cached HEAD result of a key, e.g. after it was written or deleted.
+        """
+        with self._metadata_cache_lock:
+            self._metadata_cache.pop((bucket_name, s3_key), None)
+
+    def read_key(self, bucket_name: str, s3_key: str, decode: bool = True) -> Optional[Union[str, bytes]]:
+        """
+        Reads an object with a single GET request on its exact key.
+
+        Args:
+            bucket_name (str): Name of the S3 bucket.
+            s3_key (str): Exact key of the object.
+            decode (bool): Whether to decode the object content as a string.
+
+        Returns:
+            Optional[Union[str, bytes]]: The object content, or None if the object does not exist.
+        """
+        try:
+            try:
+                content = self.s3_resource.Object(bucket_name, s3_key).get()["Body"].read()
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                    return None
+                raise
+            return content.decode() if decode else content
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def download_file(self, bucket_name: str, s3_key: str, local_path: str) -> None:
+        """
+        Downloads an S3 object to a local file. The object is written to a temporary file next to
+        local_path and renamed into place, so readers never see a partially downloaded file.
+
+        Args:
+            bucket_name (str): Name of the S3 bucket.
+            s3_key (str): Exact key of the object.
+            local_path (str): Destination path on disk.
+        """
+        try:
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                self.s3_client.download_file(bucket_name, s3_key, tmp_path, Config=self.transfer_config)
+                os.replace(tmp_path, local_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logging.info(f"Downloaded s3://{bucket_name}/{s3_key} to {local_path}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def delete_object(self, bucket_name: str, s3_key: str) -> None:
+        """
+        Deletes an S3 object. Deleting a missing key is not an error.
+
+        Args:
+            bucket_name (str): Name of the S3 bucket.
+            s3_key (str): Exact key of the object.
+        """
+        try:
+            self.s3_resource.Object(bucket_name, s3_key).delete()
+            self.invalidate_metadata(bucket_name, s3_key)
+            logging.info(f"Deleted s3://{bucket_name}/{s3_key}")
         except Exception as e:
             raise MyException(e, sys) from e
 
@@ -123,8 +289,7 @@ class SimpleStorageService:
         try:
             model_file = model_dir + "/" + model_name if model_dir else model_name
             file_object = self.get_file_object(model_file, bucket_name)
-            model_obj = self.read_object(file_object, decode=False)
-            model = pickle.loads(model_obj)
+            model = pickle.load(self.get_object_stream(file_object))
             logging.info("Production model loaded from S3 bucket.")
             return model
         except Exception as e:
@@ -140,14 +305,14 @@ class SimpleStorageService:
         """
         logging.info("Entered the create_folder method of SimpleStorageService class")
         try:
-            # Check if folder exists by attempting to load it
-            self.s3_resource.Object(bucket_name, folder_name).load()
-        except ClientError as e:
-            # If folder does not exist, create it
-            if e.response["Error"]["Code"] == "404":
-                folder_obj = folder_name + "/"
-                self.s3_client.put_object(Bucket=bucket_name, Key=folder_obj)
+            folder_obj = folder_name.rstrip("/") + "/"
+            # Create the folder marker only if it does not exist yet
+            if self.get_object_metadata(bucket_name=bucket_name, s3_key=folder_obj) is None:
+                self.s3_client.put_object(Bucket=bucket_name, Key=folder_obj, Body=b"")
+                self.invalidate_metadata(bucket_name, folder_obj)
             logging.info("Exited the create_folder method of SimpleStorageService class")
+        except Exception as e:
+            raise MyException(e, sys) from e
 
     def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True):
         """
@@ -162,7 +327,8 @@ class SimpleStorageService:
         logging.info("Entered the upload_file method of SimpleStorageService class")
         try:
             logging.info(f"Uploading {from_filename} to {to_filename} in {bucket_name}")
-            self.s3_resource.meta.client.upload_file(from_filename, bucket_name, to_filename)
+            self.s3_client.upload_file(from_filename, bucket_name, to_filename, Config=self.transfer_config)
+            self.invalidate_metadata(bucket_name, to_filename)
             logging.info(f"Uploaded {from_filename} to {to_filename} in {bucket_name}")
 
             # Delete the local file if remove is True
@@ -192,32 +358,34 @@ class SimpleStorageService:
         except Exception as e:
             raise MyException(e, sys) from e
 
-    def get_df_from_object(self, object_: object) -> DataFrame:
+    def get_df_from_object(self, object_: object, **read_csv_kwargs) -> DataFrame:
         """
-        Converts an S3 object to a DataFrame.
+        Converts an S3 object to a DataFrame, parsing the CSV directly from the response stream
+        (no intermediate bytes, decoded string or StringIO copies).
 
         Args:
             object_ (object): The S3 object.
+            **read_csv_kwargs: passed to pandas.read_csv (e.g. usecols, dtype, chunksize)
 
         Returns:
             DataFrame: DataFrame created from the object content.
         """
         logging.info("Entered the get_df_from_object method of SimpleStorageService class")
         try:
-            content = self.read_object(object_, make_readable=True)
-            df = read_csv(content, na_values="na")
+            df = read_csv(self.get_object_stream(object_), na_values="na", **read_csv_kwargs)
             logging.info("Exited the get_df_from_object method of SimpleStorageService class")
             return df
         except Exception as e:
             raise MyException(e, sys) from e
 
-    def read_csv(self, filename: str, bucket_name: str) -> DataFrame:
+    def read_csv(self, filename: str, bucket_name: str, **read_csv_kwargs) -> DataFrame:
         """
         Reads a CSV file from the specified S3 bucket and converts it to a DataFrame.
 
         Args:
             filename (str): The name of the file in the bucket.
             bucket_name (str): The name of the S3 bucket.
+            **read_csv_kwargs: passed to pandas.read_csv (e.g. usecols, dtype, chunksize)
 
         Returns:
             DataFrame: DataFrame created from the CSV file.
@@ -225,7 +393,7 @@ class SimpleStorageService:
         logging.info("Entered the read_csv method of SimpleStorageService class")
         try:
             csv_obj = self.get_file_object(filename, bucket_name)
-            df = self.get_df_from_object(csv_obj)
+            df = self.get_df_from_object(csv_obj, **read_csv_kwargs)
             logging.info("Exited the read_csv method of SimpleStorageService class")
             return df
         except Exception as e:
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from src.cloud_storage.aws_storage import SimpleStorageService
+from src.constants import MODEL_REGISTRY_CACHE_EVICTION_GRACE_SECONDS
+from src.exception import MyException
+from src.logger import logging
+
+
+class ModelCache:
+    """
+    Content-addressed on-disk cache in front of S3 for model artifacts.
+
+    Objects are resolved with one HEAD request on their exact key and stored under their ETag and size,
+    so an unchanged object is never downloaded again, across restarts and across processes sharing the
+    directory. Downloads stream to a temporary file that is validated and then renamed into place.
+    The sha256 of every cached file is recorded on download and checked before the file is reused.
+    A version replaced by a newer one is only deleted eviction_grace_seconds later, as another process may
+    have resolved it just before and still be about to load it. Blobs recorded for a version (e.g. the blobs
+    of a bundle manifest) are deleted with it, unless a newer version uses them or they were used recently.
+    """
+
+    def __init__(self, cache_dir: str, s3: Optional[SimpleStorageService] = None, verify_checksum: bool = True,
+                 eviction_grace_seconds: float = MODEL_REGISTRY_CACHE_EVICTION_GRACE_SECONDS):
+        """
+        :param cache_dir: local cache directory, e.g. a volume shared by the replicas of one host
+        :param s3: storage service used for HEAD and GET requests
+        :param verify_checksum: re-hash cached files before reusing them
+        :param eviction_grace_seconds: time a replaced version is kept before it is deleted
+        """
+        self.cache_dir = cache_dir
+        self.s3 = s3 if s3 is not None else SimpleStorageService()
+        self.verify_checksum = verify_checksum
+        self.eviction_grace_seconds = eviction_grace_seconds
+
+    @staticmethod
+    def file_sha256(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_object_path(self, s3_key: str, etag: str, size: int) -> str:
+        """
+        Local path of one version of an object: the directory is named after its ETag and size.
+        """
+        return os.path.join(self.cache_dir, "objects", f"{etag}-{size}", os.path.basename(s3_key))
+
+    def _get_ref_path(self, bucket_name: str, s3_key: str) -> str:
+        ref_name = hashlib.sha256(f"{bucket_name}/{s3_key}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, "refs", f"{ref_name}.json")
+
+    def _is_valid(self, file_path: str, size: int, sha256: Optional[str]) -> bool:
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != size:
+            return False
+        if sha256 is None or not self.verify_checksum:
+            return True
+        if self.file_sha256(file_path) == sha256:
+            return True
+        logging.warning(f"Cached file {file_path} failed checksum validation, downloading it again")
+        return False
+
+    def _download(self, bucket_name: str, s3_key: str, file_path: str, size: int,
+                  sha256: Optional[str] = None) -> str:
+        """
+        Streams the object to a temporary file, validates size (and sha256 if known), then renames it into place.
+        Returns the sha256 of the downloaded file.
+        """
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.download"
+        try:
+            self.s3.download_file(bucket_name=bucket_name, s3_key=s3_key, local_path=tmp_path)
+            if os.path.getsize(tmp_path) != size:
+                raise ValueError(f"Downloaded {os.path.getsize(tmp_path)} bytes of s3://{bucket_name}/{s3_key}, expected {size}")
+            downloaded_sha256 = self.file_sha256(tmp_path)
+            if sha256 is not None and downloaded_sha256 != sha256:
+                raise ValueError(f"Checksum mismatch for s3://{bucket_name}/{s3_key}")
+            os.replace(tmp_path, file_path)
+            return downloaded_sha256
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def fetch(self, bucket_name: str, s3_key: str) -> str:
+        """
+        Method Name :   fetch
+        Description :   Returns a local path holding the current version of s3://bucket_name/s3_key.
+                        The exact key is resolved with a HEAD request; the object is downloaded only when
+                        no valid copy of that ETag/size is cached. The previous version of the key is evicted.
+
+        Output      :   Local file path
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            metadata = self.s3.get_object_metadata(bucket_name=bucket_name, s3_key=s3_key)
+            if metadata is None:
+                raise FileNotFoundError(f"s3://{bucket_name}/{s3_key} does not exist")
+
+            file_path = self.get_object_path(s3_key, metadata["etag"], metadata["size"])
+            checksum_path = f"{file_path}.sha256"
+            cached_sha256 = None
+            if os.path.exists(checksum_path):
+                with open(checksum_path, "r") as file_obj:
+                    cached_sha256 = file_obj.read().strip()
+
+            if cached_sha256 is not None and self._is_valid(file_path, metadata["size"], cached_sha256):
+                logging.info(f"Model cache hit for s3://{bucket_name}/{s3_key} ({metadata['etag']})")
+            else:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                downloaded_sha256 = self._download(bucket_name, s3_key, file_path, metadata["size"])
+                # processes sharing the cache may download the same version at once, each writes its own tmp file
+                tmp_checksum_path = f"{checksum_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_checksum_path, "w") as file_obj:
+                    file_obj.write(downloaded_sha256)
+                os.replace(tmp_checksum_path, checksum_path)
+                logging.info(f"Model cache miss for s3://{bucket_name}/{s3_key}, downloaded {metadata['size']} bytes")
+
+            self._update_ref(bucket_name, s3_key, file_path)
+            return file_path
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _read_ref(self, ref_path: str) -> dict:
+        if not os.path.exists(ref_path):
+            return {}
+        with open(ref_path, "r") as file_obj:
+            return json.load(file_obj)
+
+    def _write_ref(self, ref_path: str, ref: dict) -> None:
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        tmp_path = f"{ref_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(ref, file_obj)
+        os.replace(tmp_path, ref_path)
+
+    @staticmethod
+    def _remove(file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    def _update_ref(self, bucket_name: str, s3_key: str, file_path: str) -> None:
+        """
+        Records the cached version of a key. Versions it replaces are listed as stale and deleted once they
+        were replaced more than eviction_grace_seconds ago, so a process that resolved an older version
+        shortly before can still load it.
+        """
+        ref_path = self._get_ref_path(bucket_name, s3_key)
+        ref = self._read_ref(ref_path)
+        now = time.time()
+        stale = [entry for entry in ref.get("stale", []) if entry["path"] != file_path]
+        previous_path = ref.get("path")
+        if previous_path is not None and previous_path != file_path:
+            stale.append({"path": previous_path, "blobs": ref.get("blobs", []), "replaced_at": now})
+
+        expired = [entry for entry in stale if now - entry["replaced_at"] > self.eviction_grace_seconds]
+        stale = [entry for entry in stale if entry not in expired]
+        if previous_path == file_path and not expired:
+            return
+
+        # blobs of the new version are recorded by record_blobs once they are fetched
+        blobs = ref.get("blobs", []) if previous_path == file_path else []
+        self._write_ref(ref_path, {"bucket": bucket_name, "key": s3_key, "path": file_path,
+                                   "blobs": blobs, "stale": stale})
+
+        live_blobs = set(blobs).union(*(entry.get("blobs", []) for entry in stale))
+        for entry in expired:
+            self._remove(entry["path"])
+            self._remove(f"{entry['path']}.sha256")
+            try:
+                os.rmdir(os.path.dirname(entry["path"]))
+            except OSError:
+                pass
+            for blob_path in entry.get("blobs", []):
+                # fetch_blob touches the blobs it reuses: a recent mtime means a process is loading them
+                if blob_path not in live_blobs and os.path.exists(blob_path) \
+                        and now - os.path.getmtime(blob_path) > self.eviction_grace_seconds:
+                    self._remove(blob_path)
+
+    def record_blobs(self, bucket_name: str, s3_key: str, blob_paths: List[str]) -> None:
+        """
+        Ties the blobs fetched for the cached version of a key (e.g. the blobs of a bundle manifest) to that
+        version, so they are evicted together with it once it has been replaced.
+        """
+        try:
+            ref_path = self._get_ref_path(bucket_name, s3_key)
+            ref = self._read_ref(ref_path)
+            blob_paths = sorted(set(blob_paths))
+            if not ref or ref.get("blobs") == blob_paths:
+                return
+            ref["blobs"] = blob_paths
+            self._write_ref(ref_path, ref)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def fetch_blob(self, bucket_name: str, s3_key: str, file_path: str, sha256: str, size: int) -> str:
+        """
+        Makes sure file_path holds the blob with the given sha256, downloading it only if it is missing or corrupt.
+        Used for content-addressed blobs whose checksum is known from a manifest; record them with record_blobs.
+        """
+        try:
+            if self._is_valid(file_path, size, sha256):
+                # marks the blob as in use, so the eviction of an older version sharing it keeps it
+                os.utime(file_path)
+                return file_path
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            self._download(bucket_name, s3_key, file_path, size, sha256=sha256)
+            return file_path
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -1,56 +1,199 @@
+import json
 import os 
+import shutil
 import sys 
+from typing import Optional, Tuple
 
 from src.exception import MyException
 from src.logger import logging
 
+import pandas as pd
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
 from src.entity.config_entity import DataIngestionConfig
 from src.entity.artifact_entity import DataIngestionArtifact
 from src.data_access.proj_data import ProjData
+from src.constants import SCHEMA_FILE_PATH
+from src.utils.main_utils import read_yaml_file,save_dataframe,apply_schema_dtypes
+from src.utils.artifact_writer import ArtifactWriter
 
 class DataIngestion:
-    def __init__(self,data_ingestion_config:DataIngestionConfig= DataIngestionConfig()):
+    def __init__(self,data_ingestion_config:DataIngestionConfig= DataIngestionConfig(),
+                 artifact_writer:Optional[ArtifactWriter] = None):
         """
         data_ingestion_config: configuration for data ingestion
+        artifact_writer: if given, the splits are handed to the next stage in memory and
+                         the files are written in the background by this writer
         """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.artifact_writer = artifact_writer
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             raise MyException(e,sys)
         
-    def export_data_into_feature_store(self)-> DataFrame:
+    def _save_dataframe(self, file_path: str, dataframe: DataFrame)-> None:
+        if self.artifact_writer is not None:
+            self.artifact_writer.submit(save_dataframe, file_path, dataframe)
+        else:
+            save_dataframe(file_path, dataframe)
+
+    def _read_watermark(self)-> Optional[dict]:
         """
-        Method name: export_data_into_feature_store
-        Description: exports data from mongoDB to csv files
+        Returns the persisted watermark of the local snapshot, or None if there is no usable snapshot
+        """
+        watermark_file_path = self.data_ingestion_config.watermark_file_path
+        if not os.path.exists(watermark_file_path):
+            return None
+        with open(watermark_file_path) as watermark_file:
+            watermark = json.load(watermark_file)
+        if watermark.get("partition_key") != self.data_ingestion_config.partition_key:
+            logging.info("Snapshot watermark was built on another partition key, rebuilding the snapshot")
+            return None
+        return watermark
+
+    def _write_watermark(self, watermark_value: int, n_rows: int)-> None:
+        watermark = {
+            "partition_key": self.data_ingestion_config.partition_key,
+            "watermark": int(watermark_value),
+            "n_rows": int(n_rows)
+        }
+        tmp_path = self.data_ingestion_config.watermark_file_path + ".tmp"
+        with open(tmp_path, "w") as watermark_file:
+            json.dump(watermark, watermark_file, indent=4)
+        os.replace(tmp_path, self.data_ingestion_config.watermark_file_path)
+
+    def _read_snapshot(self)-> Optional[DataFrame]:
+        """
+        Returns the local snapshot, or None if no snapshot parts are left
+        """
+        snapshot_dir = self.data_ingestion_config.snapshot_dir
+        if not os.path.isdir(snapshot_dir):
+            return None
+        part_files = sorted(file_name for file_name in os.listdir(snapshot_dir) if file_name.endswith(".parquet"))
+        if not part_files:
+            return None
+        parts = [pd.read_parquet(os.path.join(snapshot_dir, file_name)) for file_name in part_files]
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    def _build_snapshot(self, data: ProjData)-> DataFrame:
+        """
+        Exports the full collection and writes it as the new snapshot with its watermark
+        """
+        config = self.data_ingestion_config
+        partition_key = config.partition_key
+        dataframe = data.export_collection_partitioned(collection_name=config.collection_name,
+                                                       partition_key=partition_key,
+                                                       n_workers=config.n_read_workers,
+                                                       batch_size=config.mongo_batch_size,
+                                                       create_index=config.create_partition_index)
+        if dataframe[partition_key].notna().sum() == 0:
+            logging.info(f"No '{partition_key}' values to build a watermark on, snapshot not written")
+            return dataframe
+        shutil.rmtree(config.snapshot_dir, ignore_errors=True)
+        os.makedirs(config.snapshot_dir, exist_ok=True)
+        dataframe.to_parquet(os.path.join(config.snapshot_dir, "part-base.parquet"), index=False)
+        self._write_watermark(dataframe[partition_key].max(), len(dataframe))
+        return dataframe
 
-        Output: data is returned as artifact of data ingestion component
+    def export_incremental_snapshot(self, data: ProjData)-> DataFrame:
+        """
+        Method name: export_incremental_snapshot
+        Description: keeps a local columnar snapshot of the collection plus a watermark (max partition key)
+                     and only fetches documents inserted after the watermark. This assumes an append-only
+                     collection: updates and deletes of documents below the watermark are not picked up.
+                     A snapshot that lost its parts or whose row count differs from the watermark is rebuilt
+
+        Output: the full, up to date collection as a DataFrame
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            config = self.data_ingestion_config
+            partition_key = config.partition_key
+            watermark = self._read_watermark()
+
+            if watermark is None:
+                logging.info("No snapshot found, exporting the full collection")
+                return self._build_snapshot(data)
+
+            snapshot = self._read_snapshot()
+            if snapshot is None or len(snapshot) != watermark["n_rows"]:
+                logging.info(f"Snapshot is missing or inconsistent with its watermark "
+                             f"({0 if snapshot is None else len(snapshot)} rows, expected {watermark['n_rows']}), "
+                             f"exporting the full collection")
+                return self._build_snapshot(data)
+
+            last_value = watermark["watermark"]
+            delta = data.export_collection_as_dataframe(collection_name=config.collection_name,
+                                                        batch_size=config.mongo_batch_size,
+                                                        query={partition_key: {"$gt": last_value}})
+            logging.info(f"Fetched {len(delta)} new documents after {partition_key} > {last_value}")
+
+            if len(delta) > 0:
+                # named after the previous watermark, so a retried run overwrites instead of duplicating
+                delta.to_parquet(os.path.join(config.snapshot_dir, f"part-delta-{last_value:012d}.parquet"), index=False)
+                self._write_watermark(delta[partition_key].max(), watermark["n_rows"] + len(delta))
+                snapshot = pd.concat([snapshot, delta], ignore_index=True)
+
+            return snapshot
+
+        except Exception as e:
+            raise MyException(e,sys)
+
+    def fetch_data(self)-> DataFrame:
+        """
+        Method name: fetch_data
+        Description: exports data from mongoDB (through the local snapshot in incremental mode)
+                     and applies the schema dtypes
+
+        Output: the collection is returned as a DataFrame
         On Failure: Write an exception log and raise an exception
         """
         try:
             logging.info("Exporting data from mongoDB...")
             data = ProjData()
-            dataframe  = data.export_collection_as_dataframe(collection_name=DataIngestionConfig.collection_name)
+            if self.data_ingestion_config.incremental:
+                dataframe = self.export_incremental_snapshot(data)
+            else:
+                dataframe  = data.export_collection_partitioned(collection_name=self.data_ingestion_config.collection_name,
+                                                                partition_key=self.data_ingestion_config.partition_key,
+                                                                n_workers=self.data_ingestion_config.n_read_workers,
+                                                                batch_size=self.data_ingestion_config.mongo_batch_size,
+                                                                create_index=self.data_ingestion_config.create_partition_index)
             logging.info(f"Shape of dataframe: {dataframe.shape}")
+            return apply_schema_dtypes(dataframe, self._schema_config)
+
+        except Exception as e:
+            raise MyException(e,sys)
+
+    def export_data_into_feature_store(self, dataframe: Optional[DataFrame] = None)-> DataFrame:
+        """
+        Method name: export_data_into_feature_store
+        Description: exports data from mongoDB to the feature store file (parquet, feather or csv).
+                     A dataframe already returned by fetch_data is written as it is
+
+        Output: data is returned as artifact of data ingestion component
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            if dataframe is None:
+                dataframe = self.fetch_data()
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
-            dir_path = os.path.dirname(feature_store_file_path)
-            os.makedirs(dir_path,exist_ok=True)
             logging.info(f"Saving exported data into fetaure store file path:{feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
+            self._save_dataframe(feature_store_file_path, dataframe)
             return dataframe
 
         except Exception as e:
             raise MyException(e,sys)
 
 
-    def split_data_as_train_test(self,dataframe: DataFrame)-> None:
+    def split_data_as_train_test(self,dataframe: DataFrame)-> Tuple[DataFrame,DataFrame]:
         """
         Method name: split_data_as_train_test
         Description: splits dataframe into train and test sets in the given split ratio
 
-        Output: Train and test CSVs are saved to local filesystem.
+        Output: Train and test files are saved to local filesystem and the splits are returned.
         On Failure: Write an exception log and raise an exception
         """
         logging.info("Entered split_data_as_train_test method of 'DataIngestion' class...")
@@ -58,41 +201,40 @@ class DataIngestion:
         try:
             train_set,test_set = train_test_split(dataframe,test_size=self.data_ingestion_config.train_test_split_ratio)
             logging.info("Performed train_test_split on the dataframe")
-            train_dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
-            os.makedirs(train_dir_path,exist_ok=True)
-
-            test_dir_path = os.path.dirname(self.data_ingestion_config.testing_file_path)
-            os.makedirs(test_dir_path,exist_ok=True)
-
             logging.info("Exporting train and test file path..")
-            train_set.to_csv(self.data_ingestion_config.training_file_path,index = False,header = True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path,index = False,header = True)
+            self._save_dataframe(self.data_ingestion_config.training_file_path, train_set)
+            self._save_dataframe(self.data_ingestion_config.testing_file_path, test_set)
 
             logging.info("Exported train and test file path !!!")
             logging.info(
                 "Exited split_data_as_train_test method of DataIngestion class"
             )
+            return train_set,test_set
         except Exception as e:
             raise MyException(e,sys)
         
-    def initiate_data_ingestion(self)-> DataIngestionArtifact:
+    def initiate_data_ingestion(self, dataframe: Optional[DataFrame] = None)-> DataIngestionArtifact:
         """
         Method name: initiate_data_ingestion
         Description: initiates the data ingestion components of training pipeline
+                     dataframe: data already fetched with fetch_data (e.g. to fingerprint it), fetched here if None
 
         Output: Train and test sets are returned as the artifacts of data ingestion components
         On Failure: Write an exception log and raise an exception
         """
         logging.info("Entered initiate_data_ingestion method of the DataIngestion class")
         try:
-            dataframe = self.export_data_into_feature_store()
+            dataframe = self.export_data_into_feature_store(dataframe)
 
             logging.info("Got the data from MongoDB")
             
-            self.split_data_as_train_test(dataframe)
+            train_set,test_set = self.split_data_as_train_test(dataframe)
 
             data_ingestion_artifact = DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
                                                             test_file_path=self.data_ingestion_config.testing_file_path)
+            if self.artifact_writer is not None:
+                data_ingestion_artifact.train_df = train_set
+                data_ingestion_artifact.test_df = test_set
             
             logging.info(f"Data Ingestion Artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
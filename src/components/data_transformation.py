@@ -1,36 +1,57 @@
+import json
+import os
 import sys
+import time
+import tracemalloc
+from typing import Optional, Tuple
+
 import numpy as np
 import pandas as pd 
 from imblearn.combine import SMOTEENN # pyright: ignore[reportMissingImports]
+from imblearn.over_sampling import SMOTE, RandomOverSampler # pyright: ignore[reportMissingImports]
+from imblearn.under_sampling import EditedNearestNeighbours, RandomUnderSampler # pyright: ignore[reportMissingImports]
+from sklearn.neighbors import NearestNeighbors
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler,MinMaxScaler
 from sklearn.compose import ColumnTransformer
+from sklearn.utils.class_weight import compute_class_weight
 
 from src.constants import *
 from src.exception import MyException
 from src.logger import logging
 from src.entity.config_entity import DataTransformationConfig
 from src.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact
-from src.utils.main_utils import save_object,save_numpy_array_data,read_yaml_file
+from src.entity.feature_encoder import VehicleFeatureEncoder
+from src.entity.fused_preprocessor import FusedAffinePreprocessor
+from src.utils.main_utils import save_object,save_numpy_array_data,read_yaml_file,read_dataframe,to_compact_target
+from src.utils.artifact_writer import ArtifactWriter
 
 
 class DataTransformation:
 
     def __init__(self,data_ingestion_artifact: DataIngestionArtifact,
                  data_validation_artifact: DataValidationArtifact,
-                 data_transformation_config: DataTransformationConfig):
+                 data_transformation_config: DataTransformationConfig,
+                 artifact_writer: Optional[ArtifactWriter] = None):
+        """
+        artifact_writer: if given, the transformed arrays and the preprocessor are handed to the
+                         next stage in memory and the files are written in the background by this writer
+        """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
+            self.artifact_writer = artifact_writer
             self.data_validation_artifact = data_validation_artifact
             self.data_transformation_config = data_transformation_config
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             raise MyException(e,sys)
         
-    @staticmethod
-    def read_data(file_path)-> pd.DataFrame:
+    def read_data(self,file_path)-> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            # only the columns the transformation uses are read
+            drop_col = self._schema_config['drop_columns']
+            columns = [column for entry in self._schema_config['columns'] for column in entry if column != drop_col]
+            return read_dataframe(file_path, columns=columns, schema_config=self._schema_config)
         except Exception as e:
             raise MyException(e,sys)
 
@@ -74,37 +95,133 @@ class DataTransformation:
             logging.exception("Exception occured in get_data_transformer_object method of DataTransformation class")
             raise MyException(e,sys) from e 
         
-    def _map_gender_column(self, df:pd.DataFrame):
-        """Map Gender column to 0 for Female and 1 for Male."""
-        logging.info("Mapping 'Gender' column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
-        return df
-
-    def _drop_id_column(self, df:pd.DataFrame):
-        """Drop the 'id' column if it exists."""
-        logging.info("Dropping 'id' column")
-        drop_col = self._schema_config['drop_columns']
-        if drop_col in df.columns:
-            df = df.drop(drop_col, axis=1)
-        return df
-
-    def _create_dummy_columns(self, df:pd.DataFrame):
-        """Create dummy variables for categorical features."""
-        logging.info("Creating dummy variables for categorical features")
-        df = pd.get_dummies(df, drop_first=True)
-        return df
-
-    def _rename_columns(self, df:pd.DataFrame):
-        """Rename specific columns and ensure integer types for dummy columns."""
-        logging.info("Renaming specific columns and casting to int")
-        df = df.rename(columns={
-            "Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
-            "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"
-        })
-        for col in ["Vehicle_Age_lt_1_Year", "Vehicle_Age_gt_2_Years", "Vehicle_Damage_Yes"]:
-            if col in df.columns:
-                df[col] = df[col].astype('int')
-        return df
+    def get_fused_preprocessor(self, preprocessor: Pipeline, input_feature_df: pd.DataFrame) -> Optional[FusedAffinePreprocessor]:
+        """
+        Method name: get_fused_preprocessor
+        Description: precomputes the fitted preprocessor as one affine transform for serving and checks
+                     that it gives exactly the same output as the sklearn pipeline on input_feature_df
+
+        Output: Returns the fused preprocessor, or None if the pipeline cannot be fused or the outputs differ
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            if not FusedAffinePreprocessor.is_supported(preprocessor):
+                logging.info("Preprocessor cannot be fused, serving will use the sklearn pipeline")
+                return None
+            fused_preprocessor = FusedAffinePreprocessor.from_pipeline(preprocessor)
+            mismatch = fused_preprocessor.check_parity(preprocessor, input_feature_df)
+            if mismatch is not None:
+                logging.warning(f"Fused preprocessor does not match the sklearn pipeline ({mismatch})")
+                return None
+            logging.info("Fused preprocessor matches the sklearn pipeline")
+            return fused_preprocessor
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_resampler(self) -> Optional[object]:
+        """
+        Method name: get_resampler
+        Description: creates the imblearn resampler of the configured rebalance strategy. Neighbour searches
+                     (smote, smoteenn) run on a NearestNeighbors index using rebalance_n_jobs cores
+
+        Output: Returns the resampler, or None for the "class_weight" and "none" strategies
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            strategy = config.rebalance_strategy
+            if strategy in ("class_weight", "none"):
+                return None
+            if strategy == "random_under":
+                return RandomUnderSampler(random_state=config.rebalance_random_state)
+            if strategy == "random_over":
+                return RandomOverSampler(random_state=config.rebalance_random_state)
+
+            # imblearn takes a neighbours estimator whose n_neighbors counts the sample itself
+            smote = SMOTE(sampling_strategy="minority", random_state=config.rebalance_random_state,
+                          k_neighbors=NearestNeighbors(n_neighbors=config.rebalance_k_neighbors + 1,
+                                                       n_jobs=config.rebalance_n_jobs))
+            if strategy == "smote":
+                return smote
+            if strategy == "smoteenn":
+                enn = EditedNearestNeighbours(sampling_strategy="all",
+                                              n_neighbors=NearestNeighbors(n_neighbors=4, n_jobs=config.rebalance_n_jobs))
+                return SMOTEENN(sampling_strategy="minority", random_state=config.rebalance_random_state,
+                                smote=smote, enn=enn)
+            raise ValueError(f"Unknown rebalance strategy: {strategy}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def rebalance(self, features: np.ndarray, target: pd.Series) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Method name: rebalance
+        Description: applies the configured rebalance strategy to one split, measuring its wall time and
+                     the peak memory it allocates (tracemalloc, which numpy reports its buffers to)
+
+        Output: Returns the rebalanced features, target and a report of the run
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            strategy = self.data_transformation_config.rebalance_strategy
+            target = np.asarray(target)
+            classes_before, counts_before = np.unique(target, return_counts=True)
+
+            was_tracing = tracemalloc.is_tracing()
+            if was_tracing:
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+            start_time = time.perf_counter()
+            try:
+                resampler = self.get_resampler()
+                if resampler is not None:
+                    features, target = resampler.fit_resample(features, target)
+                seconds = time.perf_counter() - start_time
+                peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            classes_after, counts_after = np.unique(target, return_counts=True)
+            report = {
+                "strategy": strategy,
+                "seconds": seconds,
+                "peak_memory_bytes": peak_memory_bytes,
+                "rows_before": int(counts_before.sum()),
+                "rows_after": int(counts_after.sum()),
+                "class_counts_before": {str(c): int(n) for c, n in zip(classes_before, counts_before)},
+                "class_counts_after": {str(c): int(n) for c, n in zip(classes_after, counts_after)},
+            }
+            logging.info(f"Rebalanced with {strategy} in {seconds:.2f}s (peak {peak_memory_bytes / 2**20:.1f} MiB): "
+                         f"{report['class_counts_before']} -> {report['class_counts_after']}")
+            return features, target, report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_class_weight(self, target: np.ndarray) -> Optional[dict]:
+        """
+        Balanced class weights (n_samples / (n_classes * class count)) for the "class_weight" strategy, else None.
+        """
+        if self.data_transformation_config.rebalance_strategy != "class_weight":
+            return None
+        classes = np.unique(target)
+        weights = compute_class_weight(class_weight="balanced", classes=classes, y=target)
+        return {int(c): float(w) for c, w in zip(classes, weights)}
+
+    def get_feature_encoder(self, input_feature_df: pd.DataFrame) -> VehicleFeatureEncoder:
+        """
+        Method name: get_feature_encoder
+        Description: fits the schema-driven encoder turning raw records (Gender 'Male'/'Female', Vehicle_Age
+                     strings, ...) into model features. The same fitted encoder is stored in MyModel, so
+                     training and serving encode records identically
+
+        Output: Returns the fitted feature encoder
+        On Failure: Write an exception log and raise an exception
+        """
+        try:
+            return VehicleFeatureEncoder.fit(schema_config=self._schema_config, dataframe=input_feature_df)
+        except Exception as e:
+            raise MyException(e, sys) from e
 
     def initiate_data_transformation(self) -> DataTransformationArtifact:
         """
@@ -116,8 +233,12 @@ class DataTransformation:
                 raise Exception(self.data_validation_artifact.message)
 
             # Load train and test data
-            train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+            if self.data_ingestion_artifact.train_df is not None:
+                train_df = self.data_ingestion_artifact.train_df
+                test_df = self.data_ingestion_artifact.test_df
+            else:
+                train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
+                test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path)
             logging.info("Train-Test data loaded")
 
             input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
@@ -127,17 +248,11 @@ class DataTransformation:
             target_feature_test_df = test_df[TARGET_COLUMN]
             logging.info("Input and Target cols defined for both train and test df.")
 
-            # Apply custom transformations in specified sequence
-            input_feature_train_df = self._map_gender_column(input_feature_train_df)
-            input_feature_train_df = self._drop_id_column(input_feature_train_df)
-            input_feature_train_df = self._create_dummy_columns(input_feature_train_df)
-            input_feature_train_df = self._rename_columns(input_feature_train_df)
-
-            input_feature_test_df = self._map_gender_column(input_feature_test_df)
-            input_feature_test_df = self._drop_id_column(input_feature_test_df)
-            input_feature_test_df = self._create_dummy_columns(input_feature_test_df)
-            input_feature_test_df = self._rename_columns(input_feature_test_df)
-            logging.info("Custom transformations applied to train and test data")
+            # Encode raw records into model features (the id column is not an encoder input)
+            feature_encoder = self.get_feature_encoder(input_feature_train_df)
+            input_feature_train_df = feature_encoder.transform_frame(input_feature_train_df)
+            input_feature_test_df = feature_encoder.transform_frame(input_feature_test_df)
+            logging.info("Feature encoding applied to train and test data")
 
             logging.info("Starting data transformation")
             preprocessor = self.get_data_transformer_object()
@@ -148,32 +263,79 @@ class DataTransformation:
             logging.info("Initializing transformation for Testing-data")
             input_feature_test_arr = preprocessor.transform(input_feature_test_df)
             logging.info("Transformation done end to end to train-test df.")
+            fused_preprocessor = self.get_fused_preprocessor(preprocessor, input_feature_test_df)
 
-            logging.info("Applying SMOTEENN for handling imbalanced dataset.")
-            smt = SMOTEENN(sampling_strategy="minority")
-            input_feature_train_final, target_feature_train_final = smt.fit_resample(
+            config = self.data_transformation_config
+            logging.info(f"Applying {config.rebalance_strategy} rebalancing for handling imbalanced dataset.")
+            rebalance_report = {}
+            input_feature_train_final, target_feature_train_final, rebalance_report["train"] = self.rebalance(
                 input_feature_train_arr, target_feature_train_df
             )
-            input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                input_feature_test_arr, target_feature_test_df
-            )
-            logging.info("SMOTEENN applied to train-test df.")
+            if config.rebalance_test:
+                input_feature_test_final, target_feature_test_final, rebalance_report["test"] = self.rebalance(
+                    input_feature_test_arr, target_feature_test_df
+                )
+            else:
+                input_feature_test_final, target_feature_test_final = input_feature_test_arr, target_feature_test_df
+            class_weight = self.get_class_weight(np.asarray(target_feature_train_final))
+            rebalance_report["class_weight"] = class_weight
+
+            os.makedirs(os.path.dirname(config.rebalance_report_file_path), exist_ok=True)
+            with open(config.rebalance_report_file_path, "w") as f:
+                json.dump(rebalance_report, f, indent=4)
 
-            train_arr = np.c_[input_feature_train_final, np.array(target_feature_train_final)]
-            test_arr = np.c_[input_feature_test_final, np.array(target_feature_test_final)]
-            logging.info("feature-target concatenation done for train-test df.")
+            # features and target are kept as separate contiguous arrays so training can memory-map them
+            # and use them as they are, without slicing a combined matrix into new copies
+            feature_dtype = self.data_transformation_config.feature_dtype
+            train_features = np.ascontiguousarray(input_feature_train_final, dtype=feature_dtype)
+            test_features = np.ascontiguousarray(input_feature_test_final, dtype=feature_dtype)
+            train_target = to_compact_target(np.asarray(target_feature_train_final))
+            test_target = to_compact_target(np.asarray(target_feature_test_final))
+            logging.info(f"Features stored as {feature_dtype}, target as {train_target.dtype}")
 
-            save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-            save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-            save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+            arrays_to_save = [(config.transformed_train_features_file_path, train_features),
+                              (config.transformed_train_target_file_path, train_target),
+                              (config.transformed_test_features_file_path, test_features),
+                              (config.transformed_test_target_file_path, test_target)]
+            objects_to_save = [(config.transformed_object_file_path, preprocessor),
+                               (config.feature_encoder_file_path, feature_encoder)]
+            if fused_preprocessor is not None:
+                objects_to_save.append((config.fused_object_file_path, fused_preprocessor))
+            if self.artifact_writer is not None:
+                for file_path, obj in objects_to_save:
+                    self.artifact_writer.submit(save_object, file_path, obj)
+                for file_path, array in arrays_to_save:
+                    self.artifact_writer.submit(save_numpy_array_data, file_path, array=array)
+            else:
+                for file_path, obj in objects_to_save:
+                    save_object(file_path, obj)
+                for file_path, array in arrays_to_save:
+                    save_numpy_array_data(file_path, array=array)
             logging.info("Saving transformation object and transformed files.")
 
-            logging.info("Data transformation completed successfully")
-            return DataTransformationArtifact(
-                transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
-                transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
+            data_transformation_artifact = DataTransformationArtifact(
+                transformed_object_file_path=config.transformed_object_file_path,
+                transformed_train_features_file_path=config.transformed_train_features_file_path,
+                transformed_train_target_file_path=config.transformed_train_target_file_path,
+                transformed_test_features_file_path=config.transformed_test_features_file_path,
+                transformed_test_target_file_path=config.transformed_test_target_file_path,
+                fused_object_file_path=config.fused_object_file_path if fused_preprocessor is not None else None,
+                feature_encoder_file_path=config.feature_encoder_file_path,
+                rebalance_report_file_path=config.rebalance_report_file_path,
+                class_weight=class_weight,
+                test_resampled=config.rebalance_test
             )
+            if self.artifact_writer is not None:
+                data_transformation_artifact.train_features = train_features
+                data_transformation_artifact.train_target = train_target
+                data_transformation_artifact.test_features = test_features
+                data_transformation_artifact.test_target = test_target
+                data_transformation_artifact.preprocessing_object = preprocessor
+                data_transformation_artifact.fused_preprocessing_object = fused_preprocessor
+                data_transformation_artifact.feature_encoder_object = feature_encoder
+
+            logging.info("Data transformation completed successfully")
+            return data_transformation_artifact
 
         except Exception as e:
             raise MyException(e, sys) from e
@@ -8,7 +8,7 @@ from pandas import DataFrame
 
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file,write_yaml_file
+from src.utils.main_utils import read_yaml_file,write_yaml_file,read_dataframe
 from src.entity.config_entity import DataValidationConfig
 from src.entity.artifact_entity import DataValidationArtifact, DataIngestionArtifact
 from src.constants import SCHEMA_FILE_PATH
@@ -73,10 +73,9 @@ class DataValidation:
         except Exception as e:
             raise MyException(e,sys)
         
-    @staticmethod
-    def read_data(file_path)->DataFrame:
+    def read_data(self,file_path)->DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path, schema_config=self._schema_config)
         except Exception as e:
             raise MyException(e,sys)
         
@@ -91,8 +90,12 @@ class DataValidation:
         try:
             validation_error_msg = ""
             logging.info("Starting data validation...")
-            train_df,test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            if self.data_ingestion_artifact.train_df is not None:
+                # splits handed over in memory by data ingestion, no re-parse needed
+                train_df,test_df = self.data_ingestion_artifact.train_df,self.data_ingestion_artifact.test_df
+            else:
+                train_df,test_df = (self.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
+                                    self.read_data(file_path=self.data_ingestion_artifact.test_file_path))
             
             # Checking column length of dataframes
             status = self.validate_number_of_columns(train_df)
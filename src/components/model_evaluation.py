@@ -1,11 +1,16 @@
 from src.entity.config_entity import ModelEvaluationConfig
-from src.entity.artifact_entity import ModelTrainerArtifact, ModelEvaluationArtifact
+from src.entity.artifact_entity import DataIngestionArtifact, ModelTrainerArtifact, ModelEvaluationArtifact
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import load_object
+from src.utils.main_utils import load_object, read_dataframe, read_yaml_file
 from src.entity.s3_manager import ProductionModelManager 
+from src.cloud_storage.aws_storage import SimpleStorageService
+from src.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+from sklearn.metrics import f1_score
+from pandas import DataFrame
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
+import json
 import sys
 
 
@@ -20,10 +25,16 @@ class EvaluateModelResponse:
 class ModelEvaluation:
     def __init__(self,
                  model_evaluation_config: ModelEvaluationConfig,
-                 model_trainer_artifact: ModelTrainerArtifact):
+                 model_trainer_artifact: ModelTrainerArtifact,
+                 data_ingestion_artifact: Optional[DataIngestionArtifact] = None):
+        """
+        data_ingestion_artifact: the current raw test split, on which the trained and the production
+                                 model are both scored. Without it the stored production F1 is used
+        """
         try:
             self.model_evaluation_config = model_evaluation_config
             self.model_trainer_artifact = model_trainer_artifact
+            self.data_ingestion_artifact = data_ingestion_artifact
 
             # Initialize the production model manager (merged logic for model & metric)
             self.production_model_mgr = ProductionModelManager(
@@ -34,34 +45,95 @@ class ModelEvaluation:
         except Exception as e:
             raise MyException(e, sys) from e
 
+    def get_evaluation_protocol(self) -> Optional[dict]:
+        """
+        How the trained model's F1 was measured (e.g. on the original or on a resampled test split).
+        """
+        with open(self.model_trainer_artifact.metric_file_path, "r") as metric_file:
+            return json.load(metric_file).get("evaluation_protocol")
+
     def get_production_model_metrics(self) -> Optional[float]:
         """
         Retrieves the stored F1 score of the production model from S3.
-        Returns None if no metrics are found.
+        Returns None if no metrics are found, or if they were measured under another evaluation
+        protocol than the trained model's (e.g. on a resampled test split), as the scores are not comparable.
         """
         try:
-            f1_score_val = self.production_model_mgr.get_f1_score()
+            try:
+                metrics = self.production_model_mgr.load_metrics(missing_ok=True)
+            except Exception as e:
+                logging.warning(f"Failed to load production metrics: {e}")
+                metrics = None
 
-            if f1_score_val == 0.0:
+            if metrics is None or not metrics.get("f1_score"):
                 logging.info("Production model F1 score is 0.0 or missing. Assuming first run.")
                 return None
 
-            return f1_score_val
+            evaluation_protocol = self.get_evaluation_protocol()
+            if metrics.get("evaluation_protocol") != evaluation_protocol:
+                logging.warning(f"Production F1 was measured under protocol {metrics.get('evaluation_protocol')}, "
+                                f"the trained model under {evaluation_protocol}: scores are not compared")
+                return None
+
+            return metrics["f1_score"]
 
         except Exception as e:
             raise MyException(e,sys)
 
+    def get_test_split(self) -> Optional[DataFrame]:
+        if self.data_ingestion_artifact is None:
+            return None
+        if self.data_ingestion_artifact.test_df is not None:
+            return self.data_ingestion_artifact.test_df
+        return read_dataframe(self.data_ingestion_artifact.test_file_path,
+                              schema_config=read_yaml_file(file_path=SCHEMA_FILE_PATH))
+
+    def score_models_on_test_split(self) -> Optional[Tuple[float, float]]:
+        """
+        Method Name :   score_models_on_test_split
+        Description :   Scores the trained model and the production model on the same current raw test split,
+                        so their F1 scores are comparable whatever protocol the stored metrics came from
+
+        Output      :   Returns (trained model F1, production model F1), or None if there is no test split,
+                        no production model, or the production model cannot score the current records
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            test_df = self.get_test_split()
+            if test_df is None or not self.production_model_mgr.is_model_present():
+                return None
+            input_features, target = test_df.drop(columns=[TARGET_COLUMN]), test_df[TARGET_COLUMN]
+
+            trained_model = load_object(file_path=self.model_trainer_artifact.trained_model_file_path)
+            trained_model_f1_score = f1_score(target, trained_model.predict(input_features))
+            try:
+                production_model_f1_score = f1_score(target, self.production_model_mgr.predict(input_features))
+            except Exception as e:
+                logging.warning(f"Production model could not be scored on the current test split: {e}")
+                return None
+
+            logging.info(f"F1 on the current test split: trained {trained_model_f1_score}, production {production_model_f1_score}")
+            return float(trained_model_f1_score), float(production_model_f1_score)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def evaluate_model(self) -> EvaluateModelResponse:
         """
         Compares the trained model's F1 score with the production model's F1 score.
+        Both models are re-scored on the current test split when possible, else the stored production F1
+        is used if it was measured under the same protocol.
         Returns an evaluation response indicating if the new model is better.
         """
         try:
-            trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
+            scores = self.score_models_on_test_split()
+            if scores is not None:
+                trained_model_f1_score, best_model_f1_score = scores
+            else:
+                trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
+                best_model_f1_score = self.get_production_model_metrics()
             logging.info(f"Trained model F1 score: {trained_model_f1_score}")
 
-            best_model_f1_score = self.get_production_model_metrics()
-
             if best_model_f1_score is None:
                 logging.info("No production model metrics found — assuming first run.")
                 tmp_best_model_score = 0.0
@@ -91,7 +163,12 @@ class ModelEvaluation:
         try:
             print("------------------------------------------------------------------------------------------------")
             logging.info("Initialized Model Evaluation Component.")
+            s3_calls_before = SimpleStorageService.get_api_call_counts()
             evaluate_model_response = self.evaluate_model()
+            s3_calls = {operation: count - s3_calls_before.get(operation, 0)
+                        for operation, count in SimpleStorageService.get_api_call_counts().items()
+                        if count != s3_calls_before.get(operation, 0)}
+            logging.info(f"S3 API calls during model evaluation: {sum(s3_calls.values())} {s3_calls}")
 
             model_evaluation_artifact = ModelEvaluationArtifact(
                 is_model_accepted=evaluate_model_response.is_model_accepted,
@@ -99,7 +176,8 @@ class ModelEvaluation:
                 s3_metric_path=self.model_evaluation_config.s3_metric_key_path,
                 trained_model_path=self.model_trainer_artifact.trained_model_file_path,
                 metric_file_path = self.model_trainer_artifact.metric_file_path,
-                changed_metric=evaluate_model_response.difference
+                changed_metric=evaluate_model_response.difference,
+                model_bundle_dir=self.model_trainer_artifact.model_bundle_dir
             )
 
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
@@ -21,7 +21,8 @@ class ModelPusher:
         self.prod_manager = ProductionModelManager(
             bucket_name=model_pusher_config.bucket_name,
             model_path=model_pusher_config.s3_model_key_path,
-            metric_path=model_pusher_config.s3_metric_key_path
+            metric_path=model_pusher_config.s3_metric_key_path,
+            bundle_prefix=model_pusher_config.s3_model_bundle_prefix
         )
 
     def initiate_model_pusher(self) -> ModelPusherArtifact:
@@ -45,7 +46,8 @@ class ModelPusher:
             # Push trained model
             self.prod_manager.save_model_and_metrics(
                 model_path=self.model_evaluation_artifact.trained_model_path,
-                metrics_path=self.model_evaluation_artifact.metric_file_path
+                metrics_path=self.model_evaluation_artifact.metric_file_path,
+                model_bundle_dir=self.model_evaluation_artifact.model_bundle_dir
             )
 
             model_pusher_artifact = ModelPusherArtifact(
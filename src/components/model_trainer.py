@@ -1,76 +1,250 @@
+import hashlib
+import os
 import sys
-from typing import Tuple
+import time
+from typing import Optional, Tuple
 import json
 from dataclasses import asdict
 
+import dill
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import clone
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import load_numpy_array_data, load_object, save_object
+from src.utils.main_utils import import_class, load_numpy_array_data, load_object, read_yaml_file, save_object
 from src.entity.config_entity import ModelTrainerConfig
-from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTunerArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
 from src.entity.estimator import MyModel
+from src.entity.compiled_forest import CompiledForest
+from src.entity.model_bundle import is_bundle_supported, load_model_bundle, save_model_bundle
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 model_tuner_artifact: Optional[ModelTunerArtifact] = None):
         """
         :param data_transformation_artifact: Output reference of data transformation artifact stage
         :param model_trainer_config: Configuration for model training
+        :param model_tuner_artifact: Output reference of model tuner stage, its best params override the model config
         """
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.tuned_params = model_tuner_artifact.best_params if model_tuner_artifact is not None else {}
+        # metrics of every candidate trained by get_model_object_and_report
+        self.candidate_metrics = {}
 
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def get_model_object_and_report(self, x_train: np.array, y_train: np.array,
+                                    x_test: np.array, y_test: np.array) -> Tuple[str, object, object]:
         """
         Method Name :   get_model_object_and_report
-        Description :   This function trains a RandomForestClassifier with specified parameters
-        
-        Output      :   Returns metric artifact object and trained model object
+        Description :   This function trains every candidate estimator declared in the model config file,
+                        records F1 next to fit time, predict latency and model size, and keeps the best F1
+                        among the candidates that fit the latency budget
+
+        Output      :   Returns the selected model name, trained model object and its metric artifact
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            logging.info("Training RandomForestClassifier with specified parameters")
-
-            # Splitting the train and test data into features and target variables
-            x_train, y_train, x_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
-            logging.info("train-test split done.")
-
-            # Initialize RandomForestClassifier with specified parameters
-            model = RandomForestClassifier(
-                n_estimators = self.model_trainer_config._n_estimators,
-                min_samples_split = self.model_trainer_config._min_samples_split,
-                min_samples_leaf = self.model_trainer_config._min_samples_leaf,
-                max_depth = self.model_trainer_config._max_depth,
-                criterion = self.model_trainer_config._criterion,
-                random_state = self.model_trainer_config._random_state
-            )
+            model_config = read_yaml_file(file_path=self.model_trainer_config.model_config_file_path)
+            selection = model_config.get("selection") or {}
+            max_latency_ms = selection.get("max_predict_latency_ms")
+            latency_batch_size = selection.get("latency_batch_size", 1)
+            latency_repeats = selection.get("latency_repeats", 50)
+
+            candidates = {}
+            for model_name, model_spec in model_config["models"].items():
+                logging.info(f"Training candidate {model_name}: {model_spec['class']}")
+                params = {**(model_spec.get("params") or {}), **self.tuned_params.get(model_name, {})}
+                estimator = self.build_estimator(model_spec["class"], params)
 
-            # Fit the model
-            logging.info("Model training going on...")
-            model.fit(x_train, y_train)
-            logging.info("Model training done.")
-
-            # Predictions and evaluation metrics
-            y_pred = model.predict(x_test)
-            accuracy = accuracy_score(y_test, y_pred)
-            f1 = f1_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred)
-            recall = recall_score(y_test, y_pred)
-
-            # Creating metric artifact
-            metric_artifact = ClassificationMetricArtifact(
-                accuracy_score= accuracy,
-                f1_score=f1,
-                precision_score=precision,
-                recall_score=recall
+                start_time = time.perf_counter()
+                model = self.fit_estimator(estimator=estimator, x_train=x_train, y_train=y_train)
+                fit_time = time.perf_counter() - start_time
+
+                # Predictions and evaluation metrics
+                y_pred = model.predict(x_test)
+                metric_artifact = ClassificationMetricArtifact(
+                    accuracy_score=accuracy_score(y_test, y_pred),
+                    f1_score=f1_score(y_test, y_pred),
+                    precision_score=precision_score(y_test, y_pred),
+                    recall_score=recall_score(y_test, y_pred),
+                    fit_time_seconds=fit_time,
+                    predict_latency_ms=self.measure_predict_latency(model, x_test, latency_batch_size, latency_repeats),
+                    model_size_bytes=len(dill.dumps(model))
                 )
-            
-            return model, metric_artifact
-        
+                logging.info(f"Candidate {model_name}: {metric_artifact}")
+                candidates[model_name] = (model, metric_artifact)
+
+            eligible = {name: candidate for name, candidate in candidates.items()
+                        if max_latency_ms is None or candidate[1].predict_latency_ms <= max_latency_ms}
+            if not eligible:
+                raise Exception(f"No candidate model predicts within {max_latency_ms} ms")
+
+            best_model_name = max(eligible, key=lambda name: eligible[name][1].f1_score)
+            best_model, best_metric_artifact = eligible[best_model_name]
+            logging.info(f"Selected model {best_model_name} with F1 {best_metric_artifact.f1_score}")
+            self.candidate_metrics = {name: metric for name, (_, metric) in candidates.items()}
+            return best_model_name, best_model, best_metric_artifact
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def build_estimator(self, class_path: str, params: dict) -> object:
+        """
+        Instantiates an estimator from its dotted class path. Parallelism (_n_jobs), the bootstrap
+        sample size (_max_samples) and the class weights of the data transformation stage are applied
+        to estimators that support them unless params set them.
+        """
+        estimator = import_class(class_path)(**params)
+
+        supported_params = estimator.get_params()
+        config = self.model_trainer_config
+        defaults = {"n_jobs": config._n_jobs, "max_samples": config._max_samples,
+                    "class_weight": self.data_transformation_artifact.class_weight}
+        overrides = {name: value for name, value in defaults.items()
+                     if name in supported_params and name not in params and value is not None}
+        if overrides:
+            estimator.set_params(**overrides)
+        return estimator
+
+    def fit_estimator(self, estimator: object, x_train: np.array, y_train: np.array) -> object:
+        """
+        Fits the estimator. Bagging ensembles that can grow with warm_start (e.g. RandomForestClassifier)
+        are fitted in checkpointed batches, everything else with a single fit.
+        """
+        supported_params = estimator.get_params()
+        if "warm_start" in supported_params and "n_estimators" in supported_params:
+            return self.fit_in_tree_batches(estimator=estimator, x_train=x_train, y_train=y_train)
+        return estimator.fit(x_train, y_train)
+
+    @staticmethod
+    def measure_predict_latency(model: object, x_test: np.array, batch_size: int, repeats: int) -> float:
+        """
+        Median wall-clock time in milliseconds of one predict call on batch_size rows.
+        """
+        batch = np.ascontiguousarray(x_test[:batch_size])
+        model.predict(batch)  # warm-up
+        timings = []
+        for _ in range(max(1, repeats)):
+            start_time = time.perf_counter()
+            model.predict(batch)
+            timings.append((time.perf_counter() - start_time) * 1000.0)
+        return float(np.median(timings))
+
+    def get_checkpoint_path(self, params: dict, x_train: np.array, y_train: np.array) -> str:
+        """
+        Checkpoint file for this exact combination of hyperparameters and training data,
+        so a resumed run never continues a forest grown on something else.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        for array in (x_train, y_train):
+            digest.update(str((array.shape, array.dtype)).encode())
+            digest.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+        return os.path.join(self.model_trainer_config.checkpoint_dir, f"forest_{digest.hexdigest()[:16]}.pkl")
+
+    def fit_in_tree_batches(self, estimator: object, x_train: np.array, y_train: np.array) -> object:
+        """
+        Method Name :   fit_in_tree_batches
+        Description :   Grows the ensemble with warm_start, _tree_batch_size trees at a time,
+                        and checkpoints it after every batch. An interrupted run restarts from the last batch.
+                        With a fixed random_state the result is the same as a single fit.
+
+        Output      :   Returns the fitted estimator
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.model_trainer_config
+            params = estimator.get_params()
+            n_estimators = params["n_estimators"]
+            batch_size = max(1, config._tree_batch_size)
+            checkpoint_path = self.get_checkpoint_path({"class": type(estimator).__name__, **params}, x_train, y_train)
+
+            if os.path.exists(checkpoint_path):
+                model = load_object(checkpoint_path)
+                logging.info(f"Resuming training from checkpoint with {len(model.estimators_)} trees: {checkpoint_path}")
+            else:
+                model = clone(estimator).set_params(n_estimators=0, warm_start=True)
+
+            while len(getattr(model, "estimators_", [])) < n_estimators:
+                n_trees = min(len(getattr(model, "estimators_", [])) + batch_size, n_estimators)
+                model.set_params(n_estimators=n_trees)
+                model.fit(x_train, y_train)
+                logging.info(f"Grown {n_trees}/{n_estimators} trees")
+
+                if n_trees < n_estimators:
+                    tmp_path = checkpoint_path + ".tmp"
+                    save_object(tmp_path, model)
+                    os.replace(tmp_path, checkpoint_path)
+
+            # training finished, the checkpoint is not needed anymore
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+
+            model.set_params(warm_start=params["warm_start"])
+            return model
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def compile_model(self, trained_model: object, x_test: np.array) -> Optional[CompiledForest]:
+        """
+        Method Name :   compile_model
+        Description :   Exports a trained tree ensemble into a CompiledForest and checks on the test set that
+                        it predicts exactly like the sklearn model. Other estimators are served as they are.
+
+        Output      :   Returns the compiled model, or None if the model cannot be compiled or the parity check fails
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not self.model_trainer_config.compile_model or not CompiledForest.is_supported(trained_model):
+                logging.info(f"Serving {type(trained_model).__name__} without compilation")
+                return None
+
+            compiled_model = CompiledForest.from_estimator(trained_model)
+            mismatch = compiled_model.check_parity(trained_model, x_test)
+            if mismatch is not None:
+                logging.warning(f"Compiled model does not match the trained model ({mismatch}), serving the sklearn model")
+                return None
+            logging.info("Compiled model matches the trained model on the test set")
+            return compiled_model
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def export_model_bundle(self, my_model: MyModel, x_test: np.array) -> Tuple[Optional[str], dict]:
+        """
+        Method Name :   export_model_bundle
+        Description :   Writes the flat-array model bundle next to model.pkl, checks that the bundle loads back
+                        to the same predictions, and measures the cold-load time of both formats
+
+        Output      :   Returns the bundle directory (None if the model cannot be bundled) and the load times in ms
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            load_times = {}
+            start_time = time.perf_counter()
+            load_object(self.model_trainer_config.trained_model_file_path)
+            load_times["pickle"] = (time.perf_counter() - start_time) * 1000.0
+
+            if not is_bundle_supported(my_model):
+                logging.info("Model has no flat-array form, no model bundle exported")
+                return None, load_times
+
+            bundle_dir = self.model_trainer_config.model_bundle_dir
+            save_model_bundle(my_model, bundle_dir)
+            start_time = time.perf_counter()
+            bundled_model = load_model_bundle(bundle_dir)
+            load_times["bundle"] = (time.perf_counter() - start_time) * 1000.0
+
+            if not np.array_equal(bundled_model.compiled_model.predict_proba(x_test),
+                                  my_model.compiled_model.predict_proba(x_test)):
+                raise Exception("Model bundle does not reproduce the predictions of the trained model")
+            logging.info(f"Cold-load time: pickle {load_times['pickle']:.1f} ms, bundle {load_times['bundle']:.1f} ms")
+            return bundle_dir, load_times
+
         except Exception as e:
             raise MyException(e, sys) from e
 
@@ -86,17 +260,33 @@ class ModelTrainer:
         try:
             print("------------------------------------------------------------------------------------------------")
             print("Starting Model Trainer Component")
-            # Load transformed train and test data
-            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
+            # Load transformed features and targets as read-only memory-mapped views (no heap copies)
+            artifact = self.data_transformation_artifact
+            if artifact.train_features is not None:
+                x_train, y_train = artifact.train_features, artifact.train_target
+                x_test, y_test = artifact.test_features, artifact.test_target
+            else:
+                x_train = load_numpy_array_data(file_path=artifact.transformed_train_features_file_path, mmap_mode='r')
+                y_train = load_numpy_array_data(file_path=artifact.transformed_train_target_file_path, mmap_mode='r')
+                x_test = load_numpy_array_data(file_path=artifact.transformed_test_features_file_path, mmap_mode='r')
+                y_test = load_numpy_array_data(file_path=artifact.transformed_test_target_file_path, mmap_mode='r')
             logging.info("train-test data loaded")
             
             # Train model and get metrics
-            trained_model, metric_artifact = self.get_model_object_and_report(train=train_arr, test=test_arr)
+            model_name, trained_model, metric_artifact = self.get_model_object_and_report(x_train=x_train, y_train=y_train,
+                                                                              x_test=x_test, y_test=y_test)
             logging.info("Model object and artifact loaded.")
             
             # Load preprocessing object
-            preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            preprocessing_obj = self.data_transformation_artifact.preprocessing_object
+            if preprocessing_obj is None:
+                preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            fused_preprocessing_obj = self.data_transformation_artifact.fused_preprocessing_object
+            if fused_preprocessing_obj is None and self.data_transformation_artifact.fused_object_file_path is not None:
+                fused_preprocessing_obj = load_object(file_path=self.data_transformation_artifact.fused_object_file_path)
+            feature_encoder_obj = self.data_transformation_artifact.feature_encoder_object
+            if feature_encoder_obj is None and self.data_transformation_artifact.feature_encoder_file_path is not None:
+                feature_encoder_obj = load_object(file_path=self.data_transformation_artifact.feature_encoder_file_path)
             logging.info("Preprocessing obj loaded.")
 
             # Check if the model's accuracy meets the expected threshold
@@ -106,21 +296,31 @@ class ModelTrainer:
 
             # Save the final model object that includes both preprocessing and the trained model
             logging.info("Saving new model as performace is better than previous one.")
-            my_model = MyModel(preprocessing_object=preprocessing_obj, trained_model_object=trained_model)
+            my_model = MyModel(preprocessing_object=preprocessing_obj, trained_model_object=trained_model,
+                               compiled_model=self.compile_model(trained_model=trained_model, x_test=x_test),
+                               fused_preprocessor=fused_preprocessing_obj, feature_encoder=feature_encoder_obj)
             save_object(self.model_trainer_config.trained_model_file_path, my_model)
             logging.info("Saved final model object that includes both preprocessing and the trained model")
+            model_bundle_dir, load_times = self.export_model_bundle(my_model=my_model, x_test=x_test)
 
             # Save metric artifact as JSON in the same artifact folder
             metric_file_path = self.model_trainer_config.metric_file_path
+            # scores are only compared with production scores measured under the same protocol
+            evaluation_protocol = {"test_split": "resampled" if artifact.test_resampled else "original"}
+            metrics = {**asdict(metric_artifact), "model_name": model_name, "load_time_ms": load_times,
+                       "evaluation_protocol": evaluation_protocol,
+                       "candidates": {name: asdict(metric) for name, metric in self.candidate_metrics.items()}}
             with open(metric_file_path, "w") as f:
-                json.dump(asdict(metric_artifact), f, indent=4)
+                json.dump(metrics, f, indent=4)
             logging.info(f"Saved metrics to {metric_file_path}")
 
             # Create, return and the ModelTrainerArtifact
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact=metric_artifact,
-                metric_file_path = metric_file_path
+                metric_file_path = metric_file_path,
+                model_name=model_name,
+                model_bundle_dir=model_bundle_dir
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
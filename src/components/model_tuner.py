@@ -0,0 +1,214 @@
+import concurrent.futures
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import import_class, load_numpy_array_data, read_yaml_file, save_numpy_array_data
+from src.entity.config_entity import ModelTunerConfig
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTunerArtifact
+
+
+def _score_candidate(class_path: str, params: dict, x_train: np.ndarray, y_train: np.ndarray,
+                     fit_indices: np.ndarray, n_rows: int, val_indices: np.ndarray) -> Tuple[float, float]:
+    """
+    Runs in a worker process: fits one candidate on the first n_rows of the fit split and
+    returns its holdout F1 and fit time. The arrays arrive as memory-mapped views.
+    """
+    estimator = import_class(class_path)(**params)
+    rows = np.sort(fit_indices[:n_rows])
+    start_time = time.perf_counter()
+    estimator.fit(x_train[rows], y_train[rows])
+    fit_time = time.perf_counter() - start_time
+    y_pred = estimator.predict(x_train[val_indices])
+    return float(f1_score(y_train[val_indices], y_pred)), fit_time
+
+
+class ModelTuner:
+    def __init__(self, data_transformation_artifact: DataTransformationArtifact,
+                 model_tuner_config: ModelTunerConfig):
+        """
+        :param data_transformation_artifact: Output reference of data transformation artifact stage
+        :param model_tuner_config: Configuration for the hyperparameter search
+        """
+        self.data_transformation_artifact = data_transformation_artifact
+        self.model_tuner_config = model_tuner_config
+        # temporary memory-mapped copies of in-memory arrays, removed when tuning ends
+        self._scratch_files: List[str] = []
+
+    def get_memory_mapped(self, array: np.ndarray, name: str) -> np.memmap:
+        """
+        Returns a read-only memory-mapped view of the array. Worker processes receive memmaps
+        by reference, so the data is shared through the page cache instead of pickled per task.
+        """
+        if isinstance(array, np.memmap):
+            return array
+        file_path = os.path.join(self.model_tuner_config.model_tuner_dir, f"{name}.npy")
+        save_numpy_array_data(file_path, array)
+        self._scratch_files.append(file_path)
+        return load_numpy_array_data(file_path, mmap_mode='r')
+
+    @staticmethod
+    def get_candidates(base_params: dict, search_space: dict) -> List[dict]:
+        """
+        Expands the search grid of a model into full parameter sets on top of its base params.
+        """
+        names = sorted(search_space)
+        return [{**base_params, **dict(zip(names, values))}
+                for values in itertools.product(*(search_space[name] for name in names))]
+
+    def successive_halving(self, model_name: str, class_path: str, candidates: List[dict],
+                           x_train: np.ndarray, y_train: np.ndarray,
+                           fit_indices: np.ndarray, val_indices: np.ndarray,
+                           deadline: float) -> Tuple[Optional[dict], dict]:
+        """
+        Method Name :   successive_halving
+        Description :   Scores all candidates on a small share of the fit split, keeps the best 1/halving_factor
+                        and gives them halving_factor times more rows, until one candidate is left or the full
+                        split is used. Candidates of a round are scored in parallel worker processes.
+                        Stops early when the deadline is reached; the best candidate of the last finished round wins.
+
+        Output      :   Returns the best parameters (None if no round finished) and the search report
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.model_tuner_config
+            factor = max(2, config.halving_factor)
+            n_available = len(fit_indices)
+            n_rounds = max(1, math.ceil(math.log(max(len(candidates), 1), factor)) + 1)
+            n_rows = min(n_available, max(config.min_resources, n_available // factor ** (n_rounds - 1)))
+
+            best_params, best_score = None, None
+            rounds = []
+            budget_exhausted = False
+            while candidates:
+                logging.info(f"{model_name}: scoring {len(candidates)} candidates on {n_rows} rows")
+                parallel = Parallel(n_jobs=config.n_jobs, backend="loky", return_as="generator",
+                                    timeout=max(deadline - time.monotonic(), 1.0))
+                results = []
+                try:
+                    for params, (score, fit_time) in zip(candidates, parallel(
+                            delayed(_score_candidate)(class_path, params, x_train, y_train,
+                                                      fit_indices, n_rows, val_indices)
+                            for params in candidates)):
+                        results.append({"params": params, "f1_score": score, "fit_time_seconds": fit_time})
+                        if time.monotonic() > deadline:
+                            raise TimeoutError
+                # before Python 3.11 concurrent.futures.TimeoutError is not the builtin, and joblib may raise either
+                except (TimeoutError, concurrent.futures.TimeoutError):
+                    budget_exhausted = True
+
+                rounds.append({"n_rows": n_rows, "n_candidates": len(candidates),
+                               "completed": not budget_exhausted, "results": results})
+                if budget_exhausted:
+                    # a partial round only counts if nothing finished before it
+                    if best_params is None and results:
+                        top = max(results, key=lambda result: result["f1_score"])
+                        best_params, best_score = top["params"], top["f1_score"]
+                    logging.info(f"{model_name}: time budget exhausted after {len(rounds)} rounds")
+                    break
+
+                results.sort(key=lambda result: result["f1_score"], reverse=True)
+                best_params, best_score = results[0]["params"], results[0]["f1_score"]
+                if len(candidates) == 1 or n_rows >= n_available:
+                    break
+                candidates = [result["params"] for result in results[:max(1, len(candidates) // factor)]]
+                n_rows = min(n_available, n_rows * factor)
+
+            report = {"class": class_path, "best_params": best_params, "best_f1_score": best_score,
+                      "budget_exhausted": budget_exhausted, "rounds": rounds}
+            return best_params, report
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def initiate_model_tuner(self) -> ModelTunerArtifact:
+        """
+        Method Name :   initiate_model_tuner
+        Description :   This function searches the `search` grid of every model in the model config file
+                        within the wall-clock budget and reports the best parameters per model
+
+        Output      :   Returns model tuner artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered initiate_model_tuner method of ModelTuner class")
+        try:
+            print("------------------------------------------------------------------------------------------------")
+            print("Starting Model Tuner Component")
+            config = self.model_tuner_config
+            start_time = time.monotonic()
+            deadline = start_time + config.time_budget_seconds
+
+            artifact = self.data_transformation_artifact
+            if artifact.train_features is not None:
+                x_train, y_train = artifact.train_features, artifact.train_target
+            else:
+                x_train = load_numpy_array_data(file_path=artifact.transformed_train_features_file_path, mmap_mode='r')
+                y_train = load_numpy_array_data(file_path=artifact.transformed_train_target_file_path, mmap_mode='r')
+            x_train = self.get_memory_mapped(x_train, "train_features")
+            y_train = self.get_memory_mapped(y_train, "train_target")
+
+            # candidates are scored on a stratified holdout of the training set, the test set stays untouched
+            fit_indices, val_indices = train_test_split(np.arange(len(y_train)), test_size=config.holdout_ratio,
+                                                        stratify=y_train, random_state=config.random_state)
+            fit_indices = self.get_memory_mapped(fit_indices, "fit_indices")
+            val_indices = self.get_memory_mapped(np.sort(val_indices), "val_indices")
+
+            model_config = read_yaml_file(file_path=config.model_config_file_path)
+            searchable = {name: spec for name, spec in model_config["models"].items() if spec.get("search")}
+
+            best_params, reports = {}, {}
+            for position, (model_name, model_spec) in enumerate(searchable.items()):
+                # models share what is left of the budget evenly
+                remaining = deadline - time.monotonic()
+                model_deadline = time.monotonic() + remaining / (len(searchable) - position)
+
+                base_params = model_spec.get("params") or {}
+                estimator_params = import_class(model_spec["class"])().get_params()
+                if "n_jobs" in estimator_params:
+                    # parallelism comes from scoring candidates side by side
+                    base_params = {**base_params, "n_jobs": 1}
+                class_weight = self.data_transformation_artifact.class_weight
+                if class_weight is not None and "class_weight" in estimator_params and "class_weight" not in base_params:
+                    base_params = {**base_params, "class_weight": class_weight}
+                candidates = self.get_candidates(base_params, model_spec["search"])
+
+                params, reports[model_name] = self.successive_halving(
+                    model_name=model_name, class_path=model_spec["class"], candidates=candidates,
+                    x_train=x_train, y_train=y_train, fit_indices=fit_indices, val_indices=val_indices,
+                    deadline=model_deadline)
+                if params is not None:
+                    best_params[model_name] = {name: params[name] for name in model_spec["search"]}
+                logging.info(f"Best parameters for {model_name}: {best_params.get(model_name)}")
+
+            report = {"elapsed_seconds": time.monotonic() - start_time,
+                      "time_budget_seconds": config.time_budget_seconds,
+                      "best_params": best_params, "models": reports}
+            os.makedirs(os.path.dirname(config.tuning_report_file_path), exist_ok=True)
+            with open(config.tuning_report_file_path, "w") as f:
+                json.dump(report, f, indent=4, default=str)
+            logging.info(f"Saved tuning report to {config.tuning_report_file_path}")
+
+            model_tuner_artifact = ModelTunerArtifact(best_params=best_params,
+                                                      tuning_report_file_path=config.tuning_report_file_path)
+            logging.info(f"Model tuner artifact: {model_tuner_artifact}")
+            return model_tuner_artifact
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+        finally:
+            for file_path in self._scratch_files:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._scratch_files = []
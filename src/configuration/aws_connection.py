@@ -1,37 +1,61 @@
 import boto3
 import os
-from src.constants import AWS_ACCESS_KEY_ID_ENV_KEY,AWS_SECRET_ACCESS_KEY_ENV_KEY,REGION_NAME
+import threading
+from botocore.config import Config
+from src.constants import (AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY, REGION_NAME,
+                           S3_MAX_POOL_CONNECTIONS, S3_RETRY_MODE, S3_MAX_ATTEMPTS, S3_CONNECT_TIMEOUT_SECONDS,
+                           S3_READ_TIMEOUT_SECONDS, S3_TRANSFER_MAX_CONCURRENCY, INFERENCE_MAX_WORKERS)
 
 class S3Client:
+    """
+    Process-wide S3 connection: one low-level client and a resource built on top of it,
+    so both share a single connection pool, retry policy and timeouts.
+    """
 
     s3_client = None
     s3_resource = None
+    _pid = None # process that created the shared client; botocore clients must not cross a fork
+    _lock = threading.Lock()
 
     def __init__(self,region_name=REGION_NAME):
         """"
         This class gets aws credentials from env variables and establishes a connectioons3 bucket and
         raise exception when environment variables are missing
         """
-        if S3Client.s3_client == None or S3Client.s3_resource==None:
-            _access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY,)
-            _secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY,)
-            if _access_key_id is None:
-                raise Exception("Access key ID is missing from the env variable")
-            if _secret_access_key is None:
-                raise Exception("Secret Access key is missing from the env variable")
-            
-            S3Client.s3_resource = boto3.resource(
-                's3',
-                aws_access_key_id = _access_key_id,
-                aws_secret_access_key = _secret_access_key,
-                region_name = REGION_NAME
-            )
-            S3Client.s3_client = boto3.resource(
-                's3',
-                aws_access_key_id = _access_key_id,
-                aws_secret_access_key = _secret_access_key,
-                region_name = region_name
-            )
+        if S3Client.s3_client is None or S3Client._pid != os.getpid():
+            with S3Client._lock:
+                if S3Client.s3_client is None or S3Client._pid != os.getpid():
+                    _access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY,)
+                    _secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY,)
+                    if _access_key_id is None:
+                        raise Exception("Access key ID is missing from the env variable")
+                    if _secret_access_key is None:
+                        raise Exception("Secret Access key is missing from the env variable")
+
+                    session = boto3.session.Session(
+                        aws_access_key_id = _access_key_id,
+                        aws_secret_access_key = _secret_access_key,
+                        region_name = region_name
+                    )
+                    s3_resource = session.resource('s3', config=self.get_client_config())
+                    # the resource's client is the one low-level client of the process
+                    S3Client.s3_client = s3_resource.meta.client
+                    S3Client.s3_resource = s3_resource
+                    S3Client._pid = os.getpid()
 
         self.s3_resource = S3Client.s3_resource
         self.s3_client = S3Client.s3_client
+
+    @staticmethod
+    def get_client_config() -> Config:
+        """
+        botocore configuration of the shared client. The pool has room for every serving worker plus
+        the parallel parts of a managed transfer, so neither waits for a free connection.
+        """
+        max_pool_connections = S3_MAX_POOL_CONNECTIONS or (INFERENCE_MAX_WORKERS + S3_TRANSFER_MAX_CONCURRENCY)
+        return Config(
+            max_pool_connections = max_pool_connections,
+            retries = {"mode": S3_RETRY_MODE, "total_max_attempts": S3_MAX_ATTEMPTS},
+            connect_timeout = S3_CONNECT_TIMEOUT_SECONDS,
+            read_timeout = S3_READ_TIMEOUT_SECONDS
+        )
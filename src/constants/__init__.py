@@ -8,23 +8,49 @@ MONGODB_URL_KEY = "MONGODB_URL"
 
 PIPELINE_NAME: str = ""
 ARTIFACT_DIR: str = "artifact"
+PIPELINE_IN_MEMORY_ARTIFACTS: bool = True
+PIPELINE_PERSIST_ARTIFACTS: bool = True
+# stage results are indexed by a fingerprint of their inputs and reused by later runs (outside the timestamped run dirs)
+PIPELINE_STAGE_CACHE_ENABLED: bool = True
+PIPELINE_STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "stage_cache")
 
 MODEL_FILE_NAME = "model.pkl"
 METRIC_FILE_NAME = "metric.json"
+# flat-array model bundle (manifest + memory-mappable .npy blobs) published next to model.pkl
+MODEL_BUNDLE_DIR_NAME = "model_bundle"
+MODEL_BUNDLE_MANIFEST_FILE_NAME = "manifest.json"
+MODEL_BUNDLE_BLOB_DIR_NAME = "blobs"
+MODEL_BUNDLE_FORMAT_VERSION: int = 1
 
 TARGET_COLUMN = "Response"
 CURRENT_YEAR = date.today().year
 PREPROCSSING_OBJECT_FILE_NAME = "preprocessing.pkl"
+FUSED_PREPROCESSING_OBJECT_FILE_NAME = "fused_preprocessing.pkl"
+FEATURE_ENCODER_OBJECT_FILE_NAME = "feature_encoder.pkl"
 
-FILE_NAME: str = "data.csv"
-TRAIN_FILE_NAME: str = "train.csv"
-TEST_FILE_NAME: str = "test.csv"
+ARTIFACT_FILE_FORMAT: str = "parquet" # "parquet", "feather" or "csv"
+FILE_NAME: str = f"data.{ARTIFACT_FILE_FORMAT}"
+TRAIN_FILE_NAME: str = f"train.{ARTIFACT_FILE_FORMAT}"
+TEST_FILE_NAME: str = f"test.{ARTIFACT_FILE_FORMAT}"
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 
 
 AWS_ACCESS_KEY_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY = "AWS_SECRET_ACCESS_KEY"
 REGION_NAME = "us-east-1"
+# boto3 managed transfers: files above the threshold are moved in parallel parts of CHUNKSIZE bytes
+S3_TRANSFER_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024
+S3_TRANSFER_MULTIPART_CHUNKSIZE: int = 16 * 1024 * 1024
+S3_TRANSFER_MAX_CONCURRENCY: int = 10
+S3_TRANSFER_USE_THREADS: bool = True
+# HEAD results (including "missing") are reused for this long; uploads and deletes through the same service invalidate them
+S3_METADATA_CACHE_TTL_SECONDS: float = 5.0
+# shared boto3 client: None sizes the connection pool to INFERENCE_MAX_WORKERS + S3_TRANSFER_MAX_CONCURRENCY
+S3_MAX_POOL_CONNECTIONS = None
+S3_RETRY_MODE: str = "adaptive" # client-side rate limiting on top of exponential backoff
+S3_MAX_ATTEMPTS: int = 5 # total attempts per request, the first one included
+S3_CONNECT_TIMEOUT_SECONDS: float = 5.0
+S3_READ_TIMEOUT_SECONDS: float = 60.0
 
 
 """
@@ -35,6 +61,18 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.25
+DATA_INGESTION_MONGO_BATCH_SIZE: int = 10000
+DATA_INGESTION_CHUNK_SIZE: int = 100000
+DATA_INGESTION_PARTITION_KEY: str = "id"
+DATA_INGESTION_READ_WORKERS: int = min(os.cpu_count() or 1, 8)
+# parallel range reads need an index on the partition key (a prerequisite, e.g. db.collection.createIndex({id: 1})).
+# Without one the export reads over a single cursor. True lets ingestion create it, which needs write privileges
+DATA_INGESTION_CREATE_PARTITION_INDEX: bool = False
+# incremental ingestion assumes an append-only collection: only documents with a new partition key are fetched,
+# updates and deletes of existing documents never reach the snapshot. Only enable it for append-only sources
+DATA_INGESTION_INCREMENTAL: bool = False
+DATA_INGESTION_SNAPSHOT_DIR: str = os.path.join(ARTIFACT_DIR, "feature_store_snapshot")
+DATA_INGESTION_WATERMARK_FILE_NAME: str = "watermark.json"
 
 """
 Data Validation realted contant start with DATA_VALIDATION VAR NAME
@@ -48,6 +86,30 @@ Data Transformation ralated constant start with DATA_TRANSFORMATION VAR NAME
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+DATA_TRANSFORMATION_FEATURES_SUFFIX: str = "_features.npy"
+DATA_TRANSFORMATION_TARGET_SUFFIX: str = "_target.npy"
+# tree models in sklearn train and predict on float32 internally, so storing features as float32 loses nothing
+DATA_TRANSFORMATION_FEATURE_DTYPE: str = "float32"
+# class rebalancing of the training split: "smoteenn", "smote", "random_under", "random_over", "class_weight" or "none"
+DATA_TRANSFORMATION_REBALANCE_STRATEGY: str = "smote"
+DATA_TRANSFORMATION_REBALANCE_TEST: bool = False # evaluate on the real class distribution
+DATA_TRANSFORMATION_REBALANCE_K_NEIGHBORS: int = 5
+DATA_TRANSFORMATION_REBALANCE_N_JOBS: int = -1 # neighbour searches of smote/smoteenn
+DATA_TRANSFORMATION_REBALANCE_RANDOM_STATE: int = 101
+DATA_TRANSFORMATION_REBALANCE_REPORT_FILE_NAME: str = "rebalance_report.json"
+
+"""
+MODEL TUNER related constant start with MODEL_TUNER var name
+"""
+MODEL_TUNER_ENABLED: bool = True
+MODEL_TUNER_DIR_NAME: str = "model_tuner"
+MODEL_TUNER_REPORT_FILE_NAME: str = "tuning_report.json"
+MODEL_TUNER_N_JOBS: int = -1 # candidates evaluated in parallel worker processes, -1 uses every core
+MODEL_TUNER_TIME_BUDGET_SECONDS: float = 600.0 # wall-clock budget for the whole search
+MODEL_TUNER_HALVING_FACTOR: int = 3 # keep 1/factor of the candidates per round, give them factor x more rows
+MODEL_TUNER_MIN_RESOURCES: int = 2000 # training rows per candidate in the first round
+MODEL_TUNER_HOLDOUT_RATIO: float = 0.2 # share of the training set used to score candidates
+MODEL_TUNER_RANDOM_STATE: int = 101
 
 """
 MODEL TRAINER related constant start with MODEL_TRAINER var name
@@ -57,12 +119,12 @@ MODEL_TRAINER_DIR_NAME: str = "model_trainer"
 # MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
-MODEL_TRAINER_N_ESTIMATORS= 200
-MODEL_TRAINER_MIN_SAMPLES_SPLIT: int = 7
-MODEL_TRAINER_MIN_SAMPLES_LEAF: int = 6
-MIN_SAMPLES_SPLIT_MAX_DEPTH: int = 10
-MIN_SAMPLES_SPLIT_CRITERION: str = 'entropy'
-MIN_SAMPLES_SPLIT_RANDOM_STATE: int = 101
+# estimator classes and hyperparameters are declared in MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+MODEL_TRAINER_N_JOBS: int = -1 # -1 uses every core
+MODEL_TRAINER_TREE_BATCH_SIZE: int = 50 # trees grown between two checkpoints (warm-start ensembles)
+MODEL_TRAINER_MAX_SAMPLES = None # bootstrap sample size per tree (int rows or float fraction), None = all rows
+MODEL_TRAINER_CHECKPOINT_DIR: str = os.path.join(ARTIFACT_DIR, "model_trainer_checkpoints")
+MODEL_TRAINER_COMPILE_MODEL: bool = True # export tree ensembles to flat arrays for fast inference
 
 """
 MODEL Evaluation related constants
@@ -73,5 +135,36 @@ MODEL_BUCKET_NAME = os.getenv("AWS_USER_ID") + "-my-model-mlops-proj"
 MODEL_PUSHER_S3_KEY = "model-registry"
 
 
+"""
+Prediction related constants start with MODEL_REGISTRY / PREDICTION / INFERENCE var name
+"""
+MODEL_REGISTRY_REFRESH_INTERVAL_SECONDS: int = 60
+MODEL_REGISTRY_LOCAL_DIR: str = "model_cache" # content-addressed model cache, shared by all workers on the host
+MODEL_REGISTRY_VERIFY_CACHE: bool = True # re-check sha256 of cached model files before loading them
+# replaced model versions stay on disk this long, for workers that resolved the old version just before (HEAD cache)
+MODEL_REGISTRY_CACHE_EVICTION_GRACE_SECONDS: float = 300.0
+MODEL_REGISTRY_PREFER_BUNDLE: bool = True
+PREDICTION_COALESCER_MAX_BATCH_SIZE: int = 64
+PREDICTION_COALESCER_MAX_WAIT_MS: float = 5.0
+# LRU cache of single-row predictions per serving process, keyed on the encoded features + model version
+PREDICTION_CACHE_ENABLED: bool = True
+PREDICTION_CACHE_MAX_ENTRIES: int = 10000
+PREDICTION_CACHE_TTL_SECONDS: float = 900.0
+INFERENCE_EXECUTOR_TYPE: str = "thread" # "thread" or "process"
+INFERENCE_MAX_WORKERS: int = os.cpu_count() or 1
+INFERENCE_MAX_PENDING: int = 256
+
+"""
+Training job related constants start with TRAINING_JOB var name
+"""
+TRAINING_JOB_NICE: int = 10 # training runs at a lower CPU priority than the serving process
+TRAINING_JOB_HISTORY_SIZE: int = 20 # finished jobs kept for status queries
+TRAINING_JOB_CANCEL_GRACE_SECONDS: float = 10.0 # time between SIGTERM and SIGKILL when cancelling
+# held while a job runs, so server worker processes sharing the artifact dir never train at the same time
+TRAINING_JOB_LOCK_FILE_PATH: str = os.path.join(ARTIFACT_DIR, "training_job.lock")
+# one <job_id>.json status file per job, so every server worker process can report and cancel any job
+TRAINING_JOB_STATUS_DIR: str = os.path.join(ARTIFACT_DIR, "training_jobs")
+
+
 APP_HOST = "0.0.0.0"
 APP_PORT = 5000
\ No newline at end of file
@@ -1,11 +1,17 @@
-import sys 
-import pandas as pd 
-import numpy as np 
-from typing import Optional
+import sys
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 from src.configuration.mongo_db_connection import MongoDBClient
-from src.constants import DATABASE_NAME
+from src.constants import DATABASE_NAME, SCHEMA_FILE_PATH, DATA_INGESTION_MONGO_BATCH_SIZE, DATA_INGESTION_CHUNK_SIZE
 from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import read_yaml_file
+
+# numpy dtypes used to preallocate the columns declared in config/schema.yaml
+SCHEMA_DTYPES = {"int": np.int64, "float": np.float64, "category": object}
 
 class ProjData:
     """
@@ -17,12 +23,89 @@ class ProjData:
         """
         try:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._column_dtypes = {column: SCHEMA_DTYPES[dtype]
+                                   for entry in self._schema_config["columns"]
+                                   for column, dtype in entry.items()}
         except Exception as e:
             raise MyException(e,sys)
-        
-    def export_collection_as_dataframe(self,collection_name:str,database_name:Optional[str] = None)->pd.DataFrame:
+
+    def get_collection(self,collection_name:str,database_name:Optional[str] = None):
         """
-        Exports an entire MongoDB collection as a dataframe
+        Returns the collection from the default or the specified database
+        """
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    def _allocate_columns(self,n_rows:int)-> Dict[str,np.ndarray]:
+        return {column: np.empty(n_rows, dtype=dtype) for column, dtype in self._column_dtypes.items()}
+
+    @staticmethod
+    def _set_missing(columns:Dict[str,np.ndarray],column:str,row:int)-> None:
+        array = columns[column]
+        if array.dtype == np.int64:
+            array = columns[column] = array.astype(np.float64)
+        array[row] = np.nan
+
+    @staticmethod
+    def _fits_dtype(value:object,dtype:np.dtype)-> bool:
+        # numpy would silently truncate floats and turn booleans into 0/1 on assignment
+        if isinstance(value, (bool, np.bool_)):
+            return False
+        if dtype == np.int64:
+            return isinstance(value, (int, np.integer))
+        return isinstance(value, (int, float, np.integer, np.floating))
+
+    def _build_chunk(self,documents:Iterable[dict],n_rows:int)-> pd.DataFrame:
+        """
+        Fills preallocated per-column arrays from at most n_rows documents.
+        'na' and missing values become NaN; int columns holding them or floats are upcast to float,
+        columns holding values of another type fall back to object.
+        """
+        columns = self._allocate_columns(n_rows)
+        mismatched_columns = set()
+        n_filled = 0
+        for row, document in enumerate(documents):
+            for column, value in document.items():
+                array = columns.get(column)
+                if array is None:
+                    # field not declared in the schema: keep it so validation can flag it
+                    array = columns[column] = np.full(n_rows, np.nan, dtype=object)
+                if array.dtype == object:
+                    array[row] = np.nan if value == 'na' else value
+                    continue
+                if array.dtype == np.int64 and isinstance(value, (float, np.floating)):
+                    array = columns[column] = array.astype(np.float64)
+                if self._fits_dtype(value, array.dtype):
+                    array[row] = value
+                elif value is None or value == 'na':
+                    self._set_missing(columns, column, row)
+                else:
+                    # stored values do not match the schema dtype (e.g. raw 'Male'/'Female')
+                    array = columns[column] = array.astype(object)
+                    array[row] = value
+                    mismatched_columns.add(column)
+            if len(document) < len(columns):
+                for column in columns.keys() - document.keys():
+                    self._set_missing(columns, column, row)
+            n_filled = row + 1
+            if n_filled == n_rows:
+                break
+
+        data = {column: array[:n_filled] for column, array in columns.items()}
+        chunk = pd.DataFrame(data, copy=False)
+        if mismatched_columns:
+            chunk = chunk.infer_objects()
+        return chunk
+
+    def export_collection_as_dataframe(self,collection_name:str,database_name:Optional[str] = None,
+                                       batch_size:int = DATA_INGESTION_MONGO_BATCH_SIZE,
+                                       query:Optional[dict] = None)->pd.DataFrame:
+        """
+        Exports an entire MongoDB collection as a dataframe.
+        The columns are preallocated for the document count and filled straight from the cursor, so every
+        document is copied once; the whole collection is still held in memory (the split needs all of it).
 
         Parameters:
         -----------
@@ -30,6 +113,10 @@ class ProjData:
             name of the collection
         database_name: Optional[str]
             Name of the database(optional).Defaults to DATABASE_NAME
+        batch_size: int
+            number of documents fetched from the server per round trip
+        query: Optional[dict]
+            filter passed to collection.find(). Defaults to the whole collection
 
         Returns:
         -----------
@@ -37,21 +124,138 @@ class ProjData:
             DataFrame containing the collection data, with '_id' column removed and 'na' values replaced with NaN.
         """
         try:
-            # Access specified collection from the default or specified database
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
+            collection = self.get_collection(collection_name, database_name)
+
+            # size the columns for the whole collection up front so documents are copied only once
+            if query:
+                n_documents = collection.count_documents(query)
             else:
-                colection = self.mongo_client[database_name][collection_name]
-            
+                n_documents = collection.estimated_document_count()
+
             # convert collection to dataframe
             print("Fetching data from MongoDB ...")
-            df = pd.DataFrame(list(collection.find()))
+            # '_id' is dropped server-side so it is never transferred or decoded
+            cursor = collection.find(query or {}, projection={"_id": 0}, batch_size=batch_size)
+            try:
+                chunks = [self._build_chunk(cursor, max(n_documents, 1))]
+                # documents inserted while reading go beyond the count: read them in further chunks
+                while len(chunks[-1]) > 0 and cursor.alive:
+                    chunks.append(self._build_chunk(cursor, DATA_INGESTION_CHUNK_SIZE))
+            finally:
+                cursor.close()
+
+            chunks = [chunk for chunk in chunks if len(chunk) > 0]
+            if len(chunks) == 0:
+                df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in self._column_dtypes.items()})
+            elif len(chunks) == 1:
+                df = chunks[0]
+            else:
+                df = pd.concat(chunks, ignore_index=True)
             print(f"Data fetched wiith len: {len(df)}")
-            if "_id" in df.columns.to_list():
-                df = df.drop(columns=['_id'],axis=1)
-            df.replace({'na':np.nan},inplace=True)
+            logging.info(f"Exported {len(df)} documents from collection {collection_name}")
+            return df
+
+        except Exception as e:
+            raise MyException(e,sys)
+
+    def has_index(self,collection_name:str,key:str,database_name:Optional[str] = None)->bool:
+        """
+        Whether an index of the collection starts with the given key (only needs read privileges)
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            return any(index["key"][0][0] == key for index in collection.index_information().values())
+        except Exception as e:
+            raise MyException(e,sys)
+
+    def get_key_range(self,collection_name:str,partition_key:str,database_name:Optional[str] = None)->Optional[Tuple[int,int]]:
+        """
+        Returns the (min, max) value of an integer partition key, or None if the key is not usable.
+        Uses one $group pass over the collection, so it works with or without an index on the key.
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            bounds = list(collection.aggregate([
+                {"$match": {partition_key: {"$exists": True}}},
+                {"$group": {"_id": None, "low": {"$min": f"${partition_key}"}, "high": {"$max": f"${partition_key}"}}}
+            ]))
+            if not bounds:
+                return None
+            low, high = bounds[0]["low"], bounds[0]["high"]
+            if not isinstance(low, (int, np.integer)) or not isinstance(high, (int, np.integer)):
+                return None
+            return int(low), int(high)
+        except Exception as e:
+            raise MyException(e,sys)
+
+    def export_collection_partitioned(self,collection_name:str,partition_key:str,n_workers:int,
+                                      database_name:Optional[str] = None,
+                                      batch_size:int = DATA_INGESTION_MONGO_BATCH_SIZE,
+                                      create_index:bool = False)->pd.DataFrame:
+        """
+        Exports a collection by splitting it into n_workers ranges of an integer key and reading
+        the ranges concurrently over the shared MongoClient connection pool.
+        Range reads are only index scans with an index on the key, which is a prerequisite of the collection:
+        without one every worker would scan the whole collection, so the export falls back to a single cursor.
+        It also falls back to a single cursor if the key is missing or not an integer.
+
+        Parameters:
+        -----------
+        collection_name: str
+            name of the collection
+        partition_key: str
+            integer field used to split the collection into ranges (e.g. 'id')
+        n_workers: int
+            number of ranges read concurrently
+        database_name: Optional[str]
+            Name of the database(optional).Defaults to DATABASE_NAME
+        batch_size: int
+            number of documents fetched from the server per round trip
+        create_index: bool
+            create the missing index on partition_key instead of falling back (needs write privileges)
+
+        Returns:
+        -----------
+        pd.DataFrame
+            DataFrame containing the collection data in partition key order.
+        """
+        try:
+            key_range = None
+            if n_workers > 1:
+                if self.has_index(collection_name, partition_key, database_name):
+                    key_range = self.get_key_range(collection_name, partition_key, database_name)
+                elif create_index:
+                    logging.info(f"Creating an index on '{partition_key}' for partitioned reads")
+                    self.get_collection(collection_name, database_name).create_index(partition_key)
+                    key_range = self.get_key_range(collection_name, partition_key, database_name)
+                else:
+                    logging.warning(f"No index on '{partition_key}' in {collection_name}, partitioned reads would "
+                                    f"each scan the whole collection")
+            if key_range is None:
+                logging.info("Partitioned export not possible, reading the collection over a single cursor")
+                return self.export_collection_as_dataframe(collection_name=collection_name,
+                                                           database_name=database_name,
+                                                           batch_size=batch_size)
+
+            low, high = key_range
+            bounds = np.unique(np.linspace(low, high + 1, num=n_workers + 1).astype(np.int64))
+            queries = [{partition_key: {"$gte": int(start), "$lt": int(stop)}}
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            # documents without an integer key in range are read too, so nothing is silently dropped
+            queries.append({partition_key: {"$not": {"$gte": low, "$lte": high}}})
+            logging.info(f"Reading {collection_name} in {len(queries)} '{partition_key}' ranges with {n_workers} workers")
+
+            with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="mongo-export") as executor:
+                partitions = list(executor.map(
+                    lambda query: self.export_collection_as_dataframe(collection_name=collection_name,
+                                                                      database_name=database_name,
+                                                                      batch_size=batch_size,
+                                                                      query=query),
+                    queries))
+
+            df = pd.concat(partitions, ignore_index=True)
+            logging.info(f"Partitioned export finished with {len(df)} documents")
             return df
 
-            
         except Exception as e:
             raise MyException(e,sys)
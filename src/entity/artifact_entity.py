@@ -1,9 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path:str
     test_file_path:str
+    # in-memory copies handed to the next stage (None when the stage only wrote files)
+    train_df:Optional[DataFrame] = field(default=None, repr=False)
+    test_df:Optional[DataFrame] = field(default=None, repr=False)
 
 @dataclass
 class DataValidationArtifact:
@@ -14,8 +21,33 @@ class DataValidationArtifact:
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path:str
-    transformed_train_file_path:str
-    transformed_test_file_path:str
+    transformed_train_features_file_path:str
+    transformed_train_target_file_path:str
+    transformed_test_features_file_path:str
+    transformed_test_target_file_path:str
+    # None when the preprocessor could not be fused into an affine transform
+    fused_object_file_path:Optional[str] = None
+    # raw record -> model feature encoder (VehicleFeatureEncoder)
+    feature_encoder_file_path:Optional[str] = None
+    rebalance_report_file_path:Optional[str] = None
+    # balanced class weights for the estimator, set when the rebalance strategy is "class_weight"
+    class_weight:Optional[dict] = None
+    # whether the test split was rebalanced too (its metrics are then not measured on the real class distribution)
+    test_resampled:bool = False
+    # in-memory copies handed to the next stage (None when the stage only wrote files)
+    train_features:Optional[np.ndarray] = field(default=None, repr=False)
+    train_target:Optional[np.ndarray] = field(default=None, repr=False)
+    test_features:Optional[np.ndarray] = field(default=None, repr=False)
+    test_target:Optional[np.ndarray] = field(default=None, repr=False)
+    preprocessing_object:Optional[object] = field(default=None, repr=False)
+    fused_preprocessing_object:Optional[object] = field(default=None, repr=False)
+    feature_encoder_object:Optional[object] = field(default=None, repr=False)
+
+@dataclass
+class ModelTunerArtifact:
+    # best hyperparameters found per model name of the model config file
+    best_params:dict
+    tuning_report_file_path:str
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -23,12 +55,18 @@ class ClassificationMetricArtifact:
     f1_score:float
     precision_score:float
     recall_score:float
+    fit_time_seconds:float = 0.0
+    predict_latency_ms:float = 0.0
+    model_size_bytes:int = 0
 
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path:str 
     metric_artifact:ClassificationMetricArtifact
     metric_file_path:str
+    model_name:Optional[str] = None
+    # None when the selected model has no flat-array form
+    model_bundle_dir:Optional[str] = None
 
 @dataclass
 class ModelEvaluationArtifact:
@@ -38,6 +76,7 @@ class ModelEvaluationArtifact:
     s3_metric_path:str
     trained_model_path:str
     metric_file_path:str
+    model_bundle_dir:Optional[str] = None
 
 @dataclass
 class ModelPusherArtifact:
@@ -0,0 +1,151 @@
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class CompiledForest:
+    """
+    Flat struct-of-arrays copy of a fitted sklearn tree ensemble (RandomForest / ExtraTrees) with a
+    vectorized NumPy evaluator, so predictions need no per-tree Python or joblib dispatch.
+
+    The nodes of all trees are packed into one set of contiguous arrays. Leaves point to themselves,
+    so every row can walk all trees for `max_depth` steps in lockstep and simply stays on its leaf
+    once it got there. Leaf class distributions are normalised exactly like
+    DecisionTreeClassifier.predict_proba and averaged over the trees in tree order.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 missing_go_to_left: np.ndarray, value: np.ndarray, roots: np.ndarray,
+                 max_depth: int, classes: np.ndarray, n_features_in: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_go_to_left = missing_go_to_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Splits the model into JSON metadata and the arrays stored as blobs of a model bundle.
+        """
+        meta = {"max_depth": int(self.max_depth), "n_features_in": int(self.n_features_in_)}
+        arrays = {"feature": self.feature, "threshold": self.threshold, "left": self.left, "right": self.right,
+                  "missing_go_to_left": self.missing_go_to_left, "value": self.value, "roots": self.roots,
+                  "classes": self.classes_}
+        return meta, arrays
+
+    @classmethod
+    def from_bundle(cls, meta: dict, arrays: Dict[str, np.ndarray]) -> "CompiledForest":
+        return cls(max_depth=meta["max_depth"], n_features_in=meta["n_features_in"], **arrays)
+
+    @staticmethod
+    def is_supported(estimator: object) -> bool:
+        """
+        True for fitted single-output classifiers made of sklearn decision trees.
+        """
+        trees = getattr(estimator, "estimators_", None)
+        return (isinstance(trees, list) and len(trees) > 0
+                and all(hasattr(tree, "tree_") for tree in trees)
+                and getattr(estimator, "n_outputs_", 1) == 1
+                and hasattr(estimator, "classes_"))
+
+    @classmethod
+    def from_estimator(cls, estimator: object) -> "CompiledForest":
+        """
+        Packs the trees of a fitted forest into flat arrays.
+        """
+        try:
+            if not cls.is_supported(estimator):
+                raise ValueError(f"{type(estimator).__name__} is not a tree ensemble that can be compiled")
+
+            n_classes = len(estimator.classes_)
+            features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+            offset, max_depth = 0, 0
+            for tree in estimator.estimators_:
+                tree_ = tree.tree_
+                node_ids = np.arange(tree_.node_count, dtype=np.int32)
+                is_leaf = tree_.children_left == -1
+
+                # leaves loop back onto themselves, the feature/threshold they test do not matter
+                features.append(np.where(is_leaf, 0, tree_.feature).astype(np.int32))
+                thresholds.append(np.where(is_leaf, np.inf, tree_.threshold).astype(np.float64))
+                lefts.append(np.where(is_leaf, node_ids, tree_.children_left).astype(np.int32) + offset)
+                rights.append(np.where(is_leaf, node_ids, tree_.children_right).astype(np.int32) + offset)
+                go_left = getattr(tree_, "missing_go_to_left", None)
+                missing.append(np.zeros(tree_.node_count, dtype=bool) if go_left is None else go_left.astype(bool))
+
+                # same normalisation as DecisionTreeClassifier.predict_proba
+                proba = tree_.value[:, 0, :n_classes].astype(np.float64)
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(proba / normalizer)
+
+                roots.append(offset)
+                offset += tree_.node_count
+                max_depth = max(max_depth, tree_.max_depth)
+
+            compiled = cls(feature=np.ascontiguousarray(np.concatenate(features)),
+                           threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+                           left=np.ascontiguousarray(np.concatenate(lefts)),
+                           right=np.ascontiguousarray(np.concatenate(rights)),
+                           missing_go_to_left=np.ascontiguousarray(np.concatenate(missing)),
+                           value=np.ascontiguousarray(np.concatenate(values)),
+                           roots=np.asarray(roots, dtype=np.int32),
+                           max_depth=max_depth,
+                           classes=np.asarray(estimator.classes_),
+                           n_features_in=estimator.n_features_in_)
+            logging.info(f"Compiled {len(roots)} trees ({offset} nodes, depth {max_depth}) into flat arrays")
+            return compiled
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Returns the leaf index reached in every tree, shape (n_samples, n_trees).
+        """
+        # trees split on float32 features, exactly like sklearn
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input with {self.n_features_in_} features, got shape {X.shape}")
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            is_missing = np.isnan(values)
+            if is_missing.any():
+                go_left = np.where(is_missing, self.missing_go_to_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self.value[self.apply(X)]
+        # cumulative sum adds the trees strictly in order, like the sequential sklearn accumulation
+        return np.cumsum(leaf_values, axis=1)[:, -1, :] / len(self.roots)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def check_parity(self, estimator: object, X: np.ndarray, atol: float = 1e-9) -> Optional[str]:
+        """
+        Compares predictions and probabilities with the source estimator on X.
+        Returns None when they agree, otherwise a description of the mismatch.
+        """
+        expected_proba = estimator.predict_proba(X)
+        proba = self.predict_proba(X)
+        if not np.allclose(proba, expected_proba, rtol=0.0, atol=atol):
+            return f"probabilities differ by up to {np.max(np.abs(proba - expected_proba))}"
+        mismatched = int(np.sum(self.predict(X) != estimator.predict(X)))
+        if mismatched:
+            return f"{mismatched} of {len(X)} predictions differ"
+        return None
@@ -10,6 +10,10 @@ class TrainingPipelineConfig:
     pipeline_name: str = PIPELINE_NAME
     artifact_dir: str = os.path.join(ARTIFACT_DIR,TIMESTAMP)
     timestamp: str = TIMESTAMP
+    in_memory_artifacts: bool = PIPELINE_IN_MEMORY_ARTIFACTS
+    persist_artifacts: bool = PIPELINE_PERSIST_ARTIFACTS
+    stage_cache_enabled: bool = PIPELINE_STAGE_CACHE_ENABLED
+    stage_cache_dir: str = PIPELINE_STAGE_CACHE_DIR
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
@@ -21,6 +25,13 @@ class DataIngestionConfig:
     testing_file_path:str = os.path.join(data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    mongo_batch_size: int = DATA_INGESTION_MONGO_BATCH_SIZE
+    partition_key: str = DATA_INGESTION_PARTITION_KEY
+    n_read_workers: int = DATA_INGESTION_READ_WORKERS
+    create_partition_index: bool = DATA_INGESTION_CREATE_PARTITION_INDEX
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    snapshot_dir: str = DATA_INGESTION_SNAPSHOT_DIR
+    watermark_file_path: str = os.path.join(DATA_INGESTION_SNAPSHOT_DIR, DATA_INGESTION_WATERMARK_FILE_NAME)
 
 @dataclass
 class DataValidationConfig:
@@ -30,12 +41,40 @@ class DataValidationConfig:
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir:str = os.path.join(training_pipeline_config.artifact_dir,DATA_TRANSFORMATION_DIR_NAME)
-    transformed_train_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                        TRAIN_FILE_NAME.replace('csv','npy'))
-    transformed_test_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                        TEST_FILE_NAME.replace('csv','npy'))
+    transformed_train_features_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                            os.path.splitext(TRAIN_FILE_NAME)[0] + DATA_TRANSFORMATION_FEATURES_SUFFIX)
+    transformed_train_target_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                          os.path.splitext(TRAIN_FILE_NAME)[0] + DATA_TRANSFORMATION_TARGET_SUFFIX)
+    transformed_test_features_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                           os.path.splitext(TEST_FILE_NAME)[0] + DATA_TRANSFORMATION_FEATURES_SUFFIX)
+    transformed_test_target_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                         os.path.splitext(TEST_FILE_NAME)[0] + DATA_TRANSFORMATION_TARGET_SUFFIX)
+    feature_dtype:str = DATA_TRANSFORMATION_FEATURE_DTYPE
     transformed_object_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
                                                     PREPROCSSING_OBJECT_FILE_NAME)
+    fused_object_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+                                              FUSED_PREPROCESSING_OBJECT_FILE_NAME)
+    feature_encoder_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+                                                 FEATURE_ENCODER_OBJECT_FILE_NAME)
+    rebalance_strategy:str = DATA_TRANSFORMATION_REBALANCE_STRATEGY
+    rebalance_test:bool = DATA_TRANSFORMATION_REBALANCE_TEST
+    rebalance_k_neighbors:int = DATA_TRANSFORMATION_REBALANCE_K_NEIGHBORS
+    rebalance_n_jobs:int = DATA_TRANSFORMATION_REBALANCE_N_JOBS
+    rebalance_random_state:int = DATA_TRANSFORMATION_REBALANCE_RANDOM_STATE
+    rebalance_report_file_path:str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_REBALANCE_REPORT_FILE_NAME)
+
+@dataclass
+class ModelTunerConfig:
+    enabled: bool = MODEL_TUNER_ENABLED
+    model_tuner_dir: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_TUNER_DIR_NAME)
+    tuning_report_file_path: str = os.path.join(model_tuner_dir, MODEL_TUNER_REPORT_FILE_NAME)
+    model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    n_jobs: int = MODEL_TUNER_N_JOBS
+    time_budget_seconds: float = MODEL_TUNER_TIME_BUDGET_SECONDS
+    halving_factor: int = MODEL_TUNER_HALVING_FACTOR
+    min_resources: int = MODEL_TUNER_MIN_RESOURCES
+    holdout_ratio: float = MODEL_TUNER_HOLDOUT_RATIO
+    random_state: int = MODEL_TUNER_RANDOM_STATE
 
 @dataclass
 class ModelTrainerConfig:
@@ -44,12 +83,12 @@ class ModelTrainerConfig:
     metric_file_path: str = os.path.join(model_trainer_dir,METRIC_FILE_NAME)
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
-    _n_estimators = MODEL_TRAINER_N_ESTIMATORS
-    _min_samples_split = MODEL_TRAINER_MIN_SAMPLES_SPLIT
-    _min_samples_leaf = MODEL_TRAINER_MIN_SAMPLES_LEAF
-    _max_depth = MIN_SAMPLES_SPLIT_MAX_DEPTH
-    _criterion = MIN_SAMPLES_SPLIT_CRITERION
-    _random_state = MIN_SAMPLES_SPLIT_RANDOM_STATE
+    _n_jobs = MODEL_TRAINER_N_JOBS
+    _tree_batch_size = MODEL_TRAINER_TREE_BATCH_SIZE
+    _max_samples = MODEL_TRAINER_MAX_SAMPLES
+    checkpoint_dir: str = MODEL_TRAINER_CHECKPOINT_DIR
+    compile_model: bool = MODEL_TRAINER_COMPILE_MODEL
+    model_bundle_dir: str = os.path.join(model_trainer_dir, MODEL_BUNDLE_DIR_NAME)
 
 @dataclass
 class ModelEvaluationConfig:
@@ -62,10 +101,32 @@ class ModelEvaluationConfig:
 class ModelPusherConfig:
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    s3_model_bundle_prefix: str = MODEL_BUNDLE_DIR_NAME
     s3_metric_key_path:str = METRIC_FILE_NAME
 
 @dataclass
 class VehiclePredictorConfig:
     model_file_path: str = MODEL_FILE_NAME
     model_bucket_name: str = MODEL_BUCKET_NAME
-    metric_file_path:str = METRIC_FILE_NAME
\ No newline at end of file
+    metric_file_path:str = METRIC_FILE_NAME
+    model_bundle_prefix: str = MODEL_BUNDLE_DIR_NAME
+    local_model_dir: str = MODEL_REGISTRY_LOCAL_DIR
+    verify_model_cache: bool = MODEL_REGISTRY_VERIFY_CACHE
+    prefer_model_bundle: bool = MODEL_REGISTRY_PREFER_BUNDLE
+    model_refresh_interval_seconds: int = MODEL_REGISTRY_REFRESH_INTERVAL_SECONDS
+    coalescer_max_batch_size: int = PREDICTION_COALESCER_MAX_BATCH_SIZE
+    coalescer_max_wait_ms: float = PREDICTION_COALESCER_MAX_WAIT_MS
+    prediction_cache_enabled: bool = PREDICTION_CACHE_ENABLED
+    prediction_cache_max_entries: int = PREDICTION_CACHE_MAX_ENTRIES
+    prediction_cache_ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS
+    inference_executor_type: str = INFERENCE_EXECUTOR_TYPE
+    inference_max_workers: int = INFERENCE_MAX_WORKERS
+    inference_max_pending: int = INFERENCE_MAX_PENDING
+
+@dataclass
+class TrainingJobConfig:
+    nice: int = TRAINING_JOB_NICE
+    history_size: int = TRAINING_JOB_HISTORY_SIZE
+    cancel_grace_seconds: float = TRAINING_JOB_CANCEL_GRACE_SECONDS
+    lock_file_path: str = TRAINING_JOB_LOCK_FILE_PATH
+    status_dir: str = TRAINING_JOB_STATUS_DIR
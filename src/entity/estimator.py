@@ -1,4 +1,5 @@
 import sys
+from typing import List, Optional, Tuple, Union
 
 import pandas as pd
 import numpy as np
@@ -19,28 +20,89 @@ class TargetValueMapping:
         return dict(zip(mapping_response.values(),mapping_response.keys()))
 
 class MyModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object,
+                 compiled_model: Optional[object] = None, fused_preprocessor: Optional[object] = None,
+                 feature_encoder: Optional[object] = None):
         """
         :param preprocessing_object: Input Object of preprocesser
         :param trained_model_object: Input Object of trained model 
+        :param compiled_model: Optional flat-array copy of the trained model (e.g. CompiledForest) used for inference
+        :param fused_preprocessor: Optional precomputed affine copy of preprocessing_object (FusedAffinePreprocessor)
+        :param feature_encoder: Optional fitted raw record encoder (VehicleFeatureEncoder) the model was trained with
         """
+        # encoded NumPy input goes straight into the fused transform, so both must use the same column order
+        if (fused_preprocessor is not None and feature_encoder is not None
+                and list(fused_preprocessor.input_columns) != list(feature_encoder.output_columns)):
+            raise ValueError(f"Fused preprocessor columns {list(fused_preprocessor.input_columns)} do not match "
+                             f"the feature encoder output {list(feature_encoder.output_columns)}")
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_model = compiled_model
+        self.fused_preprocessor = fused_preprocessor
+        self.feature_encoder = feature_encoder
 
-    def predict(self, dataframe: pd.DataFrame) -> np.ndarray:
+    @property
+    def predictor(self) -> object:
         """
-        Function accepts preprocessed inputs (with all custom transformations already applied),
+        The object predictions are computed with: the compiled model when there is one, else the sklearn model.
+        Models pickled before compiled_model existed have no such attribute.
+        """
+        compiled_model = getattr(self, "compiled_model", None)
+        return compiled_model if compiled_model is not None else self.trained_model_object
+
+    @property
+    def input_columns(self) -> List[str]:
+        """
+        Column order expected for NumPy input: the columns the preprocessing object was fitted on.
+        """
+        fused_preprocessor = getattr(self, "fused_preprocessor", None)
+        if fused_preprocessor is not None:
+            return list(fused_preprocessor.input_columns)
+        return list(self.preprocessing_object.feature_names_in_)
+
+    def encode(self, dataframe: Union[pd.DataFrame, np.ndarray]) -> Union[pd.DataFrame, np.ndarray]:
+        """
+        Encodes raw records (a DataFrame with the raw columns, or an object matrix in the encoder's
+        input_columns order) into a float matrix in input_columns order. Encoded input is returned as it is.
+        Models pickled before feature_encoder existed only accept encoded input.
+        """
+        feature_encoder = getattr(self, "feature_encoder", None)
+        if feature_encoder is not None and feature_encoder.is_raw(dataframe):
+            return feature_encoder.transform(dataframe)
+        if isinstance(dataframe, np.ndarray) and dataframe.dtype == object:
+            raise ValueError("Raw records need a model trained with a feature encoder")
+        return dataframe
+
+    def transform(self, dataframe: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Encodes raw records, then applies the scaling. A NumPy matrix (columns in input_columns order) goes
+        straight through the fused affine transform when there is one, skipping pandas; otherwise the
+        sklearn pipeline is used.
+        """
+        dataframe = self.encode(dataframe)
+        fused_preprocessor = getattr(self, "fused_preprocessor", None)
+        if isinstance(dataframe, np.ndarray):
+            if fused_preprocessor is not None:
+                return fused_preprocessor.transform(dataframe)
+            dataframe = pd.DataFrame(dataframe, columns=self.input_columns)
+        elif fused_preprocessor is not None:
+            return fused_preprocessor.transform(fused_preprocessor.to_array(dataframe))
+        return self.preprocessing_object.transform(dataframe)
+
+    def predict(self, dataframe: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Function accepts raw records (encoded with the model's feature encoder) or already encoded inputs,
         applies scaling using preprocessing_object, and performs prediction on transformed features.
         """
         try:
             logging.info("Starting prediction process.")
 
             # Step 1: Apply scaling transformations using the pre-trained preprocessing object
-            transformed_feature = self.preprocessing_object.transform(dataframe)
+            transformed_feature = self.transform(dataframe)
 
             # Step 2: Perform prediction using the trained model
             logging.info("Using the trained model to get predictions")
-            predictions = self.trained_model_object.predict(transformed_feature)
+            predictions = self.predictor.predict(transformed_feature)
 
             return predictions
 
@@ -49,8 +111,29 @@ class MyModel:
             raise MyException(e, sys) from e
 
 
+    def predict_with_proba(self, dataframe: Union[pd.DataFrame, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same input contract as predict. Transforms the whole batch once and returns both the
+        predicted classes and the probability of the positive class (Response = 1) for every row.
+        """
+        try:
+            logging.info("Starting batch prediction process.")
+            transformed_feature = self.transform(dataframe)
+
+            predictor = self.predictor
+            probabilities = predictor.predict_proba(transformed_feature)
+            classes = predictor.classes_
+            predictions = classes[np.argmax(probabilities, axis=1)]
+            positive_class_index = list(classes).index(1)
+
+            return predictions, probabilities[:, positive_class_index]
+
+        except Exception as e:
+            logging.error("Error occurred in predict_with_proba method", exc_info=True)
+            raise MyException(e, sys) from e
+
     def __repr__(self):
-        return f"{type(self.trained_model_object).__name__}()"
+        return f"{type(self.predictor).__name__}()"
 
     def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
\ No newline at end of file
+        return f"{type(self.predictor).__name__}()"
\ No newline at end of file
@@ -0,0 +1,148 @@
+import sys
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.constants import TARGET_COLUMN
+from src.exception import MyException
+from src.logger import logging
+
+
+class VehicleFeatureEncoder:
+    """
+    Fitted raw-record to model-feature encoder shared by training and serving.
+
+    Driven by the schema file: `binary_mappings` columns are mapped to fixed numbers, `one_hot_features`
+    are one-hot encoded over their sorted training levels with the first level dropped (the columns
+    pd.get_dummies(drop_first=True) produced), and every other schema column passes through as a number.
+    Output columns are always the passthrough/mapped columns in schema order followed by the one-hot
+    columns, named like 'Vehicle_Age_lt_1_Year'. Categories are encoded with np.searchsorted on the sorted
+    level arrays and a lookup table per column, in one vectorized pass over the batch.
+    """
+
+    def __init__(self, input_columns: List[str], binary_mappings: Dict[str, Dict[str, float]],
+                 one_hot_levels: Dict[str, List[str]]):
+        """
+        :param input_columns: raw columns in the order a NumPy input must follow
+        :param binary_mappings: {column: {level: value}} for mapped columns
+        :param one_hot_levels: {column: sorted training levels} for one-hot encoded columns
+        """
+        self.input_columns = list(input_columns)
+        self.binary_mappings = {column: dict(mapping) for column, mapping in binary_mappings.items()}
+        self.one_hot_levels = {column: list(levels) for column, levels in one_hot_levels.items()}
+        self._build_lookups()
+
+    def _build_lookups(self) -> None:
+        # per categorical column: sorted levels and the output values of each level (n_levels x n_outputs)
+        self._levels: Dict[str, np.ndarray] = {}
+        self._lookups: Dict[str, np.ndarray] = {}
+        for column, mapping in self.binary_mappings.items():
+            levels = sorted(mapping)
+            self._levels[column] = np.asarray(levels, dtype=str)
+            self._lookups[column] = np.asarray([[mapping[level]] for level in levels], dtype=np.float64)
+        for column, levels in self.one_hot_levels.items():
+            self._levels[column] = np.asarray(levels, dtype=str)
+            self._lookups[column] = np.eye(len(levels), dtype=np.float64)[:, 1:]
+
+        passthrough = [column for column in self.input_columns if column not in self.one_hot_levels]
+        one_hot = [f"{column}_{self.get_level_name(level)}"
+                   for column in self.input_columns if column in self.one_hot_levels
+                   for level in self.one_hot_levels[column][1:]]
+        self.output_columns: List[str] = passthrough + one_hot
+
+    @staticmethod
+    def get_level_name(level: str) -> str:
+        """
+        Column-name-safe form of a category level: '< 1 Year' -> 'lt_1_Year', '> 2 Years' -> 'gt_2_Years'.
+        """
+        return str(level).replace("<", "lt").replace(">", "gt").replace(" ", "_")
+
+    @staticmethod
+    def get_input_columns(schema_config: dict) -> List[str]:
+        """
+        Raw feature columns in schema order, without the dropped id column and the target.
+        """
+        drop_columns = np.atleast_1d(schema_config.get("drop_columns", [])).tolist()
+        return [column for entry in schema_config["columns"] for column in entry
+                if column not in drop_columns and column != TARGET_COLUMN]
+
+    @classmethod
+    def fit(cls, schema_config: dict, dataframe: pd.DataFrame) -> "VehicleFeatureEncoder":
+        """
+        Learns the sorted levels of the one-hot columns from the training data.
+        """
+        try:
+            input_columns = cls.get_input_columns(schema_config)
+            binary_mappings = schema_config.get("binary_mappings") or {}
+            one_hot_levels = {column: sorted(str(level) for level in dataframe[column].dropna().unique())
+                              for column in schema_config.get("one_hot_features") or []}
+            encoder = cls(input_columns=input_columns, binary_mappings=binary_mappings, one_hot_levels=one_hot_levels)
+            logging.info(f"Fitted feature encoder: {len(input_columns)} raw columns -> {encoder.output_columns}")
+            return encoder
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Everything fits in the JSON metadata of a model bundle, the lookup tables are rebuilt on load.
+        """
+        meta = {"input_columns": self.input_columns, "binary_mappings": self.binary_mappings,
+                "one_hot_levels": self.one_hot_levels}
+        return meta, {}
+
+    @classmethod
+    def from_bundle(cls, meta: dict, arrays: Dict[str, np.ndarray]) -> "VehicleFeatureEncoder":
+        return cls(**meta)
+
+    def is_raw(self, data: Union[pd.DataFrame, np.ndarray]) -> bool:
+        """
+        True for input that still needs encoding: a DataFrame holding the categorical raw columns,
+        or an object matrix (mixed strings and numbers) with one column per raw input column.
+        """
+        if isinstance(data, pd.DataFrame):
+            return all(column in data.columns for column in self._levels)
+        return data.dtype == object and data.ndim == 2 and data.shape[1] == len(self.input_columns)
+
+    def _encode_column(self, column: str, values: np.ndarray) -> np.ndarray:
+        levels = self._levels[column]
+        values = values.astype(str)
+        codes = np.minimum(np.searchsorted(levels, values), len(levels) - 1)
+        unknown = levels[codes] != values
+        if unknown.any():
+            raise ValueError(f"Unknown {column} values {sorted(set(values[unknown].tolist()))}, expected one of {levels.tolist()}")
+        return self._lookups[column][codes]
+
+    def transform(self, data: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Encodes raw records, given as a DataFrame or as a matrix with columns in input_columns order,
+        into a float64 matrix with columns in output_columns order.
+        """
+        if isinstance(data, pd.DataFrame):
+            missing_columns = [column for column in self.input_columns if column not in data.columns]
+            if missing_columns:
+                raise ValueError(f"Records are missing required fields: {missing_columns}")
+            get_values = lambda position, column: data[column].to_numpy()
+        else:
+            data = np.asarray(data, dtype=object)
+            if data.ndim != 2 or data.shape[1] != len(self.input_columns):
+                raise ValueError(f"Expected input with {len(self.input_columns)} columns, got shape {data.shape}")
+            get_values = lambda position, column: data[:, position]
+
+        passthrough, one_hot = [], []
+        for position, column in enumerate(self.input_columns):
+            values = get_values(position, column)
+            if column in self.one_hot_levels:
+                one_hot.append(self._encode_column(column, values))
+            elif column in self.binary_mappings:
+                passthrough.append(self._encode_column(column, values))
+            else:
+                passthrough.append(values.astype(np.float64)[:, np.newaxis])
+        return np.hstack(passthrough + one_hot)
+
+    def transform_frame(self, data: Union[pd.DataFrame, np.ndarray]) -> pd.DataFrame:
+        """
+        Same as transform, returned as a DataFrame with the output column names (for fitting the preprocessor).
+        """
+        index = data.index if isinstance(data, pd.DataFrame) else None
+        return pd.DataFrame(self.transform(data), columns=self.output_columns, index=index)
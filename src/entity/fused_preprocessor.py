@@ -0,0 +1,155 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, MinMaxScaler, StandardScaler
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class FusedAffinePreprocessor:
+    """
+    Precomputed replacement for the fitted preprocessing Pipeline(ColumnTransformer(StandardScaler, MinMaxScaler,
+    remainder='passthrough')).
+
+    Every output column is `(x[column_index] - sub) / div * mul + add`:
+    StandardScaler columns use sub=mean_, div=scale_; MinMaxScaler columns use mul=scale_, add=min_;
+    passthrough columns use the identity values. Subtracting 0, dividing or multiplying by 1 and adding 0
+    are exact, so the result is bit-identical to the sklearn pipeline. Output columns follow the
+    ColumnTransformer order: transformers first, then the remainder in input order.
+    """
+
+    def __init__(self, input_columns: List[str], column_index: np.ndarray,
+                 sub: np.ndarray, div: np.ndarray, mul: np.ndarray, add: np.ndarray):
+        self.input_columns = input_columns
+        self.column_index = column_index
+        self.sub = sub
+        self.div = div
+        self.mul = mul
+        self.add = add
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Splits the transform into JSON metadata and the arrays stored as blobs of a model bundle.
+        """
+        meta = {"input_columns": list(self.input_columns)}
+        arrays = {"column_index": self.column_index, "sub": self.sub, "div": self.div, "mul": self.mul, "add": self.add}
+        return meta, arrays
+
+    @classmethod
+    def from_bundle(cls, meta: dict, arrays: Dict[str, np.ndarray]) -> "FusedAffinePreprocessor":
+        return cls(input_columns=meta["input_columns"], **arrays)
+
+    @staticmethod
+    def _is_passthrough(transformer: object) -> bool:
+        # recent sklearn versions store remainder='passthrough' as an identity FunctionTransformer
+        if isinstance(transformer, FunctionTransformer):
+            return transformer.func is None
+        return isinstance(transformer, str) and transformer == "passthrough"
+
+    @staticmethod
+    def _get_column_transformer(preprocessing_object: object) -> Optional[ColumnTransformer]:
+        if isinstance(preprocessing_object, Pipeline):
+            if len(preprocessing_object.steps) != 1:
+                return None
+            preprocessing_object = preprocessing_object.steps[0][1]
+        if isinstance(preprocessing_object, ColumnTransformer) and hasattr(preprocessing_object, "transformers_"):
+            return preprocessing_object
+        return None
+
+    @classmethod
+    def is_supported(cls, preprocessing_object: object) -> bool:
+        """
+        True for a fitted ColumnTransformer (optionally in a one-step Pipeline) made only of
+        StandardScaler, MinMaxScaler, passthrough and drop on DataFrame input.
+        """
+        column_transformer = cls._get_column_transformer(preprocessing_object)
+        if column_transformer is None or not hasattr(column_transformer, "feature_names_in_"):
+            return False
+        for _, transformer, _ in column_transformer.transformers_:
+            if isinstance(transformer, MinMaxScaler) and transformer.clip:
+                return False
+            if not (cls._is_passthrough(transformer) or (isinstance(transformer, str) and transformer == "drop")
+                    or isinstance(transformer, (StandardScaler, MinMaxScaler))):
+                return False
+        return True
+
+    @classmethod
+    def from_pipeline(cls, preprocessing_object: object) -> "FusedAffinePreprocessor":
+        """
+        Collects the fitted statistics of every transformer into one scale+offset vector per output column.
+        """
+        try:
+            if not cls.is_supported(preprocessing_object):
+                raise ValueError(f"{type(preprocessing_object).__name__} cannot be fused into an affine transform")
+
+            column_transformer = cls._get_column_transformer(preprocessing_object)
+            input_columns = list(column_transformer.feature_names_in_)
+            column_index, sub, div, mul, add = [], [], [], [], []
+            for _, transformer, columns in column_transformer.transformers_:
+                if isinstance(transformer, str) and transformer == "drop":
+                    continue
+                indices = [input_columns.index(column) if isinstance(column, str) else int(column)
+                           for column in np.atleast_1d(columns)]
+                n_columns = len(indices)
+                column_index.extend(indices)
+                ones, zeros = np.ones(n_columns), np.zeros(n_columns)
+                if isinstance(transformer, StandardScaler):
+                    sub.append(transformer.mean_ if transformer.with_mean else zeros)
+                    div.append(transformer.scale_ if transformer.with_std else ones)
+                    mul.append(ones)
+                    add.append(zeros)
+                elif isinstance(transformer, MinMaxScaler):
+                    sub.append(zeros)
+                    div.append(ones)
+                    mul.append(transformer.scale_)
+                    add.append(transformer.min_)
+                else:
+                    sub.append(zeros)
+                    div.append(ones)
+                    mul.append(ones)
+                    add.append(zeros)
+
+            fused = cls(input_columns=input_columns,
+                        column_index=np.asarray(column_index, dtype=np.intp),
+                        sub=np.concatenate(sub).astype(np.float64),
+                        div=np.concatenate(div).astype(np.float64),
+                        mul=np.concatenate(mul).astype(np.float64),
+                        add=np.concatenate(add).astype(np.float64))
+            logging.info(f"Fused preprocessing into an affine transform over {len(column_index)} columns")
+            return fused
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def to_array(self, dataframe: pd.DataFrame) -> np.ndarray:
+        """
+        Input columns of a DataFrame as a float64 matrix in the order transform expects.
+        """
+        return dataframe[self.input_columns].to_numpy(dtype=np.float64)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Transforms a float matrix whose columns are in `input_columns` order.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.input_columns):
+            raise ValueError(f"Expected input with {len(self.input_columns)} columns, got shape {X.shape}")
+        return (X[:, self.column_index] - self.sub) / self.div * self.mul + self.add
+
+    def check_parity(self, preprocessing_object: object, dataframe: pd.DataFrame) -> Optional[str]:
+        """
+        Compares the fused transform with the sklearn pipeline on dataframe.
+        Returns None when the outputs are identical, otherwise a description of the mismatch.
+        """
+        expected = np.asarray(preprocessing_object.transform(dataframe), dtype=np.float64)
+        transformed = self.transform(self.to_array(dataframe))
+        if transformed.shape != expected.shape:
+            return f"shape {transformed.shape} instead of {expected.shape}"
+        if not np.array_equal(transformed, expected, equal_nan=True):
+            return f"values differ by up to {np.nanmax(np.abs(transformed - expected))}"
+        return None
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from src.constants import MODEL_BUNDLE_BLOB_DIR_NAME, MODEL_BUNDLE_FORMAT_VERSION, MODEL_BUNDLE_MANIFEST_FILE_NAME
+from src.entity.compiled_forest import CompiledForest
+from src.entity.estimator import MyModel
+from src.entity.feature_encoder import VehicleFeatureEncoder
+from src.entity.fused_preprocessor import FusedAffinePreprocessor
+from src.exception import MyException
+from src.logger import logging
+
+"""
+Model bundle layout (format_version 1):
+
+    <bundle_dir>/manifest.json          format version, component types, metadata and blob table
+    <bundle_dir>/blobs/<sha256>.npy     one plain .npy file per array, named by the sha256 of its bytes
+
+Blobs are opened with np.load(mmap_mode='r'): nothing is deserialized, arrays are paged in on first
+use and several worker processes mapping the same files share the pages through the OS page cache.
+"""
+
+# component types a bundle can hold, by the name written to the manifest
+BUNDLE_COMPONENTS = {
+    "FusedAffinePreprocessor": FusedAffinePreprocessor,
+    "CompiledForest": CompiledForest,
+    "VehicleFeatureEncoder": VehicleFeatureEncoder,
+}
+
+
+def is_bundle_supported(model: MyModel) -> bool:
+    """
+    A MyModel can be bundled when both its preprocessing and its estimator have flat-array forms.
+    """
+    return (getattr(model, "fused_preprocessor", None) is not None
+            and getattr(model, "compiled_model", None) is not None)
+
+
+def get_manifest_path(bundle_dir: str) -> str:
+    return os.path.join(bundle_dir, MODEL_BUNDLE_MANIFEST_FILE_NAME)
+
+
+def get_blob_path(bundle_dir: str, blob_name: str) -> str:
+    return os.path.join(bundle_dir, MODEL_BUNDLE_BLOB_DIR_NAME, blob_name)
+
+
+def _write_blob(bundle_dir: str, array: np.ndarray) -> dict:
+    """
+    Writes the array as a .npy blob named after its content hash and returns its manifest entry.
+    """
+    array = np.ascontiguousarray(array)
+    tmp_path = get_blob_path(bundle_dir, f"tmp-{os.getpid()}.npy")
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    with open(tmp_path, "wb") as file_obj:
+        np.save(file_obj, array, allow_pickle=False)
+
+    digest = hashlib.sha256()
+    with open(tmp_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(1 << 20), b""):
+            digest.update(block)
+    blob_name = f"{digest.hexdigest()}.npy"
+    os.replace(tmp_path, get_blob_path(bundle_dir, blob_name))
+    return {"blob": blob_name, "sha256": digest.hexdigest(), "size": os.path.getsize(get_blob_path(bundle_dir, blob_name)),
+            "dtype": array.dtype.str, "shape": list(array.shape)}
+
+
+def save_model_bundle(model: MyModel, bundle_dir: str) -> dict:
+    """
+    Writes the flat-array form of a MyModel as a model bundle and returns its manifest.
+    The manifest is written last, so a bundle directory with a manifest is always complete.
+    """
+    try:
+        if not is_bundle_supported(model):
+            raise ValueError("Only models with a fused preprocessor and a compiled estimator can be bundled")
+
+        components = {}
+        roles = [("preprocessor", model.fused_preprocessor), ("model", model.compiled_model)]
+        if getattr(model, "feature_encoder", None) is not None:
+            roles.append(("encoder", model.feature_encoder))
+        for role, component in roles:
+            meta, arrays = component.to_bundle()
+            components[role] = {"type": type(component).__name__, "meta": meta,
+                                "arrays": {name: _write_blob(bundle_dir, array) for name, array in arrays.items()}}
+
+        manifest = {
+            "format_version": MODEL_BUNDLE_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "estimator": type(model.trained_model_object).__name__,
+            "components": components,
+        }
+        tmp_path = get_manifest_path(bundle_dir) + ".tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(manifest, file_obj, indent=4)
+        os.replace(tmp_path, get_manifest_path(bundle_dir))
+        logging.info(f"Model bundle written to {bundle_dir}")
+        return manifest
+
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def read_manifest(manifest_path: str) -> dict:
+    """
+    Reads a bundle manifest and checks that this code understands its format version.
+    """
+    try:
+        with open(manifest_path, "r") as file_obj:
+            manifest = json.load(file_obj)
+        if manifest.get("format_version") != MODEL_BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format version {manifest.get('format_version')}, "
+                             f"expected {MODEL_BUNDLE_FORMAT_VERSION}")
+        return manifest
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def load_model_bundle(bundle_dir: str, mmap_mode: Optional[str] = "r") -> MyModel:
+    """
+    Loads a model bundle as a MyModel serving from the flat-array components.
+    With mmap_mode='r' the arrays stay memory-mapped read-only views of the blob files.
+    """
+    try:
+        manifest = read_manifest(get_manifest_path(bundle_dir))
+        loaded = {}
+        for role, component in manifest["components"].items():
+            arrays = {}
+            for name, entry in component["arrays"].items():
+                blob_path = get_blob_path(bundle_dir, entry["blob"])
+                if os.path.getsize(blob_path) != entry["size"]:
+                    raise ValueError(f"Blob {entry['blob']} has {os.path.getsize(blob_path)} bytes, expected {entry['size']}")
+                arrays[name] = np.load(blob_path, mmap_mode=mmap_mode, allow_pickle=False)
+            loaded[role] = BUNDLE_COMPONENTS[component["type"]].from_bundle(component["meta"], arrays)
+
+        return MyModel(preprocessing_object=None, trained_model_object=None,
+                       compiled_model=loaded["model"], fused_preprocessor=loaded["preprocessor"],
+                       feature_encoder=loaded.get("encoder"))
+
+    except Exception as e:
+        raise MyException(e, sys) from e
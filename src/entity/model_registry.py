@@ -0,0 +1,140 @@
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+
+from src.entity.config_entity import VehiclePredictorConfig
+from src.entity.estimator import MyModel
+from src.entity.s3_manager import ProductionModelManager
+from src.exception import MyException
+from src.logger import logging
+
+
+class ModelRegistry:
+    """
+    Process-wide warm cache of the production model.
+
+    The model is downloaded and deserialized once, then kept in memory. A background thread
+    polls the S3 object's ETag/LastModified and swaps in the new MyModel only after it has been
+    fully loaded, so requests always see either the old or the new model, never a partial one.
+    """
+    _registry = None # shared ModelRegistry instance across the process
+    _registry_lock = threading.Lock()
+
+    def __init__(self, prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig):
+        """
+        :param prediction_pipeline_config: Configuration pointing at the production model in S3
+        """
+        try:
+            self.prediction_pipeline_config = prediction_pipeline_config
+            self.model_manager = ProductionModelManager(
+                bucket_name=prediction_pipeline_config.model_bucket_name,
+                model_path=prediction_pipeline_config.model_file_path,
+                metric_path=prediction_pipeline_config.metric_file_path,
+                bundle_prefix=prediction_pipeline_config.model_bundle_prefix if prediction_pipeline_config.prefer_model_bundle else None,
+                local_model_dir=prediction_pipeline_config.local_model_dir,
+                verify_model_cache=prediction_pipeline_config.verify_model_cache
+            )
+            # (model, version) is replaced as one tuple so readers never see a mismatched pair
+            self._current: Tuple[Optional[MyModel], Optional[str]] = (None, None)
+            self._load_lock = threading.Lock()
+            self._stop_event = threading.Event()
+            self._refresh_thread: Optional[threading.Thread] = None
+            # wall-clock seconds the last model load took (download + deserialize / mmap)
+            self.last_load_seconds: Optional[float] = None
+        except Exception as e:
+            raise MyException(e, sys)
+
+    @classmethod
+    def get_registry(cls, prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig) -> "ModelRegistry":
+        """
+        Returns the shared registry, creating it on first use.
+        """
+        if cls._registry is None:
+            with cls._registry_lock:
+                if cls._registry is None:
+                    cls._registry = cls(prediction_pipeline_config=prediction_pipeline_config)
+        return cls._registry
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current[1]
+
+    def get_model(self) -> MyModel:
+        """
+        Returns the warm production model, loading it on the first call.
+        """
+        return self.get_model_and_version()[0]
+
+    def get_model_and_version(self) -> Tuple[MyModel, str]:
+        """
+        Returns the warm production model together with its version, read as one consistent pair.
+        """
+        try:
+            model, version = self._current
+            if model is None:
+                self.refresh()
+                model, version = self._current
+            if model is None:
+                raise Exception("No production model is available in the model registry")
+            return model, version
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def refresh(self) -> bool:
+        """
+        Reloads the model if the S3 object has changed since it was last loaded.
+        Returns True if a new model was swapped in.
+        """
+        try:
+            with self._load_lock:
+                latest_version = self.model_manager.get_model_version()
+                if latest_version is None:
+                    logging.warning("Production model not found in S3. Keeping the current model.")
+                    return False
+                if latest_version == self.version:
+                    return False
+
+                logging.info(f"Loading production model version {latest_version}")
+                start_time = time.perf_counter()
+                model = self.model_manager.load_model()
+                self.last_load_seconds = time.perf_counter() - start_time
+                self._current = (model, latest_version)
+                logging.info(f"Model registry now serving version {latest_version} "
+                             f"(loaded in {self.last_load_seconds * 1000:.1f} ms)")
+                return True
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def _refresh_loop(self) -> None:
+        interval = self.prediction_pipeline_config.model_refresh_interval_seconds
+        while not self._stop_event.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # keep serving the current model; the next poll retries
+                logging.warning(f"Model registry refresh failed: {e}")
+
+    def start(self) -> None:
+        """
+        Loads the model eagerly and starts the background version poller.
+        """
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.warning(f"Initial model load failed, will retry in background: {e}")
+
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            self._stop_event.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="model-registry-refresh", daemon=True)
+            self._refresh_thread.start()
+            logging.info("Model registry background refresh started")
+
+    def stop(self) -> None:
+        """
+        Stops the background version poller.
+        """
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of single-row predictions with a time-to-live, shared by the threads of one process.
+
+    Keys are a hash of the encoded feature vector (float64, -0.0 folded into 0.0) together with the model
+    version, so a hit skips preprocessing and tree traversal entirely. When the model version changes the
+    whole cache is dropped, entries of the previous model can never be served or take up room.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_entries: entries kept before the least recently used one is evicted
+        :param ttl_seconds: age after which an entry is no longer served, None keeps entries until evicted
+        :param clock: source of the entry timestamps in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.model_version: Optional[str] = None
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def get_keys(features: np.ndarray, model_version: str) -> List[bytes]:
+        """
+        One key per row of an encoded float feature matrix.
+        """
+        features = np.ascontiguousarray(features, dtype=np.float64) + 0.0
+        version = str(model_version).encode()
+        return [hashlib.blake2b(row.tobytes() + version, digest_size=16).digest() for row in features]
+
+    def set_model_version(self, model_version: str) -> None:
+        """
+        Drops every entry when the served model changed.
+        """
+        with self._lock:
+            if model_version != self.model_version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.model_version = model_version
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[object]]:
+        """
+        Cached predictions for the keys, None for misses. Hits become the most recently used entries.
+        """
+        now = self.clock()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_seconds is not None and now - entry[1] > self.ttl_seconds:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[0])
+        return results
+
+    def put_many(self, keys: List[bytes], values: List[object]) -> None:
+        """
+        Stores predictions, evicting the least recently used entries beyond max_entries.
+        """
+        now = self.clock()
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / lookups if lookups else None,
+                    "evictions": self.evictions, "expirations": self.expirations,
+                    "invalidations": self.invalidations, "model_version": self.model_version}
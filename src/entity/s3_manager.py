@@ -1,10 +1,17 @@
 import json
+import os
+import shutil
 import sys
+from typing import Optional
 from pandas import DataFrame
 from src.cloud_storage.aws_storage import SimpleStorageService
+from src.cloud_storage.model_cache import ModelCache
 from src.exception import MyException
 from src.logger import logging
+from src.constants import MODEL_BUNDLE_BLOB_DIR_NAME, MODEL_BUNDLE_MANIFEST_FILE_NAME
 from src.entity.estimator import MyModel
+from src.entity.model_bundle import get_blob_path, get_manifest_path, load_model_bundle, read_manifest
+from src.utils.main_utils import load_object
 
 
 class ProductionModelManager:
@@ -12,13 +19,35 @@ class ProductionModelManager:
     Manages saving/loading models and metrics to/from S3 and making predictions with production models.
     """
 
-    def __init__(self, bucket_name: str, model_path: str, metric_path: str):
+    def __init__(self, bucket_name: str, model_path: str, metric_path: str,
+                 bundle_prefix: Optional[str] = None, local_model_dir: Optional[str] = None,
+                 verify_model_cache: bool = True):
+        """
+        :param bundle_prefix: S3 prefix of the model bundle. When set, the bundle is preferred over model_path
+                              for versioning and loading whenever it has been published
+        :param local_model_dir: local model cache directory; models are downloaded only when their ETag changed
+                                and loaded (or memory-mapped) from disk. None reads model_path straight from S3
+        :param verify_model_cache: re-check the sha256 of cached files before reusing them
+        """
         self.bucket_name = bucket_name
         self.model_path = model_path
         self.metric_path = metric_path
+        self.bundle_prefix = bundle_prefix
+        self.local_model_dir = local_model_dir
         self.s3 = SimpleStorageService()
+        self.model_cache = ModelCache(cache_dir=local_model_dir, s3=self.s3,
+                                      verify_checksum=verify_model_cache) if local_model_dir is not None else None
         self.loaded_model: MyModel = None
 
+    @property
+    def bundle_manifest_key(self) -> Optional[str]:
+        if self.bundle_prefix is None:
+            return None
+        return f"{self.bundle_prefix}/{MODEL_BUNDLE_MANIFEST_FILE_NAME}"
+
+    def get_bundle_blob_key(self, blob_name: str) -> str:
+        return f"{self.bundle_prefix}/{MODEL_BUNDLE_BLOB_DIR_NAME}/{blob_name}"
+
     def is_model_present(self) -> bool:
         try:
             return self.s3.s3_key_path_available(bucket_name=self.bucket_name, s3_key=self.model_path)
@@ -33,22 +62,83 @@ class ProductionModelManager:
             logging.warning(f"Metric check failed: {e}")
             return False
 
+    def get_model_version(self) -> Optional[str]:
+        """
+        Return a version tag (ETag + LastModified) of the model object in S3 without downloading it.
+        Returns None if no model has been published yet.
+        """
+        try:
+            if self.bundle_manifest_key is not None:
+                metadata = self.s3.get_object_metadata(bucket_name=self.bucket_name, s3_key=self.bundle_manifest_key)
+                if metadata is not None:
+                    return f"bundle:{metadata['etag']}:{metadata['last_modified'].isoformat()}"
+            metadata = self.s3.get_object_metadata(bucket_name=self.bucket_name, s3_key=self.model_path)
+            if metadata is None:
+                return None
+            return f"{metadata['etag']}:{metadata['last_modified'].isoformat()}"
+        except Exception as e:
+            raise MyException(e, sys)
+
     def load_model(self) -> MyModel:
         """
-        Load the model object from S3.
+        Load the model object from S3, from the model bundle when one is published and preferred.
         """
         try:
+            if self.bundle_manifest_key is not None and self.model_cache is not None and self.s3.get_object_metadata(
+                    bucket_name=self.bucket_name, s3_key=self.bundle_manifest_key) is not None:
+                return self.load_model_bundle()
+            if self.model_cache is not None:
+                model = load_object(self.model_cache.fetch(bucket_name=self.bucket_name, s3_key=self.model_path))
+                logging.info("Production model loaded from the local model cache")
+                return model
             return self.s3.load_model(self.model_path, bucket_name=self.bucket_name)
         except Exception as e:
             raise MyException(e, sys)
 
-    def load_metrics(self) -> dict:
+    def load_model_bundle(self) -> MyModel:
+        """
+        Fetches the bundle manifest and the blobs missing locally through the model cache, then memory-maps the bundle.
+        Blobs are named by their sha256, so blobs shared with an earlier version are not downloaded again,
+        and every downloaded blob is checked against the sha256 recorded in the manifest.
+        """
+        try:
+            local_bundle_dir = os.path.join(self.local_model_dir, self.bundle_prefix)
+            cached_manifest_path = self.model_cache.fetch(bucket_name=self.bucket_name, s3_key=self.bundle_manifest_key)
+            manifest = read_manifest(cached_manifest_path)
+
+            blob_paths = []
+            for component in manifest["components"].values():
+                for entry in component["arrays"].values():
+                    blob_paths.append(self.model_cache.fetch_blob(bucket_name=self.bucket_name,
+                                                                  s3_key=self.get_bundle_blob_key(entry["blob"]),
+                                                                  file_path=get_blob_path(local_bundle_dir, entry["blob"]),
+                                                                  sha256=entry["sha256"], size=entry["size"]))
+            # blobs are evicted together with the manifest version that uses them
+            self.model_cache.record_blobs(bucket_name=self.bucket_name, s3_key=self.bundle_manifest_key,
+                                          blob_paths=blob_paths)
+
+            # the manifest goes live only once every blob it references is on disk
+            manifest_path = get_manifest_path(local_bundle_dir)
+            tmp_manifest_path = f"{manifest_path}.{os.getpid()}.tmp"
+            shutil.copyfile(cached_manifest_path, tmp_manifest_path)
+            os.replace(tmp_manifest_path, manifest_path)
+            model = load_model_bundle(local_bundle_dir)
+            logging.info(f"Production model loaded from bundle s3://{self.bucket_name}/{self.bundle_prefix}")
+            return model
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def load_metrics(self, missing_ok: bool = False) -> Optional[dict]:
         """
-        Load the stored metrics JSON from S3.
+        Load the stored metrics JSON from S3 with a single GET on the metric key.
+        Returns None when the metrics do not exist and missing_ok is set.
         """
         try:
-            file_obj = self.s3.get_file_object(filename=self.metric_path, bucket_name=self.bucket_name)
-            content = self.s3.read_object(file_obj)
+            content = self.s3.read_key(bucket_name=self.bucket_name, s3_key=self.metric_path)
+            if content is None:
+                if missing_ok:
+                    return None
+                raise FileNotFoundError(f"s3://{self.bucket_name}/{self.metric_path} does not exist")
             metrics = json.loads(content)
             logging.info(f"Loaded metrics: {metrics}")
             return metrics
@@ -61,10 +151,12 @@ class ProductionModelManager:
         If not available, returns 0.0.
         """
         try:
-            if not self.is_metric_present():
+            # one GET: a missing key is reported by the read itself, no separate existence check
+            metrics = self.load_metrics(missing_ok=True)
+            if metrics is None:
                 logging.warning("metrics.json not found in S3. Assuming no previous model.")
                 return 0.0
-            return self.load_metrics().get("f1_score", 0.0)
+            return metrics.get("f1_score", 0.0)
         except Exception as e:
             logging.warning(f"Failed to extract F1 score from metrics: {e}")
             return 0.0
@@ -110,9 +202,45 @@ class ProductionModelManager:
         except Exception as e:
             raise MyException(e, sys)
 
-    def save_model_and_metrics(self, model_path: str, metrics_path: str) -> None:
+    def save_model_bundle(self, local_bundle_dir: str) -> None:
+        """
+        Upload a model bundle to S3. Blobs already in the bucket are skipped and the manifest is
+        uploaded last, so a published manifest never references a missing blob.
+        """
+        try:
+            manifest = read_manifest(get_manifest_path(local_bundle_dir))
+            for component in manifest["components"].values():
+                for entry in component["arrays"].values():
+                    blob_key = self.get_bundle_blob_key(entry["blob"])
+                    metadata = self.s3.get_object_metadata(bucket_name=self.bucket_name, s3_key=blob_key)
+                    if metadata is not None and metadata["size"] == entry["size"]:
+                        continue
+                    self.s3.upload_file(from_filename=get_blob_path(local_bundle_dir, entry["blob"]),
+                                        to_filename=blob_key, bucket_name=self.bucket_name, remove=False)
+            self.s3.upload_file(from_filename=get_manifest_path(local_bundle_dir), to_filename=self.bundle_manifest_key,
+                                bucket_name=self.bucket_name, remove=False)
+            logging.info(f"Uploaded model bundle to s3://{self.bucket_name}/{self.bundle_prefix}")
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def remove_model_bundle(self) -> None:
+        """
+        Unpublish the bundle manifest, so readers fall back to model_path (the blobs stay for older manifests).
+        """
+        try:
+            self.s3.delete_object(bucket_name=self.bucket_name, s3_key=self.bundle_manifest_key)
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def save_model_and_metrics(self, model_path: str, metrics_path: str, model_bundle_dir: Optional[str] = None) -> None:
         """
         Convenience method to save both model and metrics in one call.
+        The bundle is published when given, and unpublished otherwise so it cannot shadow the new model.
         """
+        if self.bundle_prefix is not None:
+            if model_bundle_dir is not None:
+                self.save_model_bundle(local_bundle_dir=model_bundle_dir)
+            else:
+                self.remove_model_bundle()
         self.save_model(local_model_path=model_path)
         self.save_metrics(local_metrics_path=metrics_path)
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from src.cloud_storage.aws_storage import SimpleStorageService
+from src.entity.config_entity import VehiclePredictorConfig
+from src.entity.model_registry import ModelRegistry
+from src.exception import MyException
+from src.logger import logging
+from src.pipeline.prediction_pipeline import VehicleDataClassifier
+
+
+class InferencePoolSaturatedError(Exception):
+    """
+    Raised when the inference pool already has `max_pending` jobs queued or running.
+    """
+
+
+# model predictor of the current worker process (process executor only)
+_worker_classifier: Optional[VehicleDataClassifier] = None
+
+
+def _init_worker(prediction_pipeline_config: VehiclePredictorConfig) -> None:
+    """
+    Process pool initializer: preloads the production model once per worker process.
+    """
+    global _worker_classifier
+    ModelRegistry.get_registry(prediction_pipeline_config).start()
+    _worker_classifier = VehicleDataClassifier(prediction_pipeline_config=prediction_pipeline_config)
+
+
+def _run_in_worker(method_name: str, dataframe: Union[DataFrame, np.ndarray]):
+    return getattr(_worker_classifier, method_name)(dataframe=dataframe)
+
+
+def _get_counters(classifier: Optional[VehicleDataClassifier]) -> Tuple[int, dict]:
+    prediction_cache = getattr(classifier, "prediction_cache", None)
+    return os.getpid(), {"s3_api_calls": SimpleStorageService.get_api_call_counts(),
+                         "prediction_cache": prediction_cache.get_stats() if prediction_cache is not None else None}
+
+
+def _get_worker_counters() -> Tuple[int, dict]:
+    return _get_counters(_worker_classifier)
+
+
+class InferenceWorkerPool:
+    """
+    Runs CPU-bound model inference off the event loop in a thread or process pool.
+
+    Thread workers share the process-wide ModelRegistry; process workers each preload their own
+    copy of the model on start-up. At most `max_pending` jobs are accepted at a time, further
+    submissions fail fast with InferencePoolSaturatedError so the caller can answer 503.
+    """
+
+    def __init__(self, prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig):
+        """
+        :param prediction_pipeline_config: Configuration for the production model and the pool size
+        """
+        self.prediction_pipeline_config = prediction_pipeline_config
+        self.executor_type = prediction_pipeline_config.inference_executor_type
+        self.max_workers = prediction_pipeline_config.inference_max_workers
+        self.max_pending = prediction_pipeline_config.inference_max_pending
+        self._executor: Optional[Executor] = None
+        self._classifier = VehicleDataClassifier(prediction_pipeline_config=prediction_pipeline_config)
+        # only touched from the event loop thread, so plain counters are enough
+        self._pending = 0
+        self.completed_jobs = 0
+        self.scored_rows = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        """
+        Creates the executor and preloads the model in the workers.
+        """
+        try:
+            if self._executor is not None:
+                return
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     initializer=_init_worker,
+                                                     initargs=(self.prediction_pipeline_config,))
+            elif self.executor_type == "thread":
+                ModelRegistry.get_registry(self.prediction_pipeline_config).start()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            else:
+                raise ValueError(f"Unknown inference executor type: {self.executor_type}")
+            logging.info(f"Inference pool started: {self.executor_type} x {self.max_workers}, "
+                         f"max_pending={self.max_pending}")
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def stop(self) -> None:
+        """
+        Shuts the executor down and stops the model refresh of thread workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.executor_type == "thread":
+            ModelRegistry.get_registry(self.prediction_pipeline_config).stop()
+
+    async def run(self, method_name: str, dataframe: Union[DataFrame, np.ndarray]):
+        """
+        Runs VehicleDataClassifier.<method_name>(dataframe) in the pool without blocking the event loop.
+        """
+        if self._pending >= self.max_pending:
+            raise InferencePoolSaturatedError(f"Inference queue is full ({self.max_pending} pending jobs)")
+        if self._executor is None:
+            self.start()
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if self.executor_type == "process":
+                result = await loop.run_in_executor(self._executor, _run_in_worker, method_name, dataframe)
+            else:
+                result = await loop.run_in_executor(self._executor, getattr(self._classifier, method_name), dataframe)
+            self.completed_jobs += 1
+            self.scored_rows += len(dataframe)
+            return result
+        finally:
+            self._pending -= 1
+
+    async def get_process_counters(self) -> Dict[str, dict]:
+        """
+        S3 API call counts and prediction cache counters by process id. Thread workers share this process;
+        for process workers one probe per worker is submitted, and busy workers may leave fewer processes in the answer.
+        """
+        pid, counters = _get_counters(self._classifier if self.executor_type == "thread" else None)
+        process_counters = {str(pid): counters}
+        if self.executor_type == "process" and self._executor is not None:
+            loop = asyncio.get_running_loop()
+            probes = [loop.run_in_executor(self._executor, _get_worker_counters) for _ in range(self.max_workers)]
+            for pid, counters in await asyncio.gather(*probes):
+                process_counters[str(pid)] = counters
+        return process_counters
+
+    async def get_stats(self) -> dict:
+        """
+        Served jobs and rows together with the S3 API calls they caused and the prediction cache counters.
+        """
+        process_counters = await self.get_process_counters()
+        s3_api_calls = {pid: counters["s3_api_calls"] for pid, counters in process_counters.items()}
+        total_s3_api_calls = sum(sum(process_counts.values()) for process_counts in s3_api_calls.values())
+        return {
+            "executor_type": self.executor_type,
+            "max_workers": self.max_workers,
+            "pending": self._pending,
+            "completed_jobs": self.completed_jobs,
+            "scored_rows": self.scored_rows,
+            "s3_api_calls": s3_api_calls,
+            "s3_api_calls_total": total_s3_api_calls,
+            "s3_api_calls_per_job": total_s3_api_calls / self.completed_jobs if self.completed_jobs else None,
+            "prediction_cache": {pid: counters["prediction_cache"] for pid, counters in process_counters.items()
+                                 if counters["prediction_cache"] is not None}
+        }
+
+    async def predict(self, dataframe: Union[DataFrame, np.ndarray]):
+        return await self.run("predict", dataframe)
+
+    async def predict_batch(self, dataframe: Union[DataFrame, np.ndarray]):
+        return await self.run("predict_batch", dataframe)
@@ -0,0 +1,151 @@
+import asyncio
+import inspect
+from typing import Callable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.logger import logging
+
+
+class PredictionCoalescerStoppedError(Exception):
+    """
+    Raised to requests that were still queued when the coalescer was stopped.
+    """
+
+
+class PredictionCoalescer:
+    """
+    Collects small prediction requests arriving concurrently and scores them as one batch.
+
+    Every request waits at most `max_wait_ms` (or until `max_batch_size` rows are queued),
+    the collected rows are scored with a single call to `score_batch`, and the predictions
+    are split back out to the waiting requests in arrival order.
+    """
+
+    def __init__(self, score_batch: Callable[[Union[DataFrame, np.ndarray]], np.ndarray], max_batch_size: int, max_wait_ms: float):
+        """
+        :param score_batch: callable (sync or async) scoring a DataFrame or feature matrix and returning one prediction per row
+        :param max_batch_size: maximum number of rows scored together
+        :param max_wait_ms: maximum time the first request of a batch waits for others to join
+        """
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._scoring_tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """
+        Starts the background batching task on the running event loop.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+            logging.info(f"Prediction coalescer started (max_batch_size={self.max_batch_size}, "
+                         f"max_wait_ms={self.max_wait_seconds * 1000})")
+
+    async def stop(self) -> None:
+        """
+        Cancels the background batching task. Requests that were queued or being collected into a batch
+        fail with PredictionCoalescerStoppedError, batches already being scored are awaited.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+            self._fail_batch(queued)
+        if self._scoring_tasks:
+            await asyncio.gather(*self._scoring_tasks, return_exceptions=True)
+
+    async def submit(self, dataframe: Union[DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Queues the rows of `dataframe` for the next batch and waits for their predictions.
+        """
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((dataframe, future))
+        return await future
+
+    @staticmethod
+    def _fail_batch(batch: List[Tuple[DataFrame, asyncio.Future]]) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(PredictionCoalescerStoppedError("Prediction coalescer was stopped"))
+
+    async def _collect_batch(self, batch: List[Tuple[DataFrame, asyncio.Future]]) -> None:
+        """
+        Appends queued requests to `batch`, which the caller owns so it can fail them if collecting is cancelled.
+        """
+        first = await self._queue.get()
+        batch.append(first)
+        n_rows = len(first[0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait_seconds
+
+        while n_rows < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+
+    async def _score(self, batch: List[Tuple[DataFrame, asyncio.Future]]) -> None:
+        try:
+            frames = [dataframe for dataframe, _ in batch]
+            if len(frames) == 1:
+                batch_df = frames[0]
+            elif isinstance(frames[0], np.ndarray):
+                batch_df = np.concatenate(frames)
+            else:
+                batch_df = pd.concat(frames, ignore_index=True)
+
+            predictions = self.score_batch(batch_df)
+            if inspect.isawaitable(predictions):
+                predictions = await predictions
+            predictions = np.asarray(predictions)
+            logging.info(f"Coalesced {len(batch)} requests into one batch of {len(batch_df)} rows")
+
+            offset = 0
+            for dataframe, future in batch:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(dataframe)])
+                offset += len(dataframe)
+
+        except Exception as e:
+            # hand the original error to every waiting request so callers can react to its type
+            logging.warning(f"Scoring a coalesced batch of {len(batch)} requests failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _run(self) -> None:
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect_batch(batch)
+                if inspect.iscoroutinefunction(self.score_batch):
+                    # scoring runs elsewhere (e.g. a worker pool): keep collecting the next batch meanwhile
+                    task = asyncio.create_task(self._score(batch))
+                    self._scoring_tasks.add(task)
+                    task.add_done_callback(self._scoring_tasks.discard)
+                else:
+                    await self._score(batch)
+        except asyncio.CancelledError:
+            # requests collected for a batch that was not handed to a scoring task yet
+            self._fail_batch(batch)
+            raise
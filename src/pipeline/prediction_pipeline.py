@@ -1,28 +1,44 @@
 import sys
 from src.entity.config_entity import VehiclePredictorConfig
-from src.entity.s3_manager import ProductionModelManager
+from src.entity.model_registry import ModelRegistry
+from src.entity.prediction_cache import PredictionCache
 from src.exception import MyException
 from src.logger import logging
 from pandas import DataFrame
 import numpy as np
+from typing import List, Tuple, Union
 
 class VehicleData:
+    # raw record fields, in schema order: the input order of the model's feature encoder
+    feature_columns: List[str] = [
+        "Gender",
+        "Age",
+        "Driving_License",
+        "Region_Code",
+        "Previously_Insured",
+        "Vehicle_Age",
+        "Vehicle_Damage",
+        "Annual_Premium",
+        "Policy_Sales_Channel",
+        "Vintage"
+    ]
+
     def __init__(self,
                 Gender,
                 Age,
                 Driving_License,
                 Region_Code,
                 Previously_Insured,
+                Vehicle_Age,
+                Vehicle_Damage,
                 Annual_Premium,
                 Policy_Sales_Channel,
-                Vintage,
-                Vehicle_Age_lt_1_Year,
-                Vehicle_Age_gt_2_Years,
-                Vehicle_Damage_Yes
+                Vintage
                 ):
         """
         Vehicle Data constructor
-        Input: all features of the trained model for prediction
+        Input: raw vehicle record (Gender 'Male'/'Female', Vehicle_Age '< 1 Year'/'1-2 Year'/'> 2 Years',
+               Vehicle_Damage 'Yes'/'No'), encoded by the model's feature encoder
         """
         try:
             self.Gender = Gender
@@ -30,12 +46,11 @@ class VehicleData:
             self.Driving_License = Driving_License
             self.Region_Code = Region_Code
             self.Previously_Insured = Previously_Insured
+            self.Vehicle_Age = Vehicle_Age
+            self.Vehicle_Damage = Vehicle_Damage
             self.Annual_Premium = Annual_Premium
             self.Policy_Sales_Channel = Policy_Sales_Channel
             self.Vintage = Vintage
-            self.Vehicle_Age_lt_1_Year = Vehicle_Age_lt_1_Year
-            self.Vehicle_Age_gt_2_Years = Vehicle_Age_gt_2_Years
-            self.Vehicle_Damage_Yes = Vehicle_Damage_Yes
 
         except Exception as e:
             raise MyException(e, sys) from e
@@ -48,19 +63,7 @@ class VehicleData:
         logging.info("Entered get_vehicle_data_as_dict method as VehicleData class")
 
         try:
-            input_data = {
-                "Gender": [self.Gender],
-                "Age": [self.Age],
-                "Driving_License": [self.Driving_License],
-                "Region_Code": [self.Region_Code],
-                "Previously_Insured": [self.Previously_Insured],
-                "Annual_Premium": [self.Annual_Premium],
-                "Policy_Sales_Channel": [self.Policy_Sales_Channel],
-                "Vintage": [self.Vintage],
-                "Vehicle_Age_lt_1_Year": [self.Vehicle_Age_lt_1_Year],
-                "Vehicle_Age_gt_2_Years": [self.Vehicle_Age_gt_2_Years],
-                "Vehicle_Damage_Yes": [self.Vehicle_Damage_Yes]
-            }
+            input_data = {column: [getattr(self, column)] for column in VehicleData.feature_columns}
 
             logging.info("Created vehicle data dict")
             logging.info("Exited get_vehicle_data_as_dict method as VehicleData class")
@@ -81,6 +84,35 @@ class VehicleData:
         except Exception as e:
             raise MyException(e, sys) from e
 
+    def get_vehicle_input_array(self) -> np.ndarray:
+        """
+        This function returns the raw record as a 1 x n_fields object matrix in feature_columns order,
+        which the model encodes and scores without going through pandas
+        """
+        try:
+            return np.array([[getattr(self, column) for column in VehicleData.feature_columns]], dtype=object)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def get_vehicle_batch_array(records: List[dict]) -> np.ndarray:
+        """
+        This function builds one object matrix (feature_columns order) from a list of raw vehicle records,
+        so a whole batch can be encoded and scored with a single model call and no pandas overhead.
+        """
+        try:
+            missing_columns = [column for column in VehicleData.feature_columns
+                               if any(column not in record for record in records)]
+            if missing_columns:
+                raise ValueError(f"Records are missing required fields: {missing_columns}")
+
+            return np.array([[record[column] for column in VehicleData.feature_columns] for record in records],
+                            dtype=object)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
 class VehicleDataClassifier:
     def __init__(self,prediction_pipeline_config: VehiclePredictorConfig,) -> None:
         """
@@ -88,26 +120,60 @@ class VehicleDataClassifier:
         """
         try:
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.prediction_cache = PredictionCache(
+                max_entries=prediction_pipeline_config.prediction_cache_max_entries,
+                ttl_seconds=prediction_pipeline_config.prediction_cache_ttl_seconds
+            ) if prediction_pipeline_config.prediction_cache_enabled else None
         except Exception as e:
             raise MyException(e, sys)
 
-    def predict(self, dataframe) -> np.ndarray:
+    def predict(self, dataframe: Union[DataFrame, np.ndarray]) -> np.ndarray:
         """
         This is the method of VehicleDataClassifier
         Returns: Prediction in string format
         """
         try:
             logging.info("Entered predict method of VehicleDataClassifier class")
-            model = ProductionModelManager(
-                bucket_name=self.prediction_pipeline_config.model_bucket_name,
-                model_path=self.prediction_pipeline_config.model_file_path,
-                metric_path=self.prediction_pipeline_config.metric_file_path
-            ).load_model()
+            # warm model shared across requests, hot-reloaded when a new one is pushed
+            model, model_version = ModelRegistry.get_registry(self.prediction_pipeline_config).get_model_and_version()
+            if self.prediction_cache is None:
+                return model.predict(dataframe=dataframe) # returns numpy array
+            return self.predict_cached(model=model, model_version=model_version, dataframe=dataframe)
+        
+        except Exception as e:
+            raise MyException(e, sys)
 
-            result = model.predict(dataframe=dataframe) # returns numpy array
+    def predict_cached(self, model, model_version: str, dataframe: Union[DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Encodes the rows, serves the ones seen before from the prediction cache and scores only the others.
+        """
+        features = model.encode(dataframe)
+        if isinstance(features, DataFrame):
+            features = features[model.input_columns].to_numpy(dtype=np.float64)
+        features = np.asarray(features, dtype=np.float64)
+
+        self.prediction_cache.set_model_version(model_version)
+        keys = PredictionCache.get_keys(features, model_version)
+        cached = self.prediction_cache.get_many(keys)
+        missing = [position for position, value in enumerate(cached) if value is None]
+        if not missing:
+            return np.asarray(cached)
+
+        predictions = model.predict(dataframe=features[missing])
+        self.prediction_cache.put_many([keys[position] for position in missing], list(predictions))
+        for position, prediction in zip(missing, predictions):
+            cached[position] = prediction
+        return np.asarray(cached)
+
+    def predict_batch(self, dataframe: Union[DataFrame, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This is the method of VehicleDataClassifier
+        Returns: predicted classes and positive class probabilities for every row, scored in one call
+        """
+        try:
+            logging.info("Entered predict_batch method of VehicleDataClassifier class")
+            model = ModelRegistry.get_registry(self.prediction_pipeline_config).get_model()
+            return model.predict_with_proba(dataframe=dataframe)
 
-            # Convert numpy array to string
-            return result
-        
         except Exception as e:
             raise MyException(e, sys)
\ No newline at end of file
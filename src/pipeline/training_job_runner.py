@@ -0,0 +1,383 @@
+import copy
+import json
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where only the in-process lock applies
+    fcntl = None
+
+from src.entity.config_entity import TrainingJobConfig
+from src.exception import MyException
+from src.logger import logging
+
+
+class TrainingJobRunningError(Exception):
+    """
+    Raised when a training job is submitted while another one is still running.
+    """
+
+
+def _process_exists(pid: int) -> bool:
+    if os.name == "nt":  # os.kill would terminate the process there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _run_training_job(job_id: str, progress_queue: multiprocessing.Queue, nice: int) -> None:
+    """
+    Entry point of the training process: runs the whole pipeline and reports its progress as events.
+    """
+    if nice:
+        try:
+            os.nice(nice)
+        except (AttributeError, OSError):
+            pass
+
+    def report(stage: str, event: str, **details) -> None:
+        progress_queue.put({"stage": stage, "event": event, "time": time.time(), **details})
+
+    try:
+        # imported here so the pipeline, and the artifact timestamp of its configs, belong to this process
+        from src.pipeline.training_pipeline import TrainingPipeline
+        TrainingPipeline().run_pipeline(progress_callback=report)
+        report(None, "succeeded")
+    except Exception as e:
+        report(None, "failed", error=str(e))
+
+
+class TrainingJobRunner:
+    """
+    Runs the training pipeline in a separate process, one job at a time.
+
+    The process is started with the 'spawn' method, so it shares no state, threads or sockets with the
+    serving process and gets fresh pipeline configs (a new artifact directory) for every job. It runs at
+    a lower CPU priority. Stage events come back over a queue and are folded into the job record by a
+    monitor thread. Jobs can be cancelled, which terminates the process (SIGTERM, then SIGKILL).
+    Besides the in-process lock, a running job holds an exclusive lock on lock_file_path, so several
+    server worker processes never train at the same time either. Every job record is also written to
+    status_dir/<job_id>.json, from which the other worker processes report the job and, through the
+    process id recorded there, cancel it.
+    """
+
+    def __init__(self, training_job_config: TrainingJobConfig = TrainingJobConfig()):
+        """
+        :param training_job_config: process priority, job history size and cancellation grace period
+        """
+        self.training_job_config = training_job_config
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # (job_id, process, monitor thread) of the running job; guarded by _lock, at most one at a time
+        self._active: Optional[tuple] = None
+        # open lock file while a job runs
+        self._lock_file = None
+
+    def _acquire_file_lock(self, job_id: str) -> None:
+        """
+        Takes the cross-process job lock and records the job id in it. Raises TrainingJobRunningError
+        if a server process holds it.
+        """
+        if fcntl is None:
+            return
+        lock_file_path = self.training_job_config.lock_file_path
+        os.makedirs(os.path.dirname(lock_file_path) or ".", exist_ok=True)
+        lock_file = open(lock_file_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            running_job_id = lock_file.read().strip()
+            lock_file.close()
+            raise TrainingJobRunningError(f"Training job {running_job_id} is still running in another server process")
+        lock_file.truncate(0)
+        lock_file.write(job_id)
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    def _release_file_lock(self) -> None:
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _read_lock_owner(self) -> Optional[str]:
+        """
+        Id of the job recorded in the lock file (the running job while the lock is held).
+        """
+        try:
+            with open(self.training_job_config.lock_file_path) as lock_file:
+                return lock_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _get_status_file_path(self, job_id: str, suffix: str = "json") -> str:
+        return os.path.join(self.training_job_config.status_dir, f"{job_id}.{suffix}")
+
+    def _write_job(self, job: dict) -> None:
+        """
+        Persists the job record (atomically, readers never see a partial file). The file only serves
+        other server processes, so a failed write is logged instead of stopping the job.
+        """
+        status_file_path = self._get_status_file_path(job["job_id"])
+        try:
+            os.makedirs(os.path.dirname(status_file_path), exist_ok=True)
+            tmp_path = f"{status_file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as status_file:
+                json.dump(job, status_file)
+            os.replace(tmp_path, status_file_path)
+        except OSError as e:
+            logging.warning(f"Could not write the status file of training job {job['job_id']}: {e}")
+
+    def _read_job(self, job_id: str) -> Optional[dict]:
+        """
+        Returns the persisted record of a job run by any server process, or None for unknown jobs.
+        """
+        # job ids come from request paths: only accept our own format before building a file path
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        try:
+            with open(self._get_status_file_path(job_id)) as status_file:
+                job = json.load(status_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if job["status"] == "running" and not _process_exists(job["server_pid"]):
+            # the server process owning the job died before it could record the outcome
+            job["status"] = "failed"
+            job["error"] = f"Server process {job['server_pid']} exited while the job was running"
+            job["current_stage"] = None
+        return job
+
+    def submit(self) -> dict:
+        """
+        Starts a training job and returns its record. Raises TrainingJobRunningError if one is running.
+        """
+        try:
+            with self._lock:
+                if self._active is not None:
+                    raise TrainingJobRunningError(f"Training job {self._active[0]} is still running")
+
+                job_id = uuid.uuid4().hex
+                self._acquire_file_lock(job_id)
+                progress_queue = self._context.Queue()
+                process = self._context.Process(target=_run_training_job, name=f"training-{job_id}",
+                                                args=(job_id, progress_queue, self.training_job_config.nice))
+                job = {"job_id": job_id, "status": "running", "submitted_at": time.time(), "finished_at": None,
+                       "current_stage": None, "stages": {}, "error": None, "cancel_requested": False,
+                       "server_pid": os.getpid(), "pid": None}
+                monitor = threading.Thread(target=self._monitor, args=(job_id, process, progress_queue),
+                                           name=f"training-monitor-{job_id}", daemon=True)
+                try:
+                    process.start()
+                except Exception:
+                    self._release_file_lock()
+                    raise
+                job["pid"] = process.pid
+                self._write_job(job)
+                self._jobs[job_id] = job
+                self._active = (job_id, process, monitor)
+                self._trim_history()
+
+            monitor.start()
+            logging.info(f"Training job {job_id} started in process {process.pid}")
+            return self.get_job(job_id)
+
+        except TrainingJobRunningError:
+            raise
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _trim_history(self) -> None:
+        history_size = self.training_job_config.history_size
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] != "running"]
+        for job_id in finished[:max(0, len(self._jobs) - history_size)]:
+            del self._jobs[job_id]
+
+        # status files of all server processes; called while holding the cross-process lock
+        status_dir = self.training_job_config.status_dir
+        if not os.path.isdir(status_dir):
+            return
+        job_ids = [file_name[:-len(".json")] for file_name in os.listdir(status_dir) if file_name.endswith(".json")]
+        jobs = sorted((job for job in map(self._read_job, job_ids) if job is not None),
+                      key=lambda job: job["submitted_at"])
+        for job in jobs[:max(0, len(jobs) - history_size)]:
+            if job["status"] != "running":
+                os.remove(self._get_status_file_path(job["job_id"]))
+                if os.path.exists(self._get_status_file_path(job["job_id"], "cancel")):
+                    os.remove(self._get_status_file_path(job["job_id"], "cancel"))
+
+    def _apply_event(self, job: dict, event: dict) -> None:
+        stage, name = event["stage"], event["event"]
+        if stage is not None:
+            record = job["stages"].setdefault(stage, {"status": None, "started_at": None, "seconds": None})
+            record["status"] = name
+            if name == "started":
+                record["started_at"] = event["time"]
+                job["current_stage"] = stage
+            elif name == "finished":
+                record["seconds"] = event.get("seconds")
+                record["cached"] = event.get("cached", False)
+        else:
+            if name == "failed" and job["current_stage"] is not None:
+                job["stages"][job["current_stage"]]["status"] = "failed"
+            job["status"] = name
+            job["error"] = event.get("error")
+            job["current_stage"] = None
+
+    def _monitor(self, job_id: str, process: multiprocessing.Process, progress_queue: multiprocessing.Queue) -> None:
+        """
+        Folds the events of a job into its record until its process exits, then releases the runner.
+        """
+        # the outcome is applied only once the process is gone, so a finished job never blocks a new submit
+        outcome = None
+
+        def handle(event: dict) -> None:
+            nonlocal outcome
+            if event["stage"] is None:
+                outcome = event
+                return
+            with self._lock:
+                self._apply_event(self._jobs[job_id], event)
+                self._write_job(self._jobs[job_id])
+
+        while True:
+            try:
+                handle(progress_queue.get(timeout=0.5))
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+
+        process.join()
+        # events put just before the process exited may still be in the queue
+        while True:
+            try:
+                handle(progress_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        with self._lock:
+            job = self._jobs[job_id]
+            if outcome is not None:
+                self._apply_event(job, outcome)
+            # another server process cancels the job through a marker file next to its status file
+            cancel_marker_path = self._get_status_file_path(job_id, "cancel")
+            if os.path.exists(cancel_marker_path):
+                job["cancel_requested"] = True
+                os.remove(cancel_marker_path)
+            if job["status"] == "running":
+                if job["cancel_requested"]:
+                    job["status"] = "cancelled"
+                else:
+                    job["status"] = "failed"
+                    job["error"] = f"Training process exited with code {process.exitcode}"
+                if job["current_stage"] is not None:
+                    job["stages"][job["current_stage"]]["status"] = job["status"]
+                job["current_stage"] = None
+            job["finished_at"] = time.time()
+            self._write_job(job)
+            self._active = None
+            self._release_file_lock()
+        progress_queue.close()
+        logging.info(f"Training job {job_id} {job['status']}")
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """
+        Returns a snapshot of the job record with per-stage status and timings, or None for unknown jobs.
+        Jobs run by other server processes are read from their status files.
+        """
+        with self._lock:
+            job = copy.deepcopy(self._jobs.get(job_id))
+        if job is None:
+            job = self._read_job(job_id)
+            if job is None:
+                return None
+        now = job["finished_at"] or time.time()
+        job["elapsed_seconds"] = now - job["submitted_at"]
+        if job["current_stage"] is not None:
+            stage = job["stages"][job["current_stage"]]
+            stage["elapsed_seconds"] = now - stage["started_at"]
+        return job
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Terminates a running job. Finished jobs are returned as they are, unknown jobs give None.
+        """
+        with self._lock:
+            known = job_id in self._jobs
+            active = self._active is not None and self._active[0] == job_id
+            if active:
+                self._jobs[job_id]["cancel_requested"] = True
+                _, process, monitor = self._active
+        if not known:
+            return self._cancel_elsewhere(job_id)
+        if not active:
+            return self.get_job(job_id)
+
+        logging.info(f"Cancelling training job {job_id}")
+        process.terminate()
+        process.join(self.training_job_config.cancel_grace_seconds)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        # the monitor records the final status once it sees the process gone
+        monitor.join()
+        return self.get_job(job_id)
+
+    def _wait_until_finished(self, job_id: str, timeout: float) -> bool:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self._read_job(job_id)
+            if job is None or job["status"] != "running":
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _cancel_elsewhere(self, job_id: str) -> Optional[dict]:
+        """
+        Cancels a job run by another server process: signals the training process recorded in its
+        status file and waits for the owning process to record the outcome.
+        """
+        job = self._read_job(job_id)
+        if job is None or job["status"] != "running":
+            return self.get_job(job_id)
+        # the process id is only trusted while the lock file still names the job
+        if fcntl is not None and self._read_lock_owner() != job_id:
+            return self.get_job(job_id)
+
+        logging.info(f"Cancelling training job {job_id} of server process {job['server_pid']} (process {job['pid']})")
+        open(self._get_status_file_path(job_id, "cancel"), "w").close()
+        grace_seconds = self.training_job_config.cancel_grace_seconds
+        try:
+            os.kill(job["pid"], signal.SIGTERM)
+            if not self._wait_until_finished(job_id, grace_seconds):
+                os.kill(job["pid"], getattr(signal, "SIGKILL", signal.SIGTERM))
+        except ProcessLookupError:
+            pass
+        # the owning monitor notices the exit within its polling interval
+        self._wait_until_finished(job_id, grace_seconds)
+        return self.get_job(job_id)
+
+    def stop(self) -> None:
+        """
+        Cancels the job running in this server process, if any (e.g. on server shutdown).
+        """
+        with self._lock:
+            active = self._active
+        if active is not None:
+            self.cancel(active[0])
@@ -1,18 +1,34 @@
 import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from src.constants import SCHEMA_FILE_PATH
 from src.exception import MyException
 from src.logger import logging
 
 from src.components.data_ingestion import DataIngestion
 from src.components.data_validation import DataValidation
 from src.components.data_transformation import DataTransformation
+from src.components.model_tuner import ModelTuner
 from src.components.model_trainer import ModelTrainer
 from src.components.model_evaluation import ModelEvaluation
 from src.components.model_pusher import ModelPusher
 
 
-from src.entity.config_entity import (DataIngestionConfig,
+from src.utils.artifact_writer import ArtifactWriter
+from src.utils.stage_cache import StageCache
+from src.utils.main_utils import apply_schema_dtypes, save_dataframe, save_numpy_array_data, save_object
+from src.entity.feature_encoder import VehicleFeatureEncoder
+from src.entity.fused_preprocessor import FusedAffinePreprocessor
+from src.entity.estimator import MyModel
+from src.entity.compiled_forest import CompiledForest
+from src.entity.model_bundle import save_model_bundle
+
+from src.entity.config_entity import (TrainingPipelineConfig,
+                                    training_pipeline_config,
+                                    DataIngestionConfig,
                                     DataValidationConfig,
                                     DataTransformationConfig,
+                                    ModelTunerConfig,
                                     ModelTrainerConfig,
                                     ModelEvaluationConfig,
                                     ModelPusherConfig)
@@ -20,19 +36,73 @@ from src.entity.config_entity import (DataIngestionConfig,
 from src.entity.artifact_entity import (DataIngestionArtifact,
                                         DataValidationArtifact,
                                         DataTransformationArtifact,
+                                        ModelTunerArtifact,
                                         ModelTrainerArtifact,
                                         ModelEvaluationArtifact,
                                         ModelPusherArtifact)
 
 
 class TrainingPipeline:
-    def __init__(self):
+    def __init__(self, pipeline_config: TrainingPipelineConfig = training_pipeline_config):
+        self.pipeline_config = pipeline_config
+        # in-memory mode: stages hand data to each other directly, files are written in the background
+        self.artifact_writer = ArtifactWriter(persist=pipeline_config.persist_artifacts) if pipeline_config.in_memory_artifacts else None
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
         self.data_transformation_config = DataTransformationConfig()
+        self.model_tuner_config = ModelTunerConfig()
         self.model_trainer_config = ModelTrainerConfig()
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
+        # finished stages whose fingerprint matches an earlier run reuse that run's artifact
+        self.stage_cache = StageCache(cache_dir=pipeline_config.stage_cache_dir, enabled=pipeline_config.stage_cache_enabled)
+        self.stage_fingerprints: Dict[str, str] = {}
+        self.cached_stages = set()
+        # fresh stage results, added to the stage cache once their files are written
+        self._pending_stage_results: List[Tuple[str, str, object]] = []
+
+    def _get_stage_inputs(self, config: object, code: tuple, upstream: Dict[str, object],
+                          files: tuple = (SCHEMA_FILE_PATH,), **inputs) -> dict:
+        """
+        Everything a stage result depends on: its config, its source code, the content of the config files
+        it reads and the fingerprints and artifacts of the stages it consumes.
+        """
+        return {"config": StageCache.get_config_inputs(config), "code": StageCache.get_code_version(*code),
+                "files": {file_path: StageCache.hash_file(file_path) for file_path in files},
+                "upstream": {stage_name: {"fingerprint": self.stage_fingerprints.get(stage_name),
+                                          "artifact": StageCache.to_record(artifact)}
+                             for stage_name, artifact in upstream.items()},
+                **inputs}
+
+    def _load_cached_stage(self, stage_name: str, artifact_cls: type, get_inputs: Callable[[], dict]) -> Optional[object]:
+        """
+        Fingerprints the stage and returns the artifact of an earlier run with the same fingerprint, if any.
+        """
+        if not self.stage_cache.enabled:
+            return None
+        fingerprint = self.stage_cache.get_fingerprint(stage_name, **get_inputs())
+        self.stage_fingerprints[stage_name] = fingerprint
+        artifact = self.stage_cache.load(stage_name, fingerprint, artifact_cls)
+        if artifact is not None:
+            self.cached_stages.add(stage_name)
+        return artifact
+
+    def _add_stage_result(self, stage_name: str, artifact: object) -> None:
+        if stage_name not in self.stage_fingerprints:
+            return
+        self._pending_stage_results.append((stage_name, self.stage_fingerprints[stage_name], artifact))
+        if self.artifact_writer is None:
+            # files are written synchronously, the result can be recorded right away
+            self.store_stage_results()
+
+    def store_stage_results(self) -> None:
+        """
+        Records the fresh stage results in the stage cache. With in-memory artifacts this must only run
+        once the artifact writer finished writing their files.
+        """
+        results, self._pending_stage_results = self._pending_stage_results, []
+        for stage_name, fingerprint, artifact in results:
+            self.stage_cache.store(stage_name, fingerprint, artifact)
 
     def start_data_ingestion(self)-> DataIngestionArtifact:
         """
@@ -41,8 +111,21 @@ class TrainingPipeline:
         try:
             logging.info("Entered start_data_ingestion method of the TrainingPipeline class")
             logging.info("Getting the data from MongoDB")
-            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
-            data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
+            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config,
+                                           artifact_writer=self.artifact_writer)
+            dataframe = None
+            if self.stage_cache.enabled:
+                # the data has to be fetched to be fingerprinted, the split and its files are what is reused
+                dataframe = data_ingestion.fetch_data()
+                data_ingestion_artifact = self._load_cached_stage(
+                    "data_ingestion", DataIngestionArtifact,
+                    lambda: self._get_stage_inputs(self.data_ingestion_config,
+                                                   code=(DataIngestion, apply_schema_dtypes, save_dataframe),
+                                                   upstream={}, data=StageCache.hash_dataframe(dataframe)))
+                if data_ingestion_artifact is not None:
+                    return data_ingestion_artifact
+            data_ingestion_artifact = data_ingestion.initiate_data_ingestion(dataframe=dataframe)
+            self._add_stage_result("data_ingestion", data_ingestion_artifact)
             logging.info("Got the train and test set from mongoDB")
             logging.info("Exited the start_data_ingestion method of TrainingPipeline")
             return data_ingestion_artifact
@@ -55,11 +138,18 @@ class TrainingPipeline:
         """
         try:
             logging.info("Entered start_data_validation method of the TrainingPipeline class")
+            data_validation_artifact = self._load_cached_stage(
+                "data_validation", DataValidationArtifact,
+                lambda: self._get_stage_inputs(self.data_validation_config, code=(DataValidation,),
+                                               upstream={"data_ingestion": data_ingestion_artifact}))
+            if data_validation_artifact is not None:
+                return data_validation_artifact
             
             data_validation = DataValidation(data_ingestion_artifact=data_ingestion_artifact,
                                              data_validation_config=self.data_validation_config)
             
             data_validation_artifact = data_validation.initiate_data_validation()
+            self._add_stage_result("data_validation", data_validation_artifact)
 
             logging.info("Performed the data validation operation.")
 
@@ -75,23 +165,69 @@ class TrainingPipeline:
         This method of TrainPipeline class is responsible for starting data transformation component
         """
         try:
+            cached_artifact = self._load_cached_stage(
+                "data_transformation", DataTransformationArtifact,
+                lambda: self._get_stage_inputs(self.data_transformation_config,
+                                               code=(DataTransformation, VehicleFeatureEncoder, FusedAffinePreprocessor,
+                                                     save_numpy_array_data),
+                                               upstream={"data_ingestion": data_ingestion_artifact,
+                                                         "data_validation": data_validation_artifact}))
+            if cached_artifact is not None:
+                return cached_artifact
             data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
                                                      data_transformation_config=self.data_transformation_config,
-                                                     data_validation_artifact=data_validation_artifact)
+                                                     data_validation_artifact=data_validation_artifact,
+                                                     artifact_writer=self.artifact_writer)
             data_transformation_artifact = data_transformation.initiate_data_transformation()
+            self._add_stage_result("data_transformation", data_transformation_artifact)
             return data_transformation_artifact
         except Exception as e:
             raise MyException(e, sys) 
 
-    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+    def start_model_tuner(self, data_transformation_artifact: DataTransformationArtifact) -> Optional[ModelTunerArtifact]:
+        """
+        This method of TrainPipeline class is responsible for starting the hyperparameter search
+        """
+        try:
+            if not self.model_tuner_config.enabled:
+                logging.info("Model tuning disabled, training with the parameters of the model config")
+                return None
+            cached_artifact = self._load_cached_stage(
+                "model_tuner", ModelTunerArtifact,
+                lambda: self._get_stage_inputs(self.model_tuner_config, code=(ModelTuner,),
+                                               upstream={"data_transformation": data_transformation_artifact},
+                                               files=(self.model_tuner_config.model_config_file_path,)))
+            if cached_artifact is not None:
+                return cached_artifact
+            model_tuner = ModelTuner(data_transformation_artifact=data_transformation_artifact,
+                                     model_tuner_config=self.model_tuner_config)
+            model_tuner_artifact = model_tuner.initiate_model_tuner()
+            self._add_stage_result("model_tuner", model_tuner_artifact)
+            return model_tuner_artifact
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact,
+                            model_tuner_artifact: Optional[ModelTunerArtifact] = None) -> ModelTrainerArtifact:
         """
         This method of TrainPipeline class is responsible for starting model training
         """
         try:
+            cached_artifact = self._load_cached_stage(
+                "model_trainer", ModelTrainerArtifact,
+                lambda: self._get_stage_inputs(self.model_trainer_config,
+                                               code=(ModelTrainer, MyModel, CompiledForest, save_model_bundle, save_object),
+                                               upstream={"data_transformation": data_transformation_artifact,
+                                                         "model_tuner": model_tuner_artifact},
+                                               files=(self.model_trainer_config.model_config_file_path,)))
+            if cached_artifact is not None:
+                return cached_artifact
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config
+                                         model_trainer_config=self.model_trainer_config,
+                                         model_tuner_artifact=model_tuner_artifact
                                          )
             model_trainer_artifact = model_trainer.initiate_model_trainer()
+            self._add_stage_result("model_trainer", model_trainer_artifact)
             return model_trainer_artifact
 
         except Exception as e:
@@ -104,7 +240,8 @@ class TrainingPipeline:
         """
         try:
             model_evaluation = ModelEvaluation(model_evaluation_config=self.model_evaluation_config,
-                                               model_trainer_artifact=model_trainer_artifact)
+                                               model_trainer_artifact=model_trainer_artifact,
+                                               data_ingestion_artifact=data_ingestion_artifact)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
         except Exception as e:
@@ -123,23 +260,68 @@ class TrainingPipeline:
         except Exception as e:
             raise MyException(e, sys)
 
-    def run_pipeline(self,)-> None:
+    def _run_stage(self, stage_name: str, progress_callback: Optional[Callable[..., None]], stage_method: Callable, **kwargs):
+        """
+        Runs one stage, reporting its start and its duration (and whether its artifact came from the
+        stage cache) to progress_callback(stage_name, event, **details).
+        """
+        if progress_callback is not None:
+            progress_callback(stage_name, "started")
+        start_time = time.perf_counter()
+        artifact = stage_method(**kwargs)
+        if progress_callback is not None:
+            progress_callback(stage_name, "finished", seconds=time.perf_counter() - start_time,
+                              cached=stage_name in self.cached_stages)
+        return artifact
+
+    def run_pipeline(self, progress_callback: Optional[Callable[..., None]] = None)-> None:
         """
         This method is responsible for running the pipeline
+        progress_callback: optional callable(stage_name, event, **details) told when each stage starts,
+                           finishes (with its duration in seconds) or is skipped
         """
+        failed = False
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                          data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-            model_evaluation_artifact = self.start_model_evaluation(model_trainer_artifact=model_trainer_artifact,
-                                                                    data_ingestion_artifact=data_ingestion_artifact)
+            run_stage = lambda stage_name, stage_method, **kwargs: self._run_stage(stage_name, progress_callback,
+                                                                                  stage_method, **kwargs)
+            data_ingestion_artifact = run_stage("data_ingestion", self.start_data_ingestion)
+            data_validation_artifact = run_stage("data_validation", self.start_data_validation,
+                                                 data_ingestion_artifact=data_ingestion_artifact)
+            data_transformation_artifact = run_stage("data_transformation", self.start_data_transformation,
+                                                     data_ingestion_artifact=data_ingestion_artifact,
+                                                     data_validation_artifact=data_validation_artifact)
+            model_tuner_artifact = run_stage("model_tuner", self.start_model_tuner,
+                                             data_transformation_artifact=data_transformation_artifact)
+            model_trainer_artifact = run_stage("model_trainer", self.start_model_trainer,
+                                               data_transformation_artifact=data_transformation_artifact,
+                                               model_tuner_artifact=model_tuner_artifact)
+            model_evaluation_artifact = run_stage("model_evaluation", self.start_model_evaluation,
+                                                  model_trainer_artifact=model_trainer_artifact,
+                                                  data_ingestion_artifact=data_ingestion_artifact)
             
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model not accepted.")
+                if progress_callback is not None:
+                    progress_callback("model_pusher", "skipped")
                 return None
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
+            model_pusher_artifact = run_stage("model_pusher", self.start_model_pusher,
+                                              model_evaluation_artifact=model_evaluation_artifact)
 
         except Exception as e:
-            raise MyException(e,sys)
\ No newline at end of file
+            failed = True
+            raise MyException(e,sys)
+
+        finally:
+            # make sure every background artifact write has landed before returning, and stop the writer threads
+            writes_completed = True
+            if self.artifact_writer is not None:
+                try:
+                    self.artifact_writer.close()
+                except Exception as e:
+                    if not failed:
+                        raise
+                    # a stage already failed: keep its exception, the write error is only logged
+                    writes_completed = False
+                    logging.error(f"Background artifact writes failed as well: {e}")
+            if writes_completed:
+                self.store_stage_results()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class ArtifactWriter:
+    """
+    Persists pipeline artifacts in the background while the next stages keep working on the
+    in-memory copies. With persist=False nothing is written at all.
+    """
+
+    def __init__(self, persist: bool = True, max_workers: int = 2):
+        """
+        :param persist: whether artifacts are written to disk at all
+        :param max_workers: number of background writer threads
+        """
+        self.persist = persist
+        self.max_workers = max_workers
+        # threads are started on the first write and stopped by close()
+        self._executor = None
+        self._futures: List[Future] = []
+
+    def submit(self, write_fn: Callable, *args, **kwargs) -> None:
+        """
+        Schedules write_fn(*args, **kwargs) on a background thread.
+        """
+        if not self.persist:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="artifact-writer")
+        self._futures.append(self._executor.submit(write_fn, *args, **kwargs))
+
+    def wait(self) -> None:
+        """
+        Blocks until every scheduled write has finished and re-raises the first failure.
+        """
+        try:
+            futures, self._futures = self._futures, []
+            for future in futures:
+                future.result()
+            if futures:
+                logging.info(f"{len(futures)} artifacts persisted in the background")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def close(self) -> None:
+        """
+        Waits for the scheduled writes and stops the writer threads, also when a write failed.
+        Writing again afterwards starts new threads.
+        """
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,9 +1,13 @@
+import importlib
 import os
 import sys
 
+from typing import List, Optional
+
 import numpy as np
 import dill
 import yaml
+import pandas as pd
 from pandas import DataFrame
 
 from src.exception import MyException
@@ -31,6 +35,96 @@ def write_yaml_file(file_path: str, content: object, replace: bool = False) -> N
         raise MyException(e, sys) from e
 
 
+# pandas dtypes for the column types declared in config/schema.yaml
+SCHEMA_PANDAS_DTYPES = {"int": "int64", "float": "float64", "category": "category"}
+
+
+def get_schema_dtypes(schema_config: dict) -> dict:
+    """
+    Returns {column: pandas dtype} for the columns declared in the schema.
+    """
+    return {column: SCHEMA_PANDAS_DTYPES[dtype]
+            for entry in schema_config["columns"]
+            for column, dtype in entry.items()}
+
+
+def apply_schema_dtypes(dataframe: DataFrame, schema_config: dict) -> DataFrame:
+    """
+    Casts the columns of the dataframe to their schema dtypes.
+    Columns whose values do not fit the declared type (e.g. NaN in an int column,
+    or raw 'Male'/'Female' in Gender) are left as they are.
+    """
+    try:
+        for column, dtype in get_schema_dtypes(schema_config).items():
+            if column not in dataframe.columns or str(dataframe[column].dtype) == dtype:
+                continue
+            try:
+                dataframe[column] = dataframe[column].astype(dtype)
+            except (TypeError, ValueError):
+                logging.info(f"Column {column} does not fit schema dtype {dtype}, keeping {dataframe[column].dtype}")
+        return dataframe
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def get_file_format(file_path: str) -> str:
+    """
+    Returns the artifact format ("parquet", "feather" or "csv") from the file extension.
+    """
+    extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if extension not in ("parquet", "feather", "csv"):
+        raise ValueError(f"Unsupported artifact format: {file_path}")
+    return extension
+
+
+def save_dataframe(file_path: str, dataframe: DataFrame) -> None:
+    """
+    Save a dataframe in the format given by the file extension
+    file_path: str location of file to save (.parquet, .feather or .csv)
+    dataframe: DataFrame data to save
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            dataframe.to_parquet(file_path, index=False)
+        elif file_format == "feather":
+            dataframe.reset_index(drop=True).to_feather(file_path)
+        else:
+            dataframe.to_csv(file_path, index=False, header=True)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def read_dataframe(file_path: str, columns: Optional[List[str]] = None, schema_config: Optional[dict] = None) -> DataFrame:
+    """
+    Read a dataframe saved with save_dataframe
+    file_path: str location of file to load
+    columns: only these columns are read (pruned at the file level for parquet/feather)
+    schema_config: if given, columns are cast to the schema dtypes (only needed for csv,
+                   parquet and feather keep the dtypes they were written with)
+    return: DataFrame data loaded
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            dataframe = pd.read_parquet(file_path, columns=columns)
+        elif file_format == "feather":
+            dataframe = pd.read_feather(file_path, columns=columns)
+        else:
+            dtypes = None
+            if schema_config is not None:
+                # declared dtypes are given to the csv parser directly, except for int columns that may hold NaN
+                dtypes = {column: dtype for column, dtype in get_schema_dtypes(schema_config).items()
+                          if dtype != "int64" and (columns is None or column in columns)}
+            dataframe = pd.read_csv(file_path, usecols=columns, dtype=dtypes)
+        if schema_config is not None:
+            dataframe = apply_schema_dtypes(dataframe, schema_config)
+        return dataframe
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
 def load_object(file_path: str) -> object:
     """
     Returns model/object from project directory.
@@ -46,7 +140,7 @@ def load_object(file_path: str) -> object:
 
 def save_numpy_array_data(file_path: str, array: np.array):
     """
-    Save numpy array data to file
+    Save numpy array data to file as a plain .npy, so it can be opened with mmap_mode
     file_path: str location of file to save
     array: np.array data to save
     """
@@ -54,24 +148,53 @@ def save_numpy_array_data(file_path: str, array: np.array):
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
         with open(file_path, 'wb') as file_obj:
-            np.save(file_obj, array)
+            np.save(file_obj, np.ascontiguousarray(array), allow_pickle=False)
     except Exception as e:
         raise MyException(e, sys) from e
 
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: e.g. 'r' to get a read-only memory-mapped view instead of a heap copy
     return: np.array data loaded
     """
     try:
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
     except Exception as e:
         raise MyException(e, sys) from e
 
 
+def to_compact_target(target: np.array) -> np.array:
+    """
+    Returns the class labels in the smallest integer dtype that holds them exactly,
+    or unchanged if they are not integral.
+    """
+    target = np.asarray(target)
+    if target.size == 0 or not np.all(np.mod(target, 1) == 0):
+        return target
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if target.min() >= info.min and target.max() <= info.max:
+            return target.astype(dtype)
+    return target
+
+
+def import_class(class_path: str) -> type:
+    """
+    Returns the class named by a dotted path such as 'sklearn.ensemble.RandomForestClassifier'.
+    """
+    try:
+        module_name, class_name = class_path.rsplit(".", 1)
+        return getattr(importlib.import_module(module_name), class_name)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
 def save_object(file_path: str, obj: object) -> None:
     logging.info("Entered the save_object method of utils")
 
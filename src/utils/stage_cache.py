@@ -0,0 +1,196 @@
+import hashlib
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import fields, is_dataclass, asdict
+from importlib import metadata
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class StageCache:
+    """
+    Index of pipeline stage results keyed on a fingerprint of everything the stage depends on.
+
+    A fingerprint hashes the stage inputs given by the pipeline: content hashes of the data and of files
+    like config/schema.yaml, the run-independent fields of the stage config, the source code of the modules
+    implementing the stage plus the library versions, and the fingerprints and artifacts of upstream stages.
+    An entry stores the artifact of the run that computed it (its files stay in that run's directory)
+    together with the size and mtime of every file it references; an entry whose files are gone or
+    were changed is dropped instead of being served.
+    """
+
+    # libraries whose version changes the output of the stages
+    LIBRARIES = ("numpy", "pandas", "scikit-learn", "imbalanced-learn")
+
+    def __init__(self, cache_dir: str, enabled: bool = True):
+        """
+        :param cache_dir: index directory, one subdirectory of <fingerprint>.json entries per stage
+        :param enabled: with False nothing is looked up or stored
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_dataframe(dataframe: pd.DataFrame) -> str:
+        """
+        Content hash of a DataFrame: column names, dtypes and the values of every row, in order.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in dataframe.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(dataframe, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def get_code_version(cls, *objects: object) -> dict:
+        """
+        Hashes of the source files defining the given classes, functions or modules, plus library versions.
+        """
+        source_files = sorted({inspect.getsourcefile(obj) for obj in objects})
+        versions = {}
+        for library in cls.LIBRARIES:
+            try:
+                versions[library] = metadata.version(library)
+            except metadata.PackageNotFoundError:
+                versions[library] = None
+        return {"python": platform.python_version(), "libraries": versions,
+                "sources": {os.path.relpath(file_path): cls.hash_file(file_path) for file_path in source_files}}
+
+    @staticmethod
+    def _is_path_field(name: str) -> bool:
+        return name.endswith(("_path", "_dir"))
+
+    @classmethod
+    def get_config_inputs(cls, config: object) -> dict:
+        """
+        Fields of a stage config except its paths, which change with every run's timestamp.
+        """
+        return {name: value for name, value in asdict(config).items() if not cls._is_path_field(name)}
+
+    @staticmethod
+    def to_record(artifact: Optional[object]) -> Optional[dict]:
+        """
+        The persisted fields of an artifact; in-memory copies (fields declared with repr=False) are left out.
+        """
+        if artifact is None:
+            return None
+        return {field.name: asdict(getattr(artifact, field.name)) if is_dataclass(getattr(artifact, field.name))
+                else getattr(artifact, field.name)
+                for field in fields(artifact) if field.repr}
+
+    def get_fingerprint(self, stage_name: str, **inputs) -> str:
+        payload = json.dumps({"stage": stage_name, **inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _get_entry_path(self, stage_name: str, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, stage_name, f"{fingerprint}.json")
+
+    def _get_file_states(self, record: dict) -> Optional[Dict[str, List[int]]]:
+        """
+        [size, mtime_ns] of every file the artifact references (directories are walked), or None if one is missing.
+        """
+        file_paths = []
+        for name, value in record.items():
+            if not self._is_path_field(name) or value is None:
+                continue
+            if os.path.isdir(value):
+                file_paths.extend(os.path.join(root, file_name)
+                                  for root, _, file_names in os.walk(value) for file_name in file_names)
+            elif os.path.isfile(value):
+                file_paths.append(value)
+            else:
+                return None
+        states = {}
+        for file_path in sorted(file_paths):
+            stat = os.stat(file_path)
+            states[file_path] = [stat.st_size, stat.st_mtime_ns]
+        return states
+
+    @staticmethod
+    def _restore_int_keys(value: object) -> object:
+        # JSON turns integer keys (e.g. the class labels of class_weight) into strings
+        if isinstance(value, dict) and value and all(isinstance(key, str) and key.lstrip("-").isdigit() for key in value):
+            return {int(key): item for key, item in value.items()}
+        return value
+
+    def load(self, stage_name: str, fingerprint: str, artifact_cls: type) -> Optional[object]:
+        """
+        Method Name :   load
+        Description :   Returns the artifact stored for the fingerprint if every file it references is still
+                        unchanged, else None. Entries whose files were removed or modified are deleted.
+
+        Output      :   Artifact of type artifact_cls or None
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not self.enabled:
+                return None
+            entry_path = self._get_entry_path(stage_name, fingerprint)
+            if not os.path.exists(entry_path):
+                logging.info(f"Stage cache miss for {stage_name} ({fingerprint[:12]})")
+                return None
+            with open(entry_path, "r") as file_obj:
+                entry = json.load(file_obj)
+
+            if self._get_file_states(entry["artifact"]) != entry["files"]:
+                logging.info(f"Stage cache entry of {stage_name} ({fingerprint[:12]}) refers to missing or modified files, dropping it")
+                os.remove(entry_path)
+                return None
+
+            values = {}
+            for field in fields(artifact_cls):
+                if field.name in entry["artifact"]:
+                    value = self._restore_int_keys(entry["artifact"][field.name])
+                    values[field.name] = field.type(**value) if is_dataclass(field.type) and isinstance(value, dict) else value
+            logging.info(f"Stage cache hit for {stage_name} ({fingerprint[:12]}), reusing the artifact from {entry['created_at']}")
+            return artifact_cls(**values)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def store(self, stage_name: str, fingerprint: str, artifact: object) -> bool:
+        """
+        Method Name :   store
+        Description :   Records the artifact of a finished stage under its fingerprint. Must be called once
+                        the artifact's files are written; artifacts whose files do not exist are not recorded.
+
+        Output      :   True if the entry was written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not self.enabled:
+                return False
+            record = self.to_record(artifact)
+            file_states = self._get_file_states(record)
+            if file_states is None:
+                logging.info(f"Artifact files of {stage_name} were not written, not adding it to the stage cache")
+                return False
+
+            entry_path = self._get_entry_path(stage_name, fingerprint)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            entry = {"stage": stage_name, "fingerprint": fingerprint,
+                     "created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "artifact": record, "files": file_states}
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file_obj:
+                json.dump(entry, file_obj, indent=4, default=str)
+            os.replace(tmp_path, entry_path)
+            logging.info(f"Stored {stage_name} ({fingerprint[:12]}) in the stage cache")
+            return True
+
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.entity.compiled_forest import CompiledForest
+
+
+@pytest.fixture(scope="module")
+def forest_and_data():
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(600, 11))
+    y = ((X[:, 0] + X[:, 3] * X[:, 5] + rng.normal(scale=0.5, size=600)) > 0).astype(np.int8)
+    forest = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=101).fit(X[:400], y[:400])
+    return forest, CompiledForest.from_estimator(forest), X[400:]
+
+
+def test_predict_proba_matches_sklearn(forest_and_data):
+    forest, compiled, X_test = forest_and_data
+    np.testing.assert_allclose(compiled.predict_proba(X_test), forest.predict_proba(X_test), rtol=0.0, atol=1e-12)
+
+
+def test_predict_matches_sklearn(forest_and_data):
+    forest, compiled, X_test = forest_and_data
+    np.testing.assert_array_equal(compiled.predict(X_test), forest.predict(X_test))
+
+
+def test_single_row_matches_sklearn(forest_and_data):
+    forest, compiled, X_test = forest_and_data
+    row = X_test[:1]
+    np.testing.assert_allclose(compiled.predict_proba(row), forest.predict_proba(row), rtol=0.0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(row), forest.predict(row))
+
+
+def test_float32_input_matches_sklearn(forest_and_data):
+    forest, compiled, X_test = forest_and_data
+    X_float32 = X_test.astype(np.float32)
+    np.testing.assert_allclose(compiled.predict_proba(X_float32), forest.predict_proba(X_float32), rtol=0.0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_float32), forest.predict(X_float32))
+
+
+def test_check_parity_reports_no_mismatch(forest_and_data):
+    forest, compiled, X_test = forest_and_data
+    assert compiled.check_parity(forest, X_test) is None
+
+
+def test_rejects_wrong_number_of_features(forest_and_data):
+    _, compiled, X_test = forest_and_data
+    with pytest.raises(ValueError):
+        compiled.predict(X_test[:, :5])
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.dummy import DummyClassifier
+
+from src.components.data_transformation import DataTransformation
+from src.entity.config_entity import DataTransformationConfig
+from src.entity.estimator import MyModel
+from src.entity.feature_encoder import VehicleFeatureEncoder
+from src.entity.fused_preprocessor import FusedAffinePreprocessor
+
+
+def make_raw_records(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Gender": rng.choice(["Male", "Female"], n_rows),
+        "Age": rng.integers(20, 80, n_rows),
+        "Driving_License": rng.integers(0, 2, n_rows),
+        "Region_Code": rng.integers(0, 52, n_rows).astype(float),
+        "Previously_Insured": rng.integers(0, 2, n_rows),
+        "Vehicle_Age": rng.choice(["< 1 Year", "1-2 Year", "> 2 Years"], n_rows),
+        "Vehicle_Damage": rng.choice(["Yes", "No"], n_rows),
+        "Annual_Premium": rng.uniform(2000, 60000, n_rows),
+        "Policy_Sales_Channel": rng.integers(1, 160, n_rows).astype(float),
+        "Vintage": rng.integers(10, 300, n_rows),
+    })
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    data_transformation = DataTransformation(data_ingestion_artifact=None, data_validation_artifact=None,
+                                             data_transformation_config=DataTransformationConfig())
+    raw_records = make_raw_records(500)
+    feature_encoder = data_transformation.get_feature_encoder(raw_records)
+    encoded = feature_encoder.transform_frame(raw_records)
+    preprocessor = data_transformation.get_data_transformer_object().fit(encoded)
+    fused = FusedAffinePreprocessor.from_pipeline(preprocessor)
+    test_encoded = feature_encoder.transform_frame(make_raw_records(200, seed=1))
+    return feature_encoder, preprocessor, fused, test_encoded
+
+
+def test_pipeline_is_supported(fitted):
+    _, preprocessor, _, _ = fitted
+    assert FusedAffinePreprocessor.is_supported(preprocessor)
+
+
+def test_dataframe_input_matches_pipeline(fitted):
+    _, preprocessor, fused, test_encoded = fitted
+    expected = preprocessor.transform(test_encoded)
+    assert np.allclose(fused.transform(fused.to_array(test_encoded)), expected)
+    assert fused.check_parity(preprocessor, test_encoded) is None
+
+
+def test_ndarray_input_matches_pipeline(fitted):
+    _, preprocessor, fused, test_encoded = fitted
+    expected = preprocessor.transform(test_encoded)
+    assert np.allclose(fused.transform(test_encoded.to_numpy(dtype=np.float64)), expected)
+
+
+def test_column_order_matches_encoder_output(fitted):
+    # MyModel feeds encoded ndarrays (encoder output order) straight into the fused transform
+    feature_encoder, preprocessor, fused, _ = fitted
+    assert list(fused.input_columns) == list(preprocessor.steps[0][1].feature_names_in_)
+    assert list(fused.input_columns) == feature_encoder.output_columns
+
+
+def test_model_transform_matches_pipeline_for_every_input(fitted):
+    feature_encoder, preprocessor, fused, test_encoded = fitted
+    model = MyModel(preprocessing_object=preprocessor, trained_model_object=DummyClassifier(),
+                    fused_preprocessor=fused, feature_encoder=feature_encoder)
+    expected = preprocessor.transform(test_encoded)
+    raw_records = make_raw_records(200, seed=1)
+    assert np.allclose(model.transform(test_encoded), expected)
+    assert np.allclose(model.transform(test_encoded.to_numpy(dtype=np.float64)), expected)
+    assert np.allclose(model.transform(raw_records), expected)
+    assert np.allclose(model.transform(raw_records[feature_encoder.input_columns].to_numpy(dtype=object)), expected)
+
+
+def test_model_rejects_mismatched_column_order(fitted):
+    feature_encoder, preprocessor, fused, _ = fitted
+    reordered = FusedAffinePreprocessor(input_columns=list(reversed(fused.input_columns)), column_index=fused.column_index,
+                                        sub=fused.sub, div=fused.div, mul=fused.mul, add=fused.add)
+    with pytest.raises(ValueError):
+        MyModel(preprocessing_object=preprocessor, trained_model_object=DummyClassifier(),
+                fused_preprocessor=reordered, feature_encoder=feature_encoder)
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import src.cloud_storage.model_cache as model_cache_module
+from src.cloud_storage.model_cache import ModelCache
+from src.exception import MyException
+
+BUCKET = "models"
+
+
+class StubStorageService:
+    """
+    SimpleStorageService stand-in holding objects in memory and counting downloads per key.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.downloads = []
+        # bytes returned instead of the stored ones, to simulate a broken transfer
+        self.corrupt_downloads = {}
+
+    def put(self, s3_key, content):
+        self.objects[s3_key] = content
+
+    def get_object_metadata(self, bucket_name, s3_key):
+        content = self.objects.get(s3_key)
+        if content is None:
+            return None
+        return {"etag": hashlib.md5(content).hexdigest(), "size": len(content), "last_modified": None}
+
+    def download_file(self, bucket_name, s3_key, local_path):
+        self.downloads.append(s3_key)
+        with open(local_path, "wb") as file_obj:
+            file_obj.write(self.corrupt_downloads.get(s3_key, self.objects[s3_key]))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def s3():
+    return StubStorageService()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_cache_module, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def make_cache(tmp_path, s3, grace_seconds=300.0):
+    return ModelCache(cache_dir=str(tmp_path / "model_cache"), s3=s3, eviction_grace_seconds=grace_seconds)
+
+
+def read(file_path):
+    with open(file_path, "rb") as file_obj:
+        return file_obj.read()
+
+
+def test_unchanged_etag_is_downloaded_once(tmp_path, s3):
+    cache = make_cache(tmp_path, s3)
+    s3.put("model.pkl", b"model-v1")
+
+    first = cache.fetch(BUCKET, "model.pkl")
+    second = cache.fetch(BUCKET, "model.pkl")
+
+    assert first == second
+    assert read(first) == b"model-v1"
+    assert s3.downloads == ["model.pkl"]
+
+
+def test_changed_etag_downloads_again_and_evicts_after_grace(tmp_path, s3, clock):
+    cache = make_cache(tmp_path, s3, grace_seconds=300.0)
+    s3.put("model.pkl", b"model-v1")
+    old_path = cache.fetch(BUCKET, "model.pkl")
+
+    s3.put("model.pkl", b"model-v2!")
+    new_path = cache.fetch(BUCKET, "model.pkl")
+
+    assert new_path != old_path
+    assert read(new_path) == b"model-v2!"
+    assert s3.downloads == ["model.pkl", "model.pkl"]
+    # the replaced version stays for processes that resolved it just before
+    assert os.path.exists(old_path)
+
+    clock.now += 301
+    cache.fetch(BUCKET, "model.pkl")
+    assert not os.path.exists(old_path)
+    assert not os.path.exists(f"{old_path}.sha256")
+    assert os.path.exists(new_path)
+
+
+def test_corrupt_cached_file_is_replaced(tmp_path, s3):
+    cache = make_cache(tmp_path, s3)
+    s3.put("model.pkl", b"model-v1")
+    file_path = cache.fetch(BUCKET, "model.pkl")
+
+    # same size, so only the checksum can tell
+    with open(file_path, "wb") as file_obj:
+        file_obj.write(b"garbage!")
+
+    assert cache.fetch(BUCKET, "model.pkl") == file_path
+    assert read(file_path) == b"model-v1"
+    assert s3.downloads == ["model.pkl", "model.pkl"]
+
+
+def test_truncated_download_is_not_renamed_into_place(tmp_path, s3):
+    cache = make_cache(tmp_path, s3)
+    s3.put("model.pkl", b"model-v1")
+    s3.corrupt_downloads["model.pkl"] = b"model"
+
+    with pytest.raises(MyException):
+        cache.fetch(BUCKET, "model.pkl")
+
+    file_path = cache.get_object_path("model.pkl", s3.get_object_metadata(BUCKET, "model.pkl")["etag"], 8)
+    assert os.listdir(os.path.dirname(file_path)) == []
+
+
+def test_blob_with_wrong_checksum_is_replaced_or_rejected(tmp_path, s3):
+    cache = make_cache(tmp_path, s3)
+    content = b"blob-bytes"
+    sha256 = hashlib.sha256(content).hexdigest()
+    s3.put("bundle/blobs/a.npy", content)
+    blob_path = str(tmp_path / "model_cache" / "bundle" / "blobs" / "a.npy")
+
+    cache.fetch_blob(BUCKET, "bundle/blobs/a.npy", blob_path, sha256=sha256, size=len(content))
+    cache.fetch_blob(BUCKET, "bundle/blobs/a.npy", blob_path, sha256=sha256, size=len(content))
+    assert s3.downloads == ["bundle/blobs/a.npy"]
+
+    with open(blob_path, "wb") as file_obj:
+        file_obj.write(b"x" * len(content))
+    cache.fetch_blob(BUCKET, "bundle/blobs/a.npy", blob_path, sha256=sha256, size=len(content))
+    assert read(blob_path) == content
+
+    # a download that does not match the manifest checksum never replaces the file
+    os.remove(blob_path)
+    s3.corrupt_downloads["bundle/blobs/a.npy"] = b"y" * len(content)
+    with pytest.raises(MyException):
+        cache.fetch_blob(BUCKET, "bundle/blobs/a.npy", blob_path, sha256=sha256, size=len(content))
+    assert os.listdir(os.path.dirname(blob_path)) == []
+
+
+def test_blobs_are_evicted_with_their_manifest_version(tmp_path, s3, clock):
+    cache = make_cache(tmp_path, s3, grace_seconds=300.0)
+    blob_dir = tmp_path / "model_cache" / "bundle" / "blobs"
+
+    def publish(manifest, blobs):
+        s3.put("bundle/manifest.json", manifest)
+        cache.fetch(BUCKET, "bundle/manifest.json")
+        blob_paths = []
+        for name in blobs:
+            content = name.encode() * 4
+            s3.put(f"bundle/blobs/{name}", content)
+            blob_paths.append(cache.fetch_blob(BUCKET, f"bundle/blobs/{name}", str(blob_dir / name),
+                                               sha256=hashlib.sha256(content).hexdigest(), size=len(content)))
+        cache.record_blobs(BUCKET, "bundle/manifest.json", blob_paths)
+
+    publish(b"manifest-v1", ["a.npy", "b.npy"])
+    clock.now += 10
+    publish(b"manifest-v2", ["b.npy", "c.npy"])
+    assert sorted(os.listdir(blob_dir)) == ["a.npy", "b.npy", "c.npy"]
+
+    clock.now += 301
+    cache.fetch(BUCKET, "bundle/manifest.json")
+    # a.npy was only used by the replaced version, b.npy is shared with the current one
+    assert sorted(os.listdir(blob_dir)) == ["b.npy", "c.npy"]
+
+
+def test_recently_used_blob_of_an_expired_version_is_kept(tmp_path, s3, clock):
+    cache = make_cache(tmp_path, s3, grace_seconds=300.0)
+    content = b"blob"
+    s3.put("bundle/manifest.json", b"manifest-v1")
+    s3.put("bundle/blobs/a.npy", content)
+    blob_path = str(tmp_path / "model_cache" / "bundle" / "blobs" / "a.npy")
+    cache.fetch(BUCKET, "bundle/manifest.json")
+    cache.fetch_blob(BUCKET, "bundle/blobs/a.npy", blob_path, sha256=hashlib.sha256(content).hexdigest(), size=4)
+    cache.record_blobs(BUCKET, "bundle/manifest.json", [blob_path])
+
+    s3.put("bundle/manifest.json", b"manifest-v2")
+    cache.fetch(BUCKET, "bundle/manifest.json")
+    clock.now += 301
+    # another process is loading a version using the blob and touched it, before recording its blobs
+    os.utime(blob_path, (clock.now, clock.now))
+    cache.fetch(BUCKET, "bundle/manifest.json")
+
+    assert os.path.exists(blob_path)
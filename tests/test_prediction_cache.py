@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from src.entity.prediction_cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_cache(clock, max_entries=3, ttl_seconds=60.0):
+    cache = PredictionCache(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+    cache.set_model_version("v1")
+    return cache
+
+
+def test_keys_are_stable_per_row_and_model_version():
+    features = np.array([[1.0, 2.0, 3.0], [1.0, 2.0, 4.0]])
+    keys = PredictionCache.get_keys(features, "v1")
+
+    assert len(set(keys)) == 2
+    assert PredictionCache.get_keys(features.copy(), "v1") == keys
+    # the same values in another dtype, or -0.0 instead of 0.0, hash to the same key
+    assert PredictionCache.get_keys(features.astype(np.float32), "v1") == keys
+    assert PredictionCache.get_keys(np.array([[-0.0, 1.0]]), "v1") == PredictionCache.get_keys(np.array([[0.0, 1.0]]), "v1")
+    assert PredictionCache.get_keys(features, "v2") != keys
+
+
+def test_hit_and_miss_counters(clock):
+    cache = make_cache(clock)
+    keys = PredictionCache.get_keys(np.array([[1.0], [2.0]]), "v1")
+
+    assert cache.get_many(keys) == [None, None]
+    cache.put_many(keys, [0, 1])
+    assert cache.get_many(keys) == [0, 1]
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["hit_rate"] == 0.5
+    assert stats["model_version"] == "v1"
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = make_cache(clock, ttl_seconds=60.0)
+    keys = PredictionCache.get_keys(np.array([[1.0], [2.0]]), "v1")
+    cache.put_many(keys[:1], [1])
+    clock.now += 30
+    cache.put_many(keys[1:], [0])
+
+    clock.now += 30
+    assert cache.get_many(keys) == [1, 0]
+    clock.now += 0.5
+    assert cache.get_many(keys) == [None, 0]
+    clock.now += 30
+    assert cache.get_many(keys) == [None, None]
+
+    stats = cache.get_stats()
+    assert (stats["expirations"], stats["entries"]) == (2, 0)
+
+
+def test_no_ttl_keeps_entries(clock):
+    cache = make_cache(clock, ttl_seconds=None)
+    keys = PredictionCache.get_keys(np.array([[1.0]]), "v1")
+    cache.put_many(keys, [1])
+    clock.now += 10 ** 9
+    assert cache.get_many(keys) == [1]
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = make_cache(clock, max_entries=3)
+    keys = PredictionCache.get_keys(np.array([[1.0], [2.0], [3.0], [4.0]]), "v1")
+    cache.put_many(keys[:3], [1, 2, 3])
+    # reading the oldest entry makes the second one the least recently used
+    cache.get_many(keys[:1])
+    cache.put_many(keys[3:], [4])
+
+    assert cache.get_many(keys) == [1, None, 3, 4]
+    stats = cache.get_stats()
+    assert (stats["evictions"], stats["entries"]) == (1, 3)
+
+
+def test_model_version_change_drops_every_entry(clock):
+    cache = make_cache(clock)
+    keys = PredictionCache.get_keys(np.array([[1.0], [2.0]]), "v1")
+    cache.put_many(keys, [0, 1])
+
+    cache.set_model_version("v1")
+    assert cache.get_stats()["invalidations"] == 0
+    cache.set_model_version("v2")
+    stats = cache.get_stats()
+    assert (stats["invalidations"], stats["entries"], stats["model_version"]) == (1, 0, "v2")
+    assert cache.get_many(keys) == [None, None]
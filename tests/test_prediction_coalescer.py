@@ -0,0 +1,116 @@
+import asyncio
+
+import numpy as np
+
+from src.pipeline.prediction_coalescer import PredictionCoalescer, PredictionCoalescerStoppedError
+
+
+class RecordingScorer:
+    """
+    score_batch stub returning the first feature of every row, so each caller can recognise its own rows.
+    """
+
+    def __init__(self, error=None, delay=0.0):
+        self.calls = []
+        self.error = error
+        self.delay = delay
+
+    async def score(self, features):
+        self.calls.append(features.copy())
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return features[:, 0]
+
+
+def run_coalescer(scorer, coroutine, max_batch_size=64, max_wait_ms=50):
+    async def main():
+        coalescer = PredictionCoalescer(score_batch=scorer.score, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        await coalescer.start()
+        try:
+            return await coroutine(coalescer)
+        finally:
+            await coalescer.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_scored_in_one_batch():
+    scorer = RecordingScorer()
+    rows = [np.array([[float(i), 1.0]]) for i in range(10)]
+
+    results = run_coalescer(scorer, lambda coalescer: asyncio.gather(*(coalescer.submit(row) for row in rows)))
+
+    assert len(scorer.calls) == 1
+    np.testing.assert_array_equal(scorer.calls[0], np.concatenate(rows))
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, [float(i)])
+
+
+def test_multi_row_requests_get_their_own_slice_back():
+    scorer = RecordingScorer()
+    requests = [np.arange(n * 2, dtype=float).reshape(n, 2) + 100 * n for n in (1, 3, 2)]
+
+    results = run_coalescer(scorer, lambda coalescer: asyncio.gather(*(coalescer.submit(rows) for rows in requests)))
+
+    assert len(scorer.calls) == 1
+    for rows, result in zip(requests, results):
+        np.testing.assert_array_equal(result, rows[:, 0])
+
+
+def test_batch_is_split_at_max_batch_size():
+    scorer = RecordingScorer()
+    rows = [np.array([[float(i)]]) for i in range(5)]
+
+    results = run_coalescer(scorer, lambda coalescer: asyncio.gather(*(coalescer.submit(row) for row in rows)),
+                            max_batch_size=2)
+
+    assert [len(call) for call in scorer.calls] == [2, 2, 1]
+    assert [float(result[0]) for result in results] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_scoring_error_reaches_every_waiter():
+    scorer = RecordingScorer(error=RuntimeError("model failed"))
+    rows = [np.array([[float(i)]]) for i in range(4)]
+
+    results = run_coalescer(scorer, lambda coalescer: asyncio.gather(*(coalescer.submit(row) for row in rows),
+                                                                    return_exceptions=True))
+
+    assert len(scorer.calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "model failed" for result in results)
+
+
+def test_stop_awaits_scoring_and_fails_collected_requests():
+    async def main():
+        scorer = RecordingScorer(delay=0.05)
+        coalescer = PredictionCoalescer(score_batch=scorer.score, max_batch_size=1, max_wait_ms=1000)
+        await coalescer.start()
+        # the first request is being scored (slowly), the others are collected into a batch still waiting for more
+        first = asyncio.ensure_future(coalescer.submit(np.array([[1.0]])))
+        await asyncio.sleep(0.01)
+        coalescer.max_batch_size = 10
+        others = [asyncio.ensure_future(coalescer.submit(np.array([[float(i)]]))) for i in range(2, 5)]
+        await asyncio.sleep(0.01)
+        await coalescer.stop()
+        return await asyncio.gather(first, *others, return_exceptions=True)
+
+    first, *others = asyncio.run(main())
+
+    np.testing.assert_array_equal(first, [1.0])
+    assert all(isinstance(result, PredictionCoalescerStoppedError) for result in others)
+
+
+def test_stop_fails_queued_requests():
+    async def main():
+        # scored inline (not a coroutine function): requests arriving meanwhile stay in the queue
+        coalescer = PredictionCoalescer(score_batch=lambda features: asyncio.sleep(0.05, result=features[:, 0]),
+                                        max_batch_size=1, max_wait_ms=1000)
+        await coalescer.start()
+        futures = [asyncio.ensure_future(coalescer.submit(np.array([[float(i)]]))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await coalescer.stop()
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, PredictionCoalescerStoppedError) for result in results)
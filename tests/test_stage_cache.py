@@ -0,0 +1,150 @@
+import importlib.util
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+import pytest
+
+from src.utils.stage_cache import StageCache
+
+
+@dataclass
+class StageConfig:
+    output_dir: str
+    n_estimators: int = 10
+
+
+@dataclass
+class StageArtifact:
+    model_file_path: str
+    report_dir: str
+    score: float
+    class_weight: Optional[dict] = None
+    # in-memory copy, not persisted
+    model: Optional[object] = field(default=None, repr=False)
+
+
+@pytest.fixture
+def stage_module(tmp_path):
+    module_path = tmp_path / "stage_module.py"
+    module_path.write_text("def run():\n    return 1\n")
+    spec = importlib.util.spec_from_file_location("stage_module", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    run_dir = tmp_path / "run-1"
+    (run_dir / "report").mkdir(parents=True)
+    (run_dir / "model.pkl").write_bytes(b"model-bytes")
+    (run_dir / "report" / "report.json").write_text('{"f1": 0.8}')
+    return StageArtifact(model_file_path=str(run_dir / "model.pkl"), report_dir=str(run_dir / "report"),
+                         score=0.8, class_weight={0: 1.0, 1: 3.5}, model=object())
+
+
+def get_fingerprint(cache, dataframe, config, stage_module):
+    return cache.get_fingerprint("model_trainer", config=StageCache.get_config_inputs(config),
+                                 code=StageCache.get_code_version(stage_module),
+                                 data=StageCache.hash_dataframe(dataframe))
+
+
+def make_data():
+    return pd.DataFrame({"Age": [21, 35, 60], "Vehicle_Damage": ["Yes", "No", "Yes"]})
+
+
+def test_unchanged_inputs_hit(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None
+    assert cache.store("model_trainer", fingerprint, artifact)
+
+    # a new run: new output paths and freshly built inputs with the same content
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-2"), stage_module)
+    cached = cache.load("model_trainer", fingerprint, StageArtifact)
+
+    assert cached == StageArtifact(model_file_path=artifact.model_file_path, report_dir=artifact.report_dir,
+                                   score=0.8, class_weight={0: 1.0, 1: 3.5})
+    assert cached.model is None
+
+
+@pytest.mark.parametrize("change", ["data", "dtype", "config"])
+def test_changed_data_or_config_misses(tmp_path, stage_module, artifact, change):
+    cache = StageCache(str(tmp_path / "cache"))
+    dataframe, config = make_data(), StageConfig(output_dir="run-1")
+    cache.store("model_trainer", get_fingerprint(cache, dataframe, config, stage_module), artifact)
+
+    if change == "data":
+        dataframe.loc[1, "Age"] = 36
+    elif change == "dtype":
+        dataframe["Age"] = dataframe["Age"].astype(float)
+    else:
+        config.n_estimators = 20
+
+    assert cache.load("model_trainer", get_fingerprint(cache, dataframe, config, stage_module), StageArtifact) is None
+
+
+def test_changed_code_misses(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"))
+    dataframe, config = make_data(), StageConfig(output_dir="run-1")
+    cache.store("model_trainer", get_fingerprint(cache, dataframe, config, stage_module), artifact)
+
+    with open(stage_module.__file__, "a") as module_file:
+        module_file.write("\ndef helper():\n    return 2\n")
+
+    assert cache.load("model_trainer", get_fingerprint(cache, dataframe, config, stage_module), StageArtifact) is None
+
+
+def test_missing_artifact_file_misses_and_drops_entry(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+    cache.store("model_trainer", fingerprint, artifact)
+
+    os.remove(artifact.model_file_path)
+
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None
+    assert os.listdir(tmp_path / "cache" / "model_trainer") == []
+
+
+@pytest.mark.parametrize("file_name", ["model.pkl", os.path.join("report", "report.json")])
+def test_modified_artifact_file_misses(tmp_path, stage_module, artifact, file_name):
+    cache = StageCache(str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+    cache.store("model_trainer", fingerprint, artifact)
+
+    # same size, different content and modification time
+    file_path = tmp_path / "run-1" / file_name
+    stat = os.stat(file_path)
+    file_path.write_bytes(b"x" * stat.st_size)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None
+
+
+def test_file_added_to_artifact_dir_misses(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+    cache.store("model_trainer", fingerprint, artifact)
+
+    (tmp_path / "run-1" / "report" / "extra.json").write_text("{}")
+
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None
+
+
+def test_artifact_with_unwritten_files_is_not_stored(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+    artifact.model_file_path = str(tmp_path / "run-1" / "not-written.pkl")
+
+    assert not cache.store("model_trainer", fingerprint, artifact)
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None
+
+
+def test_disabled_cache_never_hits(tmp_path, stage_module, artifact):
+    cache = StageCache(str(tmp_path / "cache"), enabled=False)
+    fingerprint = get_fingerprint(cache, make_data(), StageConfig(output_dir="run-1"), stage_module)
+
+    assert not cache.store("model_trainer", fingerprint, artifact)
+    assert cache.load("model_trainer", fingerprint, StageArtifact) is None